@@ -0,0 +1,57 @@
+/**
+ * Node 端往返基准：每次调用启动脚本的 CommandExecutor 与常驻 PythonWorker
+ *
+ * 需先 npm run build；不连接 OpenD。
+ * 用法: node benchmarks/bench_command_executor.mjs --repeat 20 [--json]
+ */
+import path from 'path';
+import { fileURLToPath } from 'url';
+import { CommandExecutor } from '../dist/utils/CommandExecutor.js';
+import { PythonWorker } from '../dist/utils/PythonWorker.js';
+
+const __dirname = path.dirname(fileURLToPath(import.meta.url));
+const python = process.env.FUTU_MCP_PYTHON || 'python';
+
+function option(name, fallback) {
+  const index = process.argv.indexOf(name);
+  return index === -1 ? fallback : process.argv[index + 1];
+}
+
+function percentile(sorted, q) {
+  return sorted[Math.min(sorted.length - 1, Math.floor(sorted.length * q))];
+}
+
+/**
+ * 多次执行异步函数，返回 p50/p99 单次耗时(毫秒)与每秒调用次数
+ */
+async function measure(func, repeat) {
+  await func();
+  const samples = [];
+  for (let i = 0; i < repeat; i++) {
+    const start = process.hrtime.bigint();
+    await func();
+    samples.push(Number(process.hrtime.bigint() - start) / 1e6);
+  }
+  samples.sort((a, b) => a - b);
+  const mean = samples.reduce((sum, value) => sum + value, 0) / samples.length;
+  return { p50_ms: percentile(samples, 0.5), p99_ms: percentile(samples, 0.99), throughput: 1000 / mean };
+}
+
+const repeat = Number(option('--repeat', 20));
+const executor = new CommandExecutor();
+const echoCmd = `${python} ${path.join(__dirname, 'echo_json.py')} --codes 100`;
+const worker = new PythonWorker(path.join(__dirname, '../scripts/worker.py'), python);
+
+const results = {
+  node_command_executor: await measure(() => executor.executeJSONCommand(echoCmd), repeat),
+  node_worker_ping: await measure(() => worker.call('ping'), repeat * 10),
+};
+worker.close();
+
+if (process.argv.includes('--json')) {
+  console.log(JSON.stringify(results));
+} else {
+  for (const [name, result] of Object.entries(results)) {
+    console.log(`${name.padEnd(28)} p50 ${result.p50_ms.toFixed(3)} ms  p99 ${result.p99_ms.toFixed(3)} ms  ${result.throughput.toFixed(0)}/s`);
+  }
+}
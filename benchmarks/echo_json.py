@@ -0,0 +1,27 @@
+"""Node CommandExecutor 往返基准使用的脚本
+
+不连接 OpenD，用模拟行情对象生成快照并按工具脚本的标准格式输出JSON。
+
+用法: python benchmarks/echo_json.py --codes 100
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from utils import process_dataframe, print_json_result
+from fake_quote_context import FakeOpenQuoteContext
+
+
+def main():
+    parser = argparse.ArgumentParser(description='输出模拟快照JSON')
+    parser.add_argument('--codes', type=int, default=100, help='快照股票数量')
+    args = parser.parse_args()
+
+    code_list = [f'HK.{i:05d}' for i in range(args.codes)]
+    _, data_frame = FakeOpenQuoteContext().get_market_snapshot(code_list)
+    print_json_result({"snapshot": process_dataframe(data_frame)})
+
+
+if __name__ == "__main__":
+    main()
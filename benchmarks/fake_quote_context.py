@@ -0,0 +1,289 @@
+"""本地模拟的 OpenQuoteContext
+
+不连接 OpenD，按股票代码生成确定性的合成K线、快照、资金流向与推送数据，
+每次接口调用可设置固定延迟以模拟网络往返。供基准测试和推送回放离线使用。
+"""
+import os
+import sys
+import time
+import zlib
+import threading
+from datetime import date, datetime, timedelta
+import numpy as np
+import pandas as pd
+from futu import RET_OK, RET_ERROR
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from kline_store import parse_date
+from market_sessions import market_of, day_session_minutes
+
+# 分钟K线类型 -> 分钟数
+KTYPE_MINUTES = {'K_1M': 1, 'K_3M': 3, 'K_5M': 5, 'K_15M': 15, 'K_30M': 30, 'K_60M': 60}
+
+
+def code_seed(code):
+    """由股票代码得到稳定的随机种子"""
+    return zlib.crc32(code.encode('utf-8'))
+
+
+def trading_dates(start, end):
+    """合成数据使用的交易日：start 到 end 之间的工作日"""
+    days = np.arange(start.toordinal(), end.toordinal() + 1)
+    weekday = (days + 6) % 7  # date.fromordinal(1) 为周一
+    return days[weekday < 5]
+
+
+def synthetic_bars(code, start, end, ktype='K_DAY'):
+    """生成 [start, end] 内与 request_history_kline 返回结构一致的合成K线
+
+    每根K线的价格只由代码和K线时间决定，同一股票不同区间的请求在重叠部分完全一致
+    """
+    days = trading_dates(start, end)
+    if ktype == 'K_DAY':
+        offsets = [0]
+    else:
+        minutes = KTYPE_MINUTES.get(str(ktype), 1)
+        offsets = []
+        for open_, close in day_session_minutes(market_of(code)):
+            # 每个时段的最后一根截止于收盘(例如港股60分钟K线的 12:00)
+            offsets.extend(range(open_ + minutes, close, minutes))
+            offsets.append(close)
+    offsets = np.asarray(offsets, dtype='i8')
+    # 以距公元元年的分钟数作为K线序号
+    index = (days.astype('i8')[:, None] * 1440 + offsets[None, :]).ravel()
+    seed = code_seed(code) % 1000
+    phase = index / 1440.0
+    close = 100 * np.exp(0.2 * np.sin(phase / 17 + seed) + 0.05 * np.sin(phase / 2.3 + seed * 2)
+                         + 0.01 * np.sin(index / 7.0))
+    last_close = 100 * np.exp(0.2 * np.sin((phase - 1) / 17 + seed) + 0.05 * np.sin((phase - 1) / 2.3 + seed * 2)
+                              + 0.01 * np.sin(index / 7.0))
+    volume = (index * 2654435761 + seed) % 990_000 + 10_000
+    time_key = np.datetime_as_string(
+        np.datetime64('0001-01-01T00:00', 'm') + (index - 1440).astype('timedelta64[m]'), unit='s')
+    if len(time_key):
+        time_key = np.char.replace(time_key, 'T', ' ')
+    return pd.DataFrame({
+        'code': code,
+        'name': code,
+        'time_key': time_key.astype(object),
+        'open': last_close,
+        'close': close,
+        'high': np.maximum(close, last_close) * 1.005,
+        'low': np.minimum(close, last_close) * 0.995,
+        'pe_ratio': 20.0,
+        'turnover_rate': (volume % 1000) / 1000.0,
+        'volume': volume,
+        'turnover': close * volume,
+        'change_rate': (close / last_close - 1) * 100,
+        'last_close': last_close,
+    })
+
+
+def kline_push(code, time_key, close, volume, ktype='K_DAY'):
+    """构造一条与 CurKlineHandlerBase 解析结果结构一致的K线推送"""
+    return pd.DataFrame({
+        'code': [code],
+        'name': [code],
+        'time_key': [time_key],
+        'open': [close],
+        'close': [close],
+        'high': [close],
+        'low': [close],
+        'volume': [volume],
+        'turnover': [close * volume],
+        'k_type': [ktype],
+        'last_close': [close],
+    })
+
+
+def rt_push(code, time_str, price, volume):
+    """构造一条与 RTDataHandlerBase 解析结果结构一致的分时推送"""
+    return pd.DataFrame({
+        'code': [code],
+        'name': [code],
+        'time': [time_str],
+        'is_blank': [False],
+        'opened_mins': [0],
+        'cur_price': [price],
+        'last_close': [price],
+        'avg_price': [price],
+        'volume': [volume],
+        'turnover': [price * volume],
+    })
+
+
+class FakeOpenQuoteContext:
+    """OpenQuoteContext 的离线替身
+
+    支持 request_history_kline(分页)、get_market_snapshot、get_capital_flow、request_trading_days、
+    subscribe/query_subscription/set_handler 与 get_global_state。
+    """
+    def __init__(self, latency=0.0, fail_codes=(), today=None):
+        """
+        Args:
+            latency (float): 每次接口调用的模拟延迟(秒)
+            fail_codes (iterable): 调用时返回 RET_ERROR 的代码
+            today (date): 合成数据的"今天"，默认当天
+        """
+        self.latency = latency
+        self.fail_codes = set(fail_codes)
+        self.today = today or date.today()
+        self.handlers = []
+        self.subscriptions = set()
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def _call(self, api):
+        with self._lock:
+            self.calls[api] = self.calls.get(api, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def request_history_kline(self, code, start=None, end=None, ktype='K_DAY', autype='qfq',
+                              fields=None, max_count=1000, page_req_key=None, extended_time=False, **kwargs):
+        self._call('request_history_kline')
+        if code in self.fail_codes:
+            return RET_ERROR, f"unknown code {code}", None
+        end_date = parse_date(end) or self.today
+        start_date = parse_date(start) or end_date - timedelta(days=365)
+        frame = synthetic_bars(code, start_date, end_date, str(ktype))
+        offset = page_req_key or 0
+        page = frame.iloc[offset:offset + max_count].reset_index(drop=True)
+        next_key = offset + max_count if offset + max_count < len(frame) else None
+        return RET_OK, page, next_key
+
+    def get_market_snapshot(self, code_list):
+        self._call('get_market_snapshot')
+        bad = [code for code in code_list if code in self.fail_codes]
+        if bad:
+            return RET_ERROR, f"unknown codes {bad}"
+        n = len(code_list)
+        seeds = np.array([code_seed(code) % 1000 for code in code_list], dtype='f8')
+        price = 10 + seeds
+        return RET_OK, pd.DataFrame({
+            'code': code_list,
+            'name': code_list,
+            'update_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'last_price': price,
+            'open_price': price * 0.99,
+            'high_price': price * 1.01,
+            'low_price': price * 0.98,
+            'prev_close_price': price * 0.995,
+            'volume': np.full(n, 100_000),
+            'turnover': price * 100_000,
+            'change_rate': (seeds % 7) - 3.0,
+        })
+
+    def get_capital_flow(self, code, period_type=None, start=None, end=None):
+        self._call('get_capital_flow')
+        if code in self.fail_codes:
+            return RET_ERROR, f"unknown code {code}"
+        return RET_OK, pd.DataFrame({
+            'in_flow': [1.0e6],
+            'main_in_flow': [5.0e5],
+            'main_inflow': [float(code_seed(code) % 3) - 1],
+            'capital_flow_item_time': [datetime.now().strftime('%Y-%m-%d %H:%M:%S')],
+        })
+
+    def request_trading_days(self, market=None, start=None, end=None, code=None):
+        self._call('request_trading_days')
+        end_date = parse_date(end) or self.today
+        start_date = parse_date(start) or end_date - timedelta(days=365)
+        return RET_OK, [
+            {'time': date.fromordinal(int(d)).isoformat(), 'trade_date_type': 'WHOLE'}
+            for d in trading_dates(start_date, end_date)
+        ]
+
+    def subscribe(self, code_list, subtype_list, **kwargs):
+        self._call('subscribe')
+        for code in code_list:
+            for subtype in subtype_list:
+                self.subscriptions.add((code, str(subtype)))
+        return RET_OK, None
+
+    def query_subscription(self, is_all_conn=True):
+        return RET_OK, {'total_used': len(self.subscriptions), 'remain': 100_000 - len(self.subscriptions),
+                        'own_used': len(self.subscriptions), 'sub_list': {}}
+
+    def set_handler(self, handler):
+        self.handlers.append(handler)
+        return RET_OK
+
+    def get_global_state(self):
+        return RET_OK, {'qot_logined': True}
+
+    def close(self):
+        pass
+
+
+def ticker_push(code, time_str, price, volume, direction):
+    """构造一条与 TickerHandlerBase 解析结果结构一致的逐笔推送"""
+    return pd.DataFrame({
+        'code': [code],
+        'name': [code],
+        'time': [time_str],
+        'price': [price],
+        'volume': [volume],
+        'turnover': [price * volume],
+        'ticker_direction': [direction],
+        'sequence': [0],
+        'type': ['AUTO_MATCH'],
+        'push_data_type': ['REALTIME'],
+    })
+
+
+def synthetic_push_stream(code_list, seconds, rate, kinds=('KLINE', 'RT_DATA'), start=None, ktype='K_DAY'):
+    """生成按时间排列的合成推送 [(接收时间戳, 类型, DataFrame), ...]
+
+    共 seconds * rate 条推送，均匀分布在 seconds 秒内，按股票与类型轮流产生，
+    用于模拟开盘时全市场的推送高峰。
+
+    Args:
+        code_list (list): 股票代码
+        seconds (float): 时长(秒)
+        rate (float): 每秒推送条数
+        kinds (list): 推送类型，取 KLINE、RT_DATA、TICKER
+        start (datetime): 第一条推送的时间，默认当前时间
+        ktype (str): K线推送的类型，K_DAY 时同一天的推送更新同一根K线
+    """
+    start = start or datetime.now()
+    base = start.timestamp()
+    total = int(seconds * rate)
+    rng = np.random.default_rng(0)
+    steps = rng.normal(0, 0.001, total)
+    prices = {code: 10.0 + code_seed(code) % 1000 for code in code_list}
+    pushes = []
+    for i in range(total):
+        code = code_list[i % len(code_list)]
+        kind = kinds[(i // len(code_list)) % len(kinds)]
+        offset = i / rate
+        now = start + timedelta(seconds=offset)
+        price = prices[code] = round(prices[code] * (1 + steps[i]), 3)
+        volume = 100 * (1 + i % 50)
+        if kind == 'KLINE':
+            time_key = now.strftime('%Y-%m-%d 00:00:00' if ktype == 'K_DAY' else '%Y-%m-%d %H:%M:00')
+            frame = kline_push(code, time_key, price, volume, ktype)
+        elif kind == 'RT_DATA':
+            frame = rt_push(code, now.strftime('%Y-%m-%d %H:%M:00'), price, volume)
+        else:
+            frame = ticker_push(code, now.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3], price, volume,
+                                'BUY' if steps[i] >= 0 else 'SELL')
+        pushes.append((base + offset, kind, frame))
+    return pushes
+
+
+def order_book_push(code, mid, depth=10, tick=0.01, seed=0):
+    """构造一条与 OrderBookHandlerBase 解析结果结构一致的摆盘推送字典"""
+    rng = np.random.default_rng(seed)
+    volumes = rng.integers(1, 50, (2, depth)) * 100
+    orders = rng.integers(1, 20, (2, depth))
+    bid = round(mid - tick / 2, 4)
+    ask = round(mid + tick / 2, 4)
+    return {
+        'code': code,
+        'name': code,
+        'svr_recv_time_bid': '',
+        'svr_recv_time_ask': '',
+        'Bid': [(round(bid - i * tick, 4), int(volumes[0, i]), int(orders[0, i]), {}) for i in range(depth)],
+        'Ask': [(round(ask + i * tick, 4), int(volumes[1, i]), int(orders[1, i]), {}) for i in range(depth)],
+    }
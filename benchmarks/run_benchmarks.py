@@ -0,0 +1,337 @@
+"""离线基准测试套件
+
+使用 fake_quote_context.FakeOpenQuoteContext 代替 OpenD，测量各热点路径的
+p50/p99 单次耗时与吞吐，并与保存的基线比较，p50 超出容差时视为性能回退。
+
+覆盖: process_dataframe、to_json、calculate_ma、get_stock_ma、request_history_kline 分页
+(无本地存储 / 本地存储冷启动 / 本地存储命中 / 由1分钟K线合成5分钟K线)、KLineCache、
+K线推送接收与推送到信号的延迟、批量技术指标、摆盘推送的原地更新与盘口特征、逐笔与1分钟K线的本地多周期聚合；
+加 --node 时附带 Node CommandExecutor 与 PythonWorker 的往返耗时(需先 npm run build)。
+
+用法:
+    python benchmarks/run_benchmarks.py                    # 运行并与 benchmarks/baseline.json 比较
+    python benchmarks/run_benchmarks.py --save-baseline    # 运行并保存为新基线
+    python benchmarks/run_benchmarks.py --only kline --node
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'scripts'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'strategy'))
+from futu import KLType, AuType, KL_FIELD
+from utils import process_dataframe, to_json
+from indicators import compute_indicators, SUPPORTED_INDICATORS
+from kline_store import KLineStore
+from request_history_kline import request_history_kline
+from calculate_moving_average import calculate_ma, get_stock_ma
+from order_book import OrderBooks
+from bar_aggregator import BarAggregator
+import main as strategy_main
+from main import KLineCache, MAStrategy, StrategyRuntime
+from fake_quote_context import FakeOpenQuoteContext, synthetic_bars, kline_push, order_book_push
+
+DEFAULT_BASELINE = os.path.join(BENCH_DIR, 'baseline.json')
+# 合成数据固定在一个历史区间，保证每次运行的数据量一致
+TODAY = date(2024, 6, 28)
+
+
+def weekday_calendar(market, day):
+    """基准测试使用的交易日判断，不查询 OpenD"""
+    return day.weekday() < 5
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def measure(func, repeat, units=1, warmup=1, setup=None):
+    """多次调用 func 并统计单次耗时
+
+    Args:
+        func (callable): 被测函数
+        repeat (int): 计时次数
+        units (int): 每次调用处理的数据量(行数、请求数等)，用于计算吞吐
+        warmup (int): 不计时的预热次数
+        setup (callable): 每次调用前执行且不计时的准备函数
+
+    Returns:
+        dict: p50_ms、p99_ms 与 throughput(units/秒，按平均耗时计算)
+    """
+    for _ in range(warmup):
+        if setup:
+            setup()
+        func()
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    mean = sum(samples) / len(samples)
+    return {
+        'p50_ms': percentile(samples, 0.5) * 1000,
+        'p99_ms': percentile(samples, 0.99) * 1000,
+        'throughput': units / mean if mean else 0.0,
+    }
+
+
+def bench_dataframe(args):
+    frame = synthetic_bars('HK.00700', TODAY - timedelta(days=60), TODAY, 'K_1M')
+    records = process_dataframe(frame)
+    return {
+        'process_dataframe': measure(lambda: process_dataframe(frame), args.repeat, len(frame)),
+        'to_json': measure(lambda: to_json(records), args.repeat, len(frame)),
+    }
+
+
+def bench_ma(args):
+    records = process_dataframe(synthetic_bars('HK.00700', TODAY - timedelta(days=1500), TODAY))
+    codes = [f'HK.{i:05d}' for i in range(args.symbols)]
+    quote_ctx = FakeOpenQuoteContext(latency=args.latency, today=TODAY)
+    return {
+        'calculate_ma': measure(lambda: calculate_ma(records, [5, 10, 20, 60]), args.repeat, len(records)),
+        'get_stock_ma': measure(
+            lambda: get_stock_ma(quote_ctx, codes, [5, 20], indicators=SUPPORTED_INDICATORS, concurrency=4),
+            max(1, args.repeat // 4), len(codes)),
+    }
+
+
+def bench_kline(args):
+    """分页获取约一个月的1分钟K线：无本地存储、空存储(冷)与已存储(热)，以及由已存储1分钟K线合成的5分钟K线"""
+    quote_ctx = FakeOpenQuoteContext(latency=args.latency, today=TODAY)
+    start, end = (TODAY - timedelta(days=30)).isoformat(), (TODAY - timedelta(days=1)).isoformat()
+    bars = len(synthetic_bars('HK.00700', date.fromisoformat(start), date.fromisoformat(end), 'K_1M'))
+    root = tempfile.mkdtemp(prefix='futu-bench-')
+    state = {}
+
+    def fetch(store=None):
+        result = request_history_kline(quote_ctx, 'HK.00700', start, end, KLType.K_1M, AuType.QFQ,
+                                       [KL_FIELD.ALL], 1000, False, store)
+        assert len(result['HK.00700']) == bars, result.get('error')
+
+    def fresh_store():
+        shutil.rmtree(root, ignore_errors=True)
+        state['store'] = KLineStore(root)
+
+    try:
+        results = {
+            'history_kline_pages': measure(fetch, args.repeat, bars),
+            'history_kline_store_cold': measure(lambda: fetch(state['store']), args.repeat, bars, setup=fresh_store),
+        }
+        warm = KLineStore(root)
+        results['history_kline_store_warm'] = measure(lambda: fetch(warm), args.repeat, bars)
+        calls = quote_ctx.calls.get('request_history_kline', 0)
+
+        def resample():
+            result = request_history_kline(quote_ctx, 'HK.00700', start, end, KLType.K_5M, AuType.QFQ,
+                                           [KL_FIELD.ALL], 1000, False, warm)
+            assert len(result['HK.00700']) == bars // 5, result.get('error')
+
+        results['history_kline_resampled_5m'] = measure(resample, args.repeat, bars // 5)
+        assert quote_ctx.calls.get('request_history_kline', 0) == calls, '合成5分钟K线不应请求 OpenD'
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return results
+
+
+def bench_cache(args):
+    cache = KLineCache(is_trading_day=weekday_calendar)
+    codes = [f'HK.{i:05d}' for i in range(args.symbols)]
+    frame = synthetic_bars('HK.00700', TODAY - timedelta(days=120), TODAY)
+    for code in codes:
+        cache.set(code, KLType.K_DAY, 40, frame)
+
+    def get_all():
+        for code in codes:
+            assert cache.get(code, KLType.K_DAY, 40)[0]
+
+    def set_all():
+        for code in codes:
+            cache.set(code, KLType.K_DAY, 40, frame)
+
+    return {
+        'kline_cache_get': measure(get_all, args.repeat, len(codes)),
+        'kline_cache_set': measure(set_all, args.repeat, len(codes)),
+    }
+
+
+def bench_push(args):
+    """K线推送：回调线程中的接收耗时，以及推送入队到信号计算完成的延迟"""
+    # 策略加载历史K线时写入模块级缓存，改用不查询 OpenD 的交易日判断
+    strategy_main.kline_cache = KLineCache(is_trading_day=weekday_calendar)
+    quote_ctx = FakeOpenQuoteContext(today=TODAY)
+    runtime = StrategyRuntime(quote_ctx, MAStrategy, workers=4)
+    codes = [f'HK.{i:05d}' for i in range(args.symbols)]
+    pushes = [kline_push(code, f'{TODAY.isoformat()} 00:00:00', 100.0 + i % 7, 1000 + i)
+              for i, code in enumerate(codes * 10)]
+    # 策略会打印每次信号判断，基准测试期间丢弃输出
+    with contextlib.redirect_stdout(io.StringIO()):
+        try:
+            runtime.subscribe(codes)
+            runtime.initial_signals()
+            handle = runtime.kline_handler.handle
+            start = time.perf_counter()
+            intake = measure(lambda: [handle(push) for push in pushes], args.repeat, len(pushes))
+            runtime.dispatcher.wait_idle(timeout=60)
+            elapsed = time.perf_counter() - start
+            stats = runtime.stats()
+        finally:
+            runtime.close()
+    return {
+        'push_intake': intake,
+        'push_to_signal': {
+            'p50_ms': stats['latency_p50_ms'],
+            'p99_ms': stats['latency_p99_ms'],
+            # 包含排空队列在内，每秒完成处理的推送数
+            'throughput': stats['received'] / elapsed,
+        },
+    }
+
+
+def bench_indicators(args):
+    rng = np.random.default_rng(0)
+    close = 100 + np.cumsum(rng.normal(0, 1, (args.symbols * 5, 250)), axis=1)
+    return {
+        'indicators_batch': measure(
+            lambda: compute_indicators(close, SUPPORTED_INDICATORS, [5, 20]), args.repeat, len(close)),
+    }
+
+
+def bench_order_book(args):
+    """摆盘推送写入定深盘口，以及逐只股票读取盘口特征"""
+    books = OrderBooks()
+    codes = [f'HK.{i:05d}' for i in range(args.symbols)]
+    pushes = [order_book_push(code, 50.005 + i % 7, seed=i) for i, code in enumerate(codes * 5)]
+    return {
+        'order_book_update': measure(
+            lambda: [books.on_order_book(push) for push in pushes], args.repeat, len(pushes)),
+        'order_book_features': measure(lambda: books.features(codes), args.repeat, len(codes)),
+    }
+
+
+def bench_bars(args):
+    """逐笔成交与1分钟K线聚合为 2/10/60 分钟与日K线(回调不做处理)"""
+    intervals = ['K_2M', 'K_10M', 'K_60M', 'K_DAY']
+    codes = [f'HK.{i:05d}' for i in range(args.symbols)]
+    day = TODAY.isoformat()
+    ticks = [(code, f'{day} {9 + i // 60 % 3:02d}:{30 + i % 30:02d}:{i % 60:02d}.500', 100.0 + i % 7, 100)
+             for i, code in enumerate(codes * 10)]
+    minutes = [(code, f'{day} 10:{i % 60:02d}:00', 100.0, 101.0, 99.0, 100.5, 1000, 100500.0)
+               for i, code in enumerate(codes * 10)]
+
+    def aggregate_ticks():
+        aggregator = BarAggregator(intervals, lambda *bar: None)
+        for tick in ticks:
+            aggregator.on_tick(*tick)
+
+    def aggregate_minutes():
+        aggregator = BarAggregator(intervals, lambda *bar: None)
+        for bar in minutes:
+            aggregator.on_minute_bar(*bar)
+
+    return {
+        'bars_from_ticks': measure(aggregate_ticks, args.repeat, len(ticks)),
+        'bars_from_1m': measure(aggregate_minutes, args.repeat, len(minutes)),
+    }
+
+
+def bench_node(args):
+    """运行 Node 端基准脚本，返回其输出的结果"""
+    script = os.path.join(BENCH_DIR, 'bench_command_executor.mjs')
+    output = subprocess.run(
+        ['node', script, '--repeat', str(args.repeat), '--json'],
+        cwd=ROOT_DIR, capture_output=True, text=True, check=True,
+        env={**os.environ, 'FUTU_MCP_PYTHON': sys.executable},
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+BENCHMARKS = {
+    'dataframe': bench_dataframe,
+    'ma': bench_ma,
+    'kline': bench_kline,
+    'cache': bench_cache,
+    'push': bench_push,
+    'indicators': bench_indicators,
+    'order_book': bench_order_book,
+    'bars': bench_bars,
+}
+
+
+def compare(results, baseline, tolerance):
+    """返回 p50 超出基线 (1 + tolerance) 倍的组件列表"""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base and base['p50_ms'] > 0 and current['p50_ms'] > base['p50_ms'] * (1 + tolerance):
+            regressions.append((name, base['p50_ms'], current['p50_ms']))
+    return regressions
+
+
+def print_table(results, baseline):
+    print(f"{'component':<28} {'p50 ms':>10} {'p99 ms':>10} {'throughput/s':>14} {'baseline p50':>13} {'change':>8}")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base and base['p50_ms'] > 0:
+            change = f"{(result['p50_ms'] / base['p50_ms'] - 1) * 100:+.0f}%"
+            base_text = f"{base['p50_ms']:.3f}"
+        else:
+            change, base_text = '', '-'
+        print(f"{name:<28} {result['p50_ms']:>10.3f} {result['p99_ms']:>10.3f} "
+              f"{result['throughput']:>14,.0f} {base_text:>13} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='离线基准测试套件')
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help='只运行指定的基准组')
+    parser.add_argument('--repeat', type=int, default=20, help='每个组件的计时次数')
+    parser.add_argument('--symbols', type=int, default=200, help='多股票组件使用的股票数量')
+    parser.add_argument('--latency', type=float, default=0.001, help='模拟行情接口的单次延迟(秒)')
+    parser.add_argument('--node', action='store_true', help='同时运行 Node 端往返基准(需先 npm run build)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='基线文件路径')
+    parser.add_argument('--save-baseline', action='store_true', help='将本次结果保存为基线')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='p50 允许超出基线的比例')
+    args = parser.parse_args()
+
+    results = {}
+    for name in args.only or BENCHMARKS:
+        results.update(BENCHMARKS[name](args))
+    if args.node:
+        results.update(bench_node(args))
+
+    baseline = {}
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+    print_table(results, baseline)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version.split()[0], 'repeat': args.repeat, 'symbols': args.symbols,
+                       'latency': args.latency, 'results': results}, f, indent=2)
+        print(f"基线已保存到 {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, args.tolerance)
+    for name, before, after in regressions:
+        print(f"[回退] {name}: p50 {before:.3f} ms -> {after:.3f} ms")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
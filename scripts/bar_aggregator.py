@@ -0,0 +1,270 @@
+"""本地K线聚合
+
+从一个逐笔成交(TICKER)或1分钟K线(K_1M)订阅在本地合成任意周期的K线(包括 2 分钟、10 分钟等
+OpenD 不提供的周期)以及按交易时段对齐的日K线，多周期策略不必为每个周期各占一个订阅额度。
+
+K线以结束时间标记：每个交易时段从开盘起每 N 分钟一根，最后一根截止于收盘(见 market_sessions.bar_end_minute)。
+每次更新都会把当前未完成的K线交给回调，出现下一根K线、调用 close_bars(到达结束时间)或 flush 时
+再以 completed=True 回调一次已完成的K线。
+
+    def on_bar(code, ktype, bar, completed):
+        ...  # bar: {code, time_key, open, high, low, close, volume, turnover}
+
+    aggregator = BarAggregator(['K_2M', 'K_10M', 'K_DAY'], on_bar)
+    quote_ctx.set_handler(TickerBarHandler(aggregator))
+    quote_ctx.subscribe(code_list, [SubType.TICKER])
+"""
+import threading
+from datetime import datetime
+from futu import RET_OK, TickerHandlerBase, CurKlineHandlerBase
+from market_sessions import market_of, market_timezone, day_session_minutes, bar_end_minute
+
+DAY = 'K_DAY'
+OPEN, HIGH, LOW, CLOSE, VOLUME, TURNOVER = range(6)
+
+
+def parse_interval(interval):
+    """把周期转为 (K线类型名, 分钟数)，日K线的分钟数为 0
+
+    支持分钟数(10)、K_5M、10m 以及 K_DAY、1d、DAY
+    """
+    if isinstance(interval, int):
+        minutes = interval
+    else:
+        text = str(interval).upper()
+        if text in ('K_DAY', 'DAY', '1D'):
+            return DAY, 0
+        text = text[2:] if text.startswith('K_') else text
+        if not text.endswith('M') or not text[:-1].isdigit():
+            raise ValueError(f"不支持的K线周期: {interval}")
+        minutes = int(text[:-1])
+    if minutes <= 0:
+        raise ValueError(f"不支持的K线周期: {interval}")
+    return f'K_{minutes}M', minutes
+
+
+def split_time(time_str):
+    """'YYYY-mm-dd HH:MM:SS[.fff]' -> (日期字符串, 当天零点起的分钟数)"""
+    return time_str[:10], int(time_str[11:13]) * 60 + int(time_str[14:16]) + float(time_str[17:] or 0) / 60
+
+
+def format_minute(day, minute):
+    return f'{day} {int(minute) // 60:02d}:{int(minute) % 60:02d}:00'
+
+
+class _BarState:
+    """一只股票一个周期的聚合状态
+
+    base 为已结束的输入(逐笔或已走完的1分钟K线)的合计；1分钟K线在走完前会重复推送，
+    最新的一次保存在 pending，走完(出现下一分钟)时再并入 base
+    """
+    __slots__ = ('time_key', 'end', 'base', 'pending', 'pending_key', 'closed')
+
+    def __init__(self):
+        self.time_key = None
+        self.end = None
+        self.base = None
+        self.pending = None
+        self.pending_key = None
+        self.closed = False     # 已由 close_bars 完成，之后迟到的同一根K线的推送丢弃
+
+    def fold(self):
+        if self.pending is not None:
+            self.base = merge(self.base, self.pending)
+            self.pending = self.pending_key = None
+
+    def bar(self):
+        return merge(self.base, self.pending) if self.pending is not None else self.base
+
+
+def merge(bar, update):
+    """合并两段连续的 [开, 高, 低, 收, 量, 额]"""
+    if bar is None:
+        return list(update)
+    return [
+        bar[OPEN],
+        max(bar[HIGH], update[HIGH]),
+        min(bar[LOW], update[LOW]),
+        update[CLOSE],
+        bar[VOLUME] + update[VOLUME],
+        bar[TURNOVER] + update[TURNOVER],
+    ]
+
+
+class BarAggregator:
+    """按股票与周期聚合逐笔成交或1分钟K线"""
+    def __init__(self, intervals, on_bar=None, emit_partial=True, day_type=None):
+        """
+        Args:
+            intervals (list): K线周期，例如 ['K_2M', '10m', 'K_DAY']
+            on_bar (callable): on_bar(code, ktype, bar, completed)
+            emit_partial (bool): 是否在每次更新时回调未完成的K线
+            day_type (callable): (market, 日期字符串) -> WHOLE/MORNING/AFTERNOON，用于半日市，默认全天
+        """
+        self.intervals = [parse_interval(interval) for interval in intervals]
+        self.on_bar = on_bar
+        self.emit_partial = emit_partial
+        self.day_type = day_type
+        self.states = {}            # code -> [_BarState，与 intervals 一一对应]
+        self._sessions = {}         # (market, 日期) -> 交易时段
+        self.lock = threading.Lock()
+
+    def sessions(self, code, day):
+        market = market_of(code)
+        key = (market, day)
+        sessions = self._sessions.get(key)
+        if sessions is None:
+            day_type = self.day_type(market, day) if self.day_type else 'WHOLE'
+            sessions = self._sessions[key] = day_session_minutes(market, day_type or 'WHOLE')
+        return sessions
+
+    def _states(self, code):
+        states = self.states.get(code)
+        if states is None:
+            states = self.states[code] = [_BarState() for _ in self.intervals]
+        return states
+
+    def on_tick(self, code, time_str, price, volume, turnover=None):
+        """处理一笔成交，time_str 为交易所当地时间"""
+        turnover = price * volume if turnover is None else turnover
+        self._update(code, time_str, [price, price, price, price, volume, turnover], None)
+
+    def on_minute_bar(self, code, time_key, open_, high, low, close, volume, turnover):
+        """处理一根1分钟K线(可以是同一分钟的重复推送)，time_key 为K线结束时间"""
+        self._update(code, time_key, [open_, high, low, close, volume, turnover], time_key)
+
+    def _update(self, code, time_str, values, minute_key):
+        day, minute = split_time(time_str)
+        # 1分钟K线以结束时间标记，按开始时间归入聚合K线
+        start = minute - 1 if minute_key is not None else minute
+        sessions = self.sessions(code, day)
+        emitted = []
+        with self.lock:
+            for (ktype, minutes), state in zip(self.intervals, self._states(code)):
+                if minutes:
+                    end = format_minute(day, bar_end_minute(start, sessions, minutes))
+                    time_key = end
+                else:
+                    end = format_minute(day, sessions[-1][1])
+                    time_key = f'{day} 00:00:00'
+                if state.time_key is not None and (time_key < state.time_key or
+                                                   time_key == state.time_key and state.closed):
+                    continue    # 过期的推送
+                if minute_key is not None and state.pending_key is not None and minute_key < state.pending_key:
+                    continue
+                if time_key != state.time_key:
+                    if state.time_key is not None and not state.closed:
+                        emitted.append((ktype, state.time_key, state.bar(), True))
+                    state.time_key, state.end, state.base, state.closed = time_key, end, None, False
+                    state.pending = state.pending_key = None
+                if minute_key is None:
+                    state.base = merge(state.base, values)
+                else:
+                    if minute_key != state.pending_key:
+                        state.fold()
+                    state.pending, state.pending_key = values, minute_key
+                if self.emit_partial:
+                    emitted.append((ktype, time_key, state.bar(), False))
+        self._emit(code, emitted)
+
+    def on_ticker(self, data):
+        """处理逐笔推送 DataFrame"""
+        turnovers = data['turnover'].tolist() if 'turnover' in data else [None] * len(data)
+        for code, time_str, price, volume, turnover in zip(
+                data['code'].tolist(), data['time'].tolist(), data['price'].tolist(),
+                data['volume'].tolist(), turnovers):
+            self.on_tick(code, time_str, price, volume, turnover)
+
+    def on_kline(self, data):
+        """处理K线推送 DataFrame，只使用其中的1分钟K线"""
+        if 'k_type' in data:
+            data = data[data['k_type'].astype(str) == 'K_1M']
+        for row in zip(data['code'].tolist(), data['time_key'].tolist(), data['open'].tolist(),
+                       data['high'].tolist(), data['low'].tolist(), data['close'].tolist(),
+                       data['volume'].tolist(), data['turnover'].tolist()):
+            self.on_minute_bar(*row)
+
+    def current(self, code):
+        """返回股票各周期当前(未完成)的K线 {ktype: bar}"""
+        with self.lock:
+            return {
+                ktype: self._bar_dict(code, state.time_key, state.bar())
+                for (ktype, _), state in zip(self.intervals, self.states.get(code, ()))
+                if state.time_key is not None and not state.closed
+            }
+
+    def close_bars(self, now=None):
+        """完成结束时间不晚于 now 的K线(用于成交稀少的股票)
+
+        Args:
+            now (datetime): 交易所当地时间，默认按各股票市场时区取当前时间
+        """
+        emitted = []
+        with self.lock:
+            for code, states in self.states.items():
+                current = now or datetime.now(market_timezone(market_of(code)))
+                current = current.strftime('%Y-%m-%d %H:%M:%S')
+                for (ktype, _), state in zip(self.intervals, states):
+                    if state.time_key is not None and not state.closed and state.end <= current:
+                        emitted.append((code, ktype, state.time_key, state.bar()))
+                        state.closed = True
+        for code, ktype, time_key, bar in emitted:
+            self._emit(code, [(ktype, time_key, bar, True)])
+
+    def flush(self):
+        """把所有未完成的K线作为已完成回调并清空"""
+        with self.lock:
+            emitted = [
+                (code, ktype, state.time_key, state.bar())
+                for code, states in self.states.items()
+                for (ktype, _), state in zip(self.intervals, states)
+                if state.time_key is not None and not state.closed
+            ]
+            self.states.clear()
+        for code, ktype, time_key, bar in emitted:
+            self._emit(code, [(ktype, time_key, bar, True)])
+
+    def _bar_dict(self, code, time_key, bar):
+        return {
+            "code": code,
+            "time_key": time_key,
+            "open": bar[OPEN],
+            "high": bar[HIGH],
+            "low": bar[LOW],
+            "close": bar[CLOSE],
+            "volume": bar[VOLUME],
+            "turnover": bar[TURNOVER],
+        }
+
+    def _emit(self, code, emitted):
+        if self.on_bar is None:
+            return
+        for ktype, time_key, bar, completed in emitted:
+            if bar is not None:
+                self.on_bar(code, ktype, self._bar_dict(code, time_key, bar), completed)
+
+
+class TickerBarHandler(TickerHandlerBase):
+    """把逐笔推送交给 BarAggregator 的处理器"""
+    def __init__(self, aggregator):
+        super(TickerBarHandler, self).__init__()
+        self.aggregator = aggregator
+
+    def on_recv_rsp(self, rsp_pb):
+        ret_code, data = super(TickerBarHandler, self).on_recv_rsp(rsp_pb)
+        if ret_code == RET_OK:
+            self.aggregator.on_ticker(data)
+        return ret_code, data
+
+
+class KLineBarHandler(CurKlineHandlerBase):
+    """把1分钟K线推送交给 BarAggregator 的处理器"""
+    def __init__(self, aggregator):
+        super(KLineBarHandler, self).__init__()
+        self.aggregator = aggregator
+
+    def on_recv_rsp(self, rsp_pb):
+        ret_code, data = super(KLineBarHandler, self).on_recv_rsp(rsp_pb)
+        if ret_code == RET_OK:
+            self.aggregator.on_kline(data)
+        return ret_code, data
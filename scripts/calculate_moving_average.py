@@ -1,11 +1,12 @@
 import argparse
 import numpy as np
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from futu import KLType, AuType, KL_FIELD
 from utils import (
-    setup_logger, create_quote_context, process_dataframe,
+    setup_logger, create_quote_context,
     print_json_result, handle_exception, RET_OK
 )
+from indicators import sma, compute_indicators, SUPPORTED_INDICATORS
 
 # 设置日志
 setup_logger()
@@ -23,84 +24,106 @@ def calculate_ma(data, periods):
     if not data:
         return {}
     
-    # 转换为pandas DataFrame以便计算
-    df = pd.DataFrame(data)
-    result = {}
-    
     # 使用'close'字段而非'close_price'
-    if 'close' not in df.columns:
-        print(f"警告: 数据中无close字段，可用字段: {df.columns.tolist()}")
-        return result
+    if 'close' not in data[0]:
+        print(f"警告: 数据中无close字段，可用字段: {list(data[0].keys())}")
+        return {}
     
     # 按日期排序
-    if 'time_key' in df.columns:
-        df = df.sort_values('time_key')
-    
-    # 计算每个周期的移动平均线
-    for period in periods:
-        if len(df) >= period:
-            ma_key = f'ma{period}'
-            df[ma_key] = df['close'].rolling(window=period).mean().round(3)
-            
-            # 将结果转为日期为键的字典
-            ma_dict = {}
-            for idx, row in df.iterrows():
-                if not pd.isna(row[ma_key]):
-                    ma_dict[row['time_key']] = float(row[ma_key])
-            result[ma_key] = ma_dict
+    if 'time_key' in data[0]:
+        data = sorted(data, key=lambda item: item['time_key'])
+    time_keys = [item.get('time_key') for item in data]
+    close = np.array([item['close'] for item in data], dtype='f8')
     
+    # 一次累加和计算所有周期，并转为日期为键的字典
+    result = {}
+    for period, values in sma(close, periods).items():
+        if len(close) >= period:
+            valid = ~np.isnan(values)
+            keys = [time_keys[i] for i in np.flatnonzero(valid)]
+            result[f'ma{period}'] = dict(zip(keys, np.round(values[valid], 3).tolist()))
     return result
 
-def get_stock_ma(quote_ctx, code_list, ma_periods):
-    """获取股票数据并计算移动平均线
+def indicators_to_columns(time_keys, columns):
+    """将指标数组转换为列式JSON结构，数据不足的位置为None"""
+    result = {"time_key": list(time_keys)}
+    for name, values in columns.items():
+        values = np.round(values, 3).astype(object)
+        values[np.isnan(values.astype('f8'))] = None
+        result[name] = values.tolist()
+    return result
+
+def fetch_close_series(quote_ctx, code):
+    """获取单只股票的日K线收盘价序列
+    
+    Returns:
+        tuple: (time_key列表, 收盘价数组)，失败时返回 {"error": ...}
+    """
+    ret_code, data_frame, _ = quote_ctx.request_history_kline(
+        code=code,
+        ktype=KLType.K_DAY,  # 固定使用日K线
+        autype=AuType.QFQ,
+        fields=[KL_FIELD.DATE_TIME, KL_FIELD.CLOSE],
+        max_count=1000
+    )
+    
+    if ret_code != RET_OK or data_frame.empty:
+        return {"error": {"message": f"获取{code}数据失败", "ret_code": ret_code}}
+    data_frame = data_frame.sort_values('time_key')
+    return data_frame['time_key'].tolist(), data_frame['close'].to_numpy(dtype='f8')
+
+def get_stock_ma(quote_ctx, code_list, ma_periods, indicators=('ma',), concurrency=1, **indicator_params):
+    """获取股票数据并计算移动平均线等技术指标
     
     Args:
-        quote_ctx: 富途行情上下文
+        quote_ctx: 富途行情上下文，并发获取时各线程共享
         code_list (list): 股票代码列表
         ma_periods (list): 移动平均线周期列表 [5, 10, 20]等
+        indicators (list): 指标列表，可选 ma、ema、wma、boll、rsi、macd
+        concurrency (int): 并发获取K线的线程数，整体仍受请求调度器的 request_history_kline 额度限制
+        indicator_params: 透传给 compute_indicators 的参数，如 rsi_period、boll_period
     
     Returns:
-        dict: 包含每只股票移动平均线数据的字典
+        dict: 每只股票的列式指标数据 {code: {"time_key": [...], "ma5": [...], ...}}，
+              单只股票失败时对应值为 {"error": ...}，不影响其他股票
     """
     results = {}
+    series = {}
     
-    for code in code_list:
-        # 获取历史K线数据
-        ret_code, data_frame, _ = quote_ctx.request_history_kline(
-            code=code,
-            ktype=KLType.K_DAY,  # 固定使用日K线
-            autype=AuType.QFQ,
-            fields=[KL_FIELD.DATE_TIME, KL_FIELD.CLOSE],
-            max_count=1000
-        )
-        
-        if ret_code == RET_OK and not data_frame.empty:
-            # 处理成JSON格式
-            processed_data = []
-            for _, row in data_frame.iterrows():
-                # 直接使用SDK返回的字段名
-                item = {
-                    'code': row['code'],
-                    'name': row['name'] if 'name' in row else '',
-                    'time_key': row['time_key'],
-                    'close': float(row['close'])
-                }
-                processed_data.append(item)
-            
-            # 计算移动平均线
-            ma_data = calculate_ma(processed_data, ma_periods)
-            
-            # 只返回MA数据
-            if ma_data:
-                results[code] = ma_data
-            else:
-                results[code] = {"error": {"message": "计算移动平均线失败"}}
+    def fetch(code):
+        try:
+            return fetch_close_series(quote_ctx, code)
+        except Exception as e:
+            return {"error": {"message": f"获取{code}数据失败: {e}"}}
+    
+    # 去重后并发获取，结果按原顺序收集
+    unique_codes = list(dict.fromkeys(code_list))
+    if concurrency > 1 and len(unique_codes) > 1:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(unique_codes))) as executor:
+            fetched = list(executor.map(fetch, unique_codes))
+    else:
+        fetched = [fetch(code) for code in unique_codes]
+    
+    for code, item in zip(unique_codes, fetched):
+        if isinstance(item, dict):
+            results[code] = item
         else:
-            results[code] = {
-                "error": {"message": f"获取{code}数据失败", "ret_code": ret_code}
-            }
-            
-    return results
+            series[code] = item
+    
+    # 长度相同的股票合并为二维数组一次计算
+    by_length = {}
+    for code, (_, close) in series.items():
+        by_length.setdefault(len(close), []).append(code)
+    for codes in by_length.values():
+        close_matrix = np.vstack([series[code][1] for code in codes])
+        columns = compute_indicators(close_matrix, indicators, ma_periods, **indicator_params)
+        for row, code in enumerate(codes):
+            results[code] = indicators_to_columns(
+                series[code][0], {name: values[row] for name, values in columns.items()}
+            )
+    
+    # 按请求顺序返回
+    return {code: results[code] for code in unique_codes}
 
 def main():
     parser = argparse.ArgumentParser(description='计算股票移动平均线')
@@ -108,6 +131,16 @@ def main():
                         help='股票代码列表, 例如: HK.00700 US.AAPL')
     parser.add_argument('--ma_periods', nargs='+', type=int, default=[5, 10, 20],
                         help='移动平均线周期列表, 例如: 5 10 20 30 60')
+    parser.add_argument('--indicators', nargs='+', type=str, default=['ma'],
+                        choices=SUPPORTED_INDICATORS,
+                        help='指标列表, 例如: ma ema wma boll rsi macd')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='并发获取K线的线程数')
+    parser.add_argument('--boll_period', type=int, default=20, help='布林带周期')
+    parser.add_argument('--boll_k', type=float, default=2.0, help='布林带标准差倍数')
+    parser.add_argument('--rsi_period', type=int, default=14, help='RSI周期')
+    parser.add_argument('--macd', nargs=3, type=int, default=[12, 26, 9],
+                        metavar=('FAST', 'SLOW', 'SIGNAL'), help='MACD参数')
     
     args = parser.parse_args()
     
@@ -116,7 +149,9 @@ def main():
         # 创建行情对象
         quote_ctx = create_quote_context()
         results = get_stock_ma(
-            quote_ctx, args.code_list, args.ma_periods
+            quote_ctx, args.code_list, args.ma_periods, args.indicators,
+            concurrency=args.concurrency, boll_period=args.boll_period, boll_k=args.boll_k, rsi_period=args.rsi_period,
+            macd_fast=args.macd[0], macd_slow=args.macd[1], macd_signal=args.macd[2]
         )
         
         # 输出结果
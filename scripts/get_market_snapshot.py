@@ -1,39 +1,90 @@
 import argparse
 import sys
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from utils import (
-    setup_logger, create_quote_context, process_dataframe,
+    setup_logger, create_quote_context, process_dataframe, dataframe_to_columns,
     print_json_result, handle_exception, RET_OK
 )
 
 # 设置日志
 setup_logger()
 
-def get_market_snapshot(quote_ctx, code_list):
-    """获取多个股票的市场快照数据"""
+# OpenD 单次快照请求最多支持的代码数
+SNAPSHOT_MAX_CODES = 400
+
+def chunk_codes(code_list, size=SNAPSHOT_MAX_CODES):
+    """去重后按 size 个一组切分代码列表"""
+    unique_codes = list(dict.fromkeys(code_list))
+    return [unique_codes[i:i + size] for i in range(0, len(unique_codes), size)]
+
+def fetch_snapshot_chunk(quote_ctx, codes):
+    """获取一组代码的快照
+
+    Returns:
+        tuple: (DataFrame, None) 或 (None, 错误信息)
+    """
+    try:
+        ret_code, data_frame = quote_ctx.get_market_snapshot(codes)
+    except Exception as e:
+        return None, {"message": f"获取数据失败: {e}", "codes": codes}
+    if ret_code != RET_OK:
+        return None, {"message": f"获取数据失败: {data_frame}", "ret_code": ret_code, "codes": codes}
+    return data_frame, None
+
+def get_market_snapshot(quote_ctx, code_list, concurrency=1, columnar=False):
+    """获取多个股票的市场快照数据
+
+    超过单次请求上限的代码列表自动切分为多组并发获取，整体仍受请求调度器的 get_market_snapshot 额度限制
+
+    Args:
+        quote_ctx: 富途行情上下文，并发获取时各线程共享
+        code_list (list): 股票代码列表，数量不限
+        concurrency (int): 并发请求的线程数
+        columnar (bool): 是否以列式返回 {"columns": {列名: [...]}}，否则按股票代码组织
+
+    Returns:
+        dict: 部分分组失败时在 "errors" 中列出失败的分组，其余分组的结果照常返回；
+              全部失败时返回 "error"
+    """
+    chunks = chunk_codes(code_list)
+    if concurrency > 1 and len(chunks) > 1:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(chunks))) as executor:
+            fetched = list(executor.map(lambda codes: fetch_snapshot_chunk(quote_ctx, codes), chunks))
+    else:
+        fetched = [fetch_snapshot_chunk(quote_ctx, codes) for codes in chunks]
+
+    frames = [frame for frame, _ in fetched if frame is not None]
+    errors = [error for _, error in fetched if error is not None]
+    if not frames:
+        error = {"message": "获取数据失败"}
+        if errors:
+            error.update({k: v for k, v in errors[0].items() if k != "codes"})
+        return {"error": error}
+
+    data_frame = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
     results = {}
-    
-    # 使用SDK提供的批量查询功能，一次性获取所有股票的快照
-    ret_code, data_frame = quote_ctx.get_market_snapshot(code_list)
-    
-    if ret_code == RET_OK:
-        # 处理数据
-        processed_data = process_dataframe(data_frame)
-        
+    if columnar:
+        results["columns"] = dataframe_to_columns(data_frame)
+    else:
         # 将结果按股票代码组织
-        for item in processed_data:
+        for item in process_dataframe(data_frame):
             code = item.get('code', '')
             if code not in results:
                 results[code] = []
             results[code].append(item)
-    else:
-        results["error"] = {"message": "获取数据失败", "ret_code": ret_code}
-    
+    if errors:
+        results["errors"] = errors
     return results
 
 def main():
     parser = argparse.ArgumentParser(description='获取股票市场快照数据')
     parser.add_argument('--code_list', nargs='+', type=str, required=True,
-                        help='股票代码列表, 例如: HK.00700 US.AAPL')
+                        help='股票代码列表, 例如: HK.00700 US.AAPL，超过400个时自动分组请求')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='分组并发请求的线程数')
+    parser.add_argument('--columnar', action='store_true',
+                        help='以列式返回结果 {"columns": {列名: [...]}}')
     
     args = parser.parse_args()
     code_list = args.code_list
@@ -42,7 +93,7 @@ def main():
     try:
         # 创建行情对象
         quote_ctx = create_quote_context()
-        results = get_market_snapshot(quote_ctx, code_list)
+        results = get_market_snapshot(quote_ctx, code_list, args.concurrency, args.columnar)
         
         # 输出结果
         print_json_result(results)
@@ -0,0 +1,157 @@
+"""技术指标计算引擎
+
+所有指标均基于 numpy 整列计算，输入为一维(单只股票)或二维(多只股票，每行一只、按时间对齐)的价格数组，
+输出与输入形状相同的数组，数据不足的位置为 NaN。
+"""
+import numpy as np
+
+# 支持的指标名称
+SUPPORTED_INDICATORS = ('ma', 'ema', 'wma', 'boll', 'rsi', 'macd')
+
+
+def _window_sum(cumsum, period):
+    """由带前导0的累加和计算滑动窗口和，前 period-1 个位置为 NaN"""
+    n = cumsum.shape[-1] - 1
+    out = np.full(cumsum.shape[:-1] + (n,), np.nan)
+    if period <= n:
+        out[..., period - 1:] = cumsum[..., period:] - cumsum[..., :n - period + 1]
+    return out
+
+
+def _cumsum(values):
+    """沿时间轴的累加和，前补一个0便于做差"""
+    pad = np.zeros(values.shape[:-1] + (1,))
+    return np.concatenate([pad, np.cumsum(values, axis=-1)], axis=-1)
+
+
+def _ewm(values, alpha, start=0):
+    """从 start 位置起的指数加权递推: y[t] = alpha * x[t] + (1 - alpha) * y[t-1]，y[start] = x[start]"""
+    out = np.full(values.shape, np.nan)
+    n = values.shape[-1]
+    if start >= n:
+        return out
+    if values.ndim == 1:
+        # 单行时用Python浮点数递推，避免逐元素numpy标量运算的开销
+        series = values[start:].tolist()
+        prev = series[0]
+        result = [prev]
+        decay = 1 - alpha
+        for x in series[1:]:
+            prev = alpha * x + decay * prev
+            result.append(prev)
+        out[start:] = result
+    else:
+        prev = values[..., start].copy()
+        out[..., start] = prev
+        for t in range(start + 1, n):
+            prev = alpha * values[..., t] + (1 - alpha) * prev
+            out[..., t] = prev
+    return out
+
+
+def sma(values, periods):
+    """简单移动平均，一次累加和计算所有周期
+
+    Returns:
+        dict: {周期: 均线数组}
+    """
+    values = np.asarray(values, dtype='f8')
+    cumsum = _cumsum(values)
+    return {period: _window_sum(cumsum, period) / period for period in periods}
+
+
+def ema(values, period, start=0):
+    """指数移动平均(alpha = 2 / (period + 1))，以第一个有效值为初值，前 period-1 个位置为 NaN"""
+    values = np.asarray(values, dtype='f8')
+    out = _ewm(values, 2.0 / (period + 1), start)
+    out[..., :start + period - 1] = np.nan
+    return out
+
+
+def wma(values, period):
+    """线性加权移动平均，窗口内最新一根权重为 period、最早一根为 1"""
+    values = np.asarray(values, dtype='f8')
+    n = values.shape[-1]
+    index = np.arange(1, n + 1, dtype='f8')
+    plain = _window_sum(_cumsum(values), period)
+    weighted = _window_sum(_cumsum(values * index), period)
+    # 窗口 [t-period+1, t] 内 sum((j - (t - period)) * x_j) = weighted - (t + 1 - period) * plain
+    offset = index - period
+    return (weighted - offset * plain) / (period * (period + 1) / 2)
+
+
+def bollinger(values, period=20, k=2.0):
+    """布林带(总体标准差)
+
+    Returns:
+        tuple: (中轨, 上轨, 下轨)
+    """
+    values = np.asarray(values, dtype='f8')
+    mid = _window_sum(_cumsum(values), period) / period
+    mean_sq = _window_sum(_cumsum(values * values), period) / period
+    std = np.sqrt(np.maximum(mean_sq - mid * mid, 0))
+    return mid, mid + k * std, mid - k * std
+
+
+def rsi(values, period=14):
+    """相对强弱指标，涨跌幅采用 Wilder 平滑(alpha = 1 / period)"""
+    values = np.asarray(values, dtype='f8')
+    out = np.full(values.shape, np.nan)
+    if values.shape[-1] <= period:
+        return out
+    diff = np.diff(values, axis=-1)
+    avg_gain = _ewm(np.maximum(diff, 0), 1.0 / period)
+    avg_loss = _ewm(np.maximum(-diff, 0), 1.0 / period)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        value = np.where(avg_loss == 0, 100.0, 100 - 100 / (1 + avg_gain / avg_loss))
+    out[..., period:] = value[..., period - 1:]
+    return out
+
+
+def macd(values, fast=12, slow=26, signal=9):
+    """MACD
+
+    Returns:
+        tuple: (DIF, DEA, MACD柱)，MACD柱按国内习惯为 2 * (DIF - DEA)
+    """
+    values = np.asarray(values, dtype='f8')
+    dif = _ewm(values, 2.0 / (fast + 1)) - _ewm(values, 2.0 / (slow + 1))
+    dif[..., :slow - 1] = np.nan
+    dea = ema(np.nan_to_num(dif), signal, start=slow - 1)
+    return dif, dea, 2 * (dif - dea)
+
+
+def compute_indicators(close, indicators=('ma',), periods=(5, 10, 20), boll_period=20, boll_k=2.0,
+                       rsi_period=14, macd_fast=12, macd_slow=26, macd_signal=9):
+    """按指标列表一次性计算所有指标
+
+    Args:
+        close: 收盘价数组，一维或二维(每行一只股票)
+        indicators (list): 指标名称列表，可选 ma、ema、wma、boll、rsi、macd
+        periods (list): ma/ema/wma 使用的周期列表
+
+    Returns:
+        dict: {列名: 数组}，例如 ma5、ema10、wma20、boll_mid、rsi14、macd_dif
+    """
+    close = np.asarray(close, dtype='f8')
+    columns = {}
+    for name in indicators:
+        name = name.lower()
+        if name == 'ma':
+            for period, values in sma(close, periods).items():
+                columns[f'ma{period}'] = values
+        elif name == 'ema':
+            for period in periods:
+                columns[f'ema{period}'] = ema(close, period)
+        elif name == 'wma':
+            for period in periods:
+                columns[f'wma{period}'] = wma(close, period)
+        elif name == 'boll':
+            columns['boll_mid'], columns['boll_upper'], columns['boll_lower'] = bollinger(close, boll_period, boll_k)
+        elif name == 'rsi':
+            columns[f'rsi{rsi_period}'] = rsi(close, rsi_period)
+        elif name == 'macd':
+            columns['macd_dif'], columns['macd_dea'], columns['macd_hist'] = macd(close, macd_fast, macd_slow, macd_signal)
+        else:
+            raise ValueError(f"不支持的指标: {name}, 支持的指标: {list(SUPPORTED_INDICATORS)}")
+    return columns
@@ -0,0 +1,82 @@
+"""由1分钟K线重采样为更大周期的分钟K线
+
+本地存储的1分钟K线(kline_store.BAR_DTYPE)按交易时段向量化合成 3/5/15/30/60 分钟K线，
+K线以结束时间标记，与 OpenD 返回的分钟K线一致：每个时段从开盘起每 N 分钟一根，最后一根截止于收盘，
+开盘集合竞价的1分钟K线归入第一根(见 market_sessions.bar_end_minutes)。
+"""
+import numpy as np
+from kline_store import BAR_DTYPE
+from market_sessions import CODE_MARKETS, HALF_DAY_CLOSE, day_session_minutes, bar_end_minutes
+
+# 可由1分钟K线合成的K线类型 -> 分钟数
+RESAMPLE_MINUTES = {
+    'K_3M': 3,
+    'K_5M': 5,
+    'K_15M': 15,
+    'K_30M': 30,
+    'K_60M': 60,
+}
+
+SECONDS_PER_DAY = 86400
+
+
+def resample_market(code):
+    """返回可按交易时段重采样的市场，代码前缀未知时返回 None"""
+    return CODE_MARKETS.get(code.split('.', 1)[0].upper())
+
+
+def bar_labels(times, minutes, market, day_type=None):
+    """计算每根1分钟K线所属的大周期K线结束时间(秒)
+
+    Args:
+        times (ndarray): 1分钟K线的结束时间(交易所当地时间的秒级时间戳)
+        day_type (callable): (market, 日期字符串) -> WHOLE/MORNING/AFTERNOON，只用于有半日市提前收盘的市场
+    """
+    days = times // SECONDS_PER_DAY
+    # 1分钟K线以结束时间标记，按开始时间归入大周期K线
+    starts = (times % SECONDS_PER_DAY) // 60 - 1
+    labels = bar_end_minutes(starts, day_session_minutes(market), minutes)
+    if day_type is not None and market in HALF_DAY_CLOSE:
+        # 单一时段市场的半日市提前收盘，最后一根K线截止于提前收盘的时间
+        sessions = day_session_minutes(market, 'MORNING')
+        for day in np.unique(days):
+            day_str = str(np.datetime64(int(day), 'D'))
+            if day_type(market, day_str) == 'MORNING':
+                mask = days == day
+                labels[mask] = bar_end_minutes(starts[mask], sessions, minutes)
+    return days * SECONDS_PER_DAY + labels * 60
+
+
+def resample_bars(bars, minutes, market, day_type=None):
+    """将按时间排序的1分钟K线合成为 minutes 分钟K线
+
+    开盘价取第一根，收盘价、市盈率取最后一根，最高/最低取极值，成交量、成交额与换手率求和，
+    昨收取第一根1分钟K线的昨收(即上一根K线的收盘价)
+
+    Returns:
+        ndarray: BAR_DTYPE 结构化数组
+    """
+    if len(bars) == 0:
+        return np.empty(0, dtype=BAR_DTYPE)
+    labels = bar_labels(np.asarray(bars['time']), minutes, market, day_type)
+    # 标签随时间单调不减，相邻相同的标签即为同一根K线
+    starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+    ends = np.r_[starts[1:], len(bars)] - 1
+    result = np.empty(len(starts), dtype=BAR_DTYPE)
+    result['time'] = labels[starts]
+    result['open'] = bars['open'][starts]
+    result['close'] = bars['close'][ends]
+    result['high'] = np.maximum.reduceat(bars['high'], starts)
+    result['low'] = np.minimum.reduceat(bars['low'], starts)
+    result['volume'] = np.add.reduceat(bars['volume'], starts)
+    result['turnover'] = np.add.reduceat(bars['turnover'], starts)
+    result['turnover_rate'] = np.add.reduceat(bars['turnover_rate'], starts)
+    result['pe_ratio'] = bars['pe_ratio'][ends]
+    result['last_close'] = bars['last_close'][starts]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result['change_rate'] = np.where(
+            result['last_close'] > 0,
+            (result['close'] - result['last_close']) / result['last_close'] * 100,
+            np.nan,
+        )
+    return result
@@ -0,0 +1,217 @@
+"""本地K线存储
+
+按 (code, ktype, autype) 将已获取的历史K线保存为 numpy 结构化数组(.npy)，
+读取时以内存映射方式打开并按时间二分切片，不复制数据。
+meta.json 记录已覆盖的日期区间，用于计算需要向OpenD补齐的缺口。
+"""
+import os
+import re
+import json
+import threading
+from datetime import date, datetime, timedelta
+import numpy as np
+
+# 默认存储目录，可通过环境变量覆盖
+DEFAULT_STORE_ROOT = os.environ.get(
+    'FUTU_KLINE_STORE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'kline')
+)
+
+# 存储的K线列(time 为 time_key 对应的秒级时间戳)
+BAR_DTYPE = np.dtype([
+    ('time', 'i8'),
+    ('open', 'f8'),
+    ('close', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('pe_ratio', 'f8'),
+    ('turnover_rate', 'f8'),
+    ('volume', 'i8'),
+    ('turnover', 'f8'),
+    ('change_rate', 'f8'),
+    ('last_close', 'f8'),
+])
+
+# 输出列顺序，与SDK返回的DataFrame保持一致
+OUTPUT_COLUMNS = ['code', 'name', 'time_key'] + list(BAR_DTYPE.names[1:])
+
+
+def parse_date(value):
+    """将 yyyy-MM-dd(或带时间)字符串转换为 date"""
+    if value is None:
+        return None
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def time_keys_to_seconds(time_keys):
+    """将 time_key 字符串数组转换为秒级时间戳数组"""
+    return np.asarray(time_keys, dtype='datetime64[s]').astype('i8')
+
+
+def seconds_to_time_keys(seconds):
+    """将秒级时间戳数组转换为 'yyyy-MM-dd HH:mm:ss' 字符串数组"""
+    text = np.datetime_as_string(np.asarray(seconds, dtype='i8').astype('datetime64[s]'))
+    return np.char.replace(text, 'T', ' ')
+
+
+def merge_ranges(ranges):
+    """合并重叠或相邻的日期区间(序数表示，闭区间)"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def subtract_ranges(start, end, covered):
+    """返回 [start, end] 中未被 covered 覆盖的区间(序数表示，闭区间)"""
+    missing = []
+    cursor = start
+    for covered_start, covered_end in covered:
+        if covered_end < cursor:
+            continue
+        if covered_start > end:
+            break
+        if covered_start > cursor:
+            missing.append([cursor, covered_start - 1])
+        cursor = max(cursor, covered_end + 1)
+        if cursor > end:
+            break
+    if cursor <= end:
+        missing.append([cursor, end])
+    return missing
+
+
+class KLineStore:
+    """按 (code, ktype, autype) 组织的本地K线存储"""
+    def __init__(self, root=None):
+        self.root = os.path.abspath(root or DEFAULT_STORE_ROOT)
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def _key_dir(self, code, ktype, autype):
+        name = re.sub(r'[^0-9A-Za-z_.-]', '_', f"{ktype}_{autype}")
+        return os.path.join(self.root, re.sub(r'[^0-9A-Za-z_.-]', '_', code), name)
+
+    def lock(self, code, ktype, autype):
+        """返回同一键的进程内互斥锁，补齐缺口时避免重复请求"""
+        key = (code, str(ktype), str(autype))
+        with self._locks_guard:
+            if key not in self._locks:
+                self._locks[key] = threading.Lock()
+            return self._locks[key]
+
+    def load_meta(self, code, ktype, autype):
+        """读取元数据，不存在时返回空元数据"""
+        path = os.path.join(self._key_dir(code, ktype, autype), 'meta.json')
+        if not os.path.exists(path):
+            return {"name": "", "ranges": []}
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def load_bars(self, code, ktype, autype):
+        """以内存映射方式打开已存储的K线，不存在时返回空数组"""
+        path = os.path.join(self._key_dir(code, ktype, autype), 'bars.npy')
+        if not os.path.exists(path):
+            return np.empty(0, dtype=BAR_DTYPE)
+        return np.load(path, mmap_mode='r')
+
+    def missing_ranges(self, code, ktype, autype, start, end):
+        """计算 [start, end] 中本地尚未覆盖的日期区间
+
+        Returns:
+            list: [(date, date), ...] 闭区间列表
+        """
+        covered = self.load_meta(code, ktype, autype)["ranges"]
+        missing = subtract_ranges(start.toordinal(), end.toordinal(), covered)
+        return [(date.fromordinal(s), date.fromordinal(e)) for s, e in missing]
+
+    def read(self, code, ktype, autype, start, end):
+        """读取 [start, end] 日期范围内的K线，返回内存映射数组上的切片视图"""
+        bars = self.load_bars(code, ktype, autype)
+        if len(bars) == 0:
+            return bars
+        lo = time_keys_to_seconds([start.isoformat()])[0]
+        hi = time_keys_to_seconds([(end + timedelta(days=1)).isoformat()])[0]
+        times = bars['time']
+        return bars[np.searchsorted(times, lo, 'left'):np.searchsorted(times, hi, 'left')]
+
+    def write(self, code, ktype, autype, frame, covered, name=None):
+        """合并新获取的K线并记录新覆盖的日期区间
+
+        Args:
+            frame: SDK返回的K线 DataFrame(需包含全部字段)
+            covered (list): 本次已完整获取的 [(date, date), ...] 区间
+            name (str): 股票名称
+        """
+        key_dir = self._key_dir(code, ktype, autype)
+        os.makedirs(key_dir, exist_ok=True)
+
+        existing = self.load_bars(code, ktype, autype)
+        if frame is not None and len(frame) > 0:
+            new_bars = np.empty(len(frame), dtype=BAR_DTYPE)
+            new_bars['time'] = time_keys_to_seconds(frame['time_key'].to_numpy())
+            for column in BAR_DTYPE.names[1:]:
+                if column not in frame.columns:
+                    new_bars[column] = 0 if BAR_DTYPE[column].kind == 'i' else np.nan
+                    continue
+                values = frame[column].to_numpy(dtype='f8', na_value=np.nan)
+                new_bars[column] = np.nan_to_num(values) if BAR_DTYPE[column].kind == 'i' else values
+            # 新数据优先，按时间去重排序
+            combined = np.concatenate([new_bars, np.asarray(existing)])
+            _, first = np.unique(combined['time'], return_index=True)
+            bars = combined[first]
+        else:
+            bars = np.asarray(existing)
+
+        meta = self.load_meta(code, ktype, autype)
+        ranges = meta["ranges"] + [[s.toordinal(), e.toordinal()] for s, e in covered]
+        meta["ranges"] = merge_ranges(ranges)
+        if name:
+            meta["name"] = name
+
+        # 先写临时文件再原子替换，已打开的内存映射不受影响
+        bars_tmp = os.path.join(key_dir, f'bars.npy.{os.getpid()}.tmp')
+        with open(bars_tmp, 'wb') as f:
+            np.save(f, bars)
+        os.replace(bars_tmp, os.path.join(key_dir, 'bars.npy'))
+        meta_tmp = os.path.join(key_dir, f'meta.json.{os.getpid()}.tmp')
+        with open(meta_tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(meta_tmp, os.path.join(key_dir, 'meta.json'))
+
+    def update_meta(self, code, ktype, autype, **values):
+        """更新元数据中的附加字段(例如 adjust_checked)，不重写K线文件"""
+        key_dir = self._key_dir(code, ktype, autype)
+        if not os.path.exists(os.path.join(key_dir, 'meta.json')):
+            return
+        meta = self.load_meta(code, ktype, autype)
+        meta.update(values)
+        meta_tmp = os.path.join(key_dir, f'meta.json.{os.getpid()}.tmp')
+        with open(meta_tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(meta_tmp, os.path.join(key_dir, 'meta.json'))
+
+    def invalidate(self, code, ktype, autype):
+        """删除某个键的全部本地数据"""
+        key_dir = self._key_dir(code, ktype, autype)
+        for filename in ('bars.npy', 'meta.json'):
+            path = os.path.join(key_dir, filename)
+            if os.path.exists(path):
+                os.remove(path)
+
+
+_kline_store = None
+_kline_store_lock = threading.Lock()
+
+def get_kline_store():
+    """获取进程内共享的K线存储"""
+    global _kline_store
+    with _kline_store_lock:
+        if _kline_store is None:
+            _kline_store = KLineStore()
+        return _kline_store
@@ -0,0 +1,152 @@
+"""市场交易时段
+
+各市场常规交易时段(交易所当地时间)及相关的时间计算，供缓存过期、K线聚合与重采样使用。
+"""
+from datetime import datetime, timedelta, time as dt_time
+from zoneinfo import ZoneInfo
+import numpy as np
+
+# 市场 -> (时区, [(开盘, 收盘), ...])
+MARKET_SESSIONS = {
+    'HK': ('Asia/Hong_Kong', [('09:30', '12:00'), ('13:00', '16:00')]),
+    'US': ('America/New_York', [('09:30', '16:00')]),
+    'CN': ('Asia/Shanghai', [('09:30', '11:30'), ('13:00', '15:00')]),
+}
+
+# 单一交易时段市场半日市的提前收盘时间
+HALF_DAY_CLOSE = {
+    'US': '13:00',
+}
+
+# 代码前缀 -> 市场
+CODE_MARKETS = {
+    'HK': 'HK',
+    'US': 'US',
+    'SH': 'CN',
+    'SZ': 'CN',
+}
+
+
+def market_of(code):
+    """根据股票代码前缀返回市场，例如 HK.00700 -> HK，未知时默认 HK"""
+    return CODE_MARKETS.get(code.split('.', 1)[0].upper(), 'HK')
+
+
+def market_timezone(market):
+    """返回市场所在时区"""
+    return ZoneInfo(MARKET_SESSIONS[market][0])
+
+
+def session_times(market):
+    """返回市场各交易时段的 [(开盘 time, 收盘 time), ...]"""
+    return [
+        (dt_time.fromisoformat(start), dt_time.fromisoformat(end))
+        for start, end in MARKET_SESSIONS[market][1]
+    ]
+
+
+def session_minutes(market):
+    """返回各交易时段相对当天零点的 [(开盘分钟, 收盘分钟), ...]"""
+    return [
+        (start.hour * 60 + start.minute, end.hour * 60 + end.minute)
+        for start, end in session_times(market)
+    ]
+
+
+def day_session_minutes(market, day_type='WHOLE'):
+    """返回某类交易日实际开市的时段(分钟表示)
+
+    Args:
+        day_type (str): 交易日类型 WHOLE(全天)、MORNING(仅上午)、AFTERNOON(仅下午)
+    """
+    sessions = session_minutes(market)
+    if day_type == 'MORNING':
+        if len(sessions) > 1:
+            return sessions[:1]
+        close = HALF_DAY_CLOSE.get(market)
+        if close:
+            hour, minute = map(int, close.split(':'))
+            return [(sessions[0][0], hour * 60 + minute)]
+    elif day_type == 'AFTERNOON' and len(sessions) > 1:
+        return sessions[1:]
+    return sessions
+
+
+def is_weekday(day):
+    """默认交易日判断：周一至周五"""
+    return day.weekday() < 5
+
+
+def market_today(market, now=None):
+    """返回市场当地的日期，now 为带时区的时间，默认当前时间"""
+    now = now or datetime.now(market_timezone(market))
+    return now.astimezone(market_timezone(market)).date()
+
+
+def last_closed_day(market, now=None):
+    """返回最近一个已收盘的日期(市场当地时间)：当地收盘之后为当天，否则为前一天
+
+    早于该日期(含)的K线不会再变化，可以写入本地存储
+    """
+    now = (now or datetime.now(market_timezone(market))).astimezone(market_timezone(market))
+    close = session_times(market)[-1][1]
+    return now.date() if now.time() >= close else now.date() - timedelta(days=1)
+
+
+def next_session_close(market, after=None, is_trading_day=None):
+    """返回 after 之后最近的一次收盘时间(带时区)
+
+    Args:
+        market (str): 市场，例如 HK
+        after (datetime): 起算时间，默认当前时间；无时区时按市场当地时间处理
+        is_trading_day (callable): (market, date) -> bool，默认只排除周末
+    """
+    tz = market_timezone(market)
+    if after is None:
+        after = datetime.now(tz)
+    elif after.tzinfo is None:
+        after = after.replace(tzinfo=tz)
+    else:
+        after = after.astimezone(tz)
+    close = session_times(market)[-1][1]
+    day = after.date()
+    for _ in range(370):
+        trading = is_trading_day(market, day) if is_trading_day else is_weekday(day)
+        if trading:
+            close_at = datetime.combine(day, close, tzinfo=tz)
+            if close_at > after:
+                return close_at
+        day += timedelta(days=1)
+    raise ValueError(f"{market} 一年内没有交易日")
+
+
+def bar_end_minute(start, sessions, minutes):
+    """返回开始于 start 的成交所属K线的结束分钟(K线以结束时间标记)
+
+    每个时段从开盘起每 minutes 分钟一根，最后一根截止于收盘；开盘前与收盘后的成交
+    (集合竞价)归入所在时段的第一根与最后一根，午休期间归入上午最后一根。
+
+    Args:
+        start (float): 相对当天零点的分钟数，可带小数(逐笔成交时间)
+        sessions (list): day_session_minutes 返回的 [(开盘分钟, 收盘分钟), ...]
+        minutes (int): K线周期(分钟)
+    """
+    open_, close = sessions[0]
+    for session in sessions[1:]:
+        if start < session[0]:
+            break
+        open_, close = session
+    count = -(-(close - open_) // minutes)
+    k = min(max(int((start - open_) // minutes) + 1, 1), count)
+    return min(open_ + k * minutes, close)
+
+
+def bar_end_minutes(starts, sessions, minutes):
+    """bar_end_minute 的向量化版本，starts 为分钟数数组"""
+    opens = np.array([open_ for open_, _ in sessions])
+    closes = np.array([close for _, close in sessions])
+    index = np.maximum(np.searchsorted(opens, starts, 'right') - 1, 0)
+    open_, close = opens[index], closes[index]
+    count = -(-(close - open_) // minutes)
+    k = np.clip(np.floor((starts - open_) / minutes).astype(np.int64) + 1, 1, count)
+    return np.minimum(open_ + k * minutes, close)
@@ -0,0 +1,179 @@
+"""定深摆盘与盘口特征
+
+每只股票一个定长 numpy 数组保存买卖盘前 depth 档的价格、数量与委托笔数，
+摆盘推送(OrderBookHandlerBase 解析出的字典，Bid/Ask 为 (价格, 数量, 笔数, 明细) 列表)
+原地写入，上一次的盘口保存在第二个数组中，两者交替使用，更新时不创建 DataFrame。
+在此之上计算价差、微观价格、前 N 档挂单量失衡、各档排队量变化与最优档的委托流失衡(OFI)。
+"""
+import time
+import threading
+import numpy as np
+from futu import RET_OK, OrderBookHandlerBase
+
+DEFAULT_DEPTH = 10
+BID, ASK = 0, 1
+PRICE, VOLUME, ORDERS = 0, 1, 2
+
+
+class OrderBook:
+    """单只股票的定深摆盘"""
+    def __init__(self, depth=DEFAULT_DEPTH):
+        self.depth = depth
+        # [买/卖, 档位, 价格/数量/笔数]
+        self.levels = np.zeros((2, depth, 3))
+        self.prev = np.zeros((2, depth, 3))
+        self.sizes = [0, 0]         # 当前买卖盘的有效档数
+        self.prev_sizes = [0, 0]
+        self.updates = 0
+        self.ofi = 0.0              # 累计最优档委托流失衡
+        self.recv_time = None
+        self.lock = threading.Lock()
+
+    def update(self, bids, asks, recv_time=None):
+        """以一次摆盘推送的买卖盘覆盖当前盘口，原盘口转为上一次盘口"""
+        with self.lock:
+            self.levels, self.prev = self.prev, self.levels
+            self.prev_sizes = self.sizes
+            self.sizes = [self._fill(self.levels[BID], bids), self._fill(self.levels[ASK], asks)]
+            if self.updates:
+                self.ofi += float(self._best_ofi())
+            self.updates += 1
+            self.recv_time = time.time() if recv_time is None else recv_time
+
+    def _fill(self, side, levels):
+        n = min(len(levels), self.depth)
+        if n:
+            side[:n] = [level[:3] for level in levels[:n]]
+        side[n:] = 0
+        return n
+
+    def _best_ofi(self):
+        """最优档的委托流失衡: 买盘增加与卖盘减少为正"""
+        flow = 0.0
+        for side, sign in ((BID, 1), (ASK, -1)):
+            if not (self.sizes[side] and self.prev_sizes[side]):
+                continue
+            price, volume = self.levels[side, 0, PRICE], self.levels[side, 0, VOLUME]
+            prev_price, prev_volume = self.prev[side, 0, PRICE], self.prev[side, 0, VOLUME]
+            # 买盘价格上移、卖盘价格下移视为新挂单，反向移动视为原最优档被吃掉或撤单
+            better = (price - prev_price) * sign
+            if better > 0:
+                flow += sign * volume
+            elif better < 0:
+                flow -= sign * prev_volume
+            else:
+                flow += sign * (volume - prev_volume)
+        return flow
+
+    def queue_deltas(self, levels=None):
+        """当前各档相对上一次盘口同一价格的排队量变化，新出现的价格按上一次数量为0计算
+
+        Returns:
+            tuple: (买盘 [(价格, 变化)], 卖盘 [(价格, 变化)])
+        """
+        levels = self.depth if levels is None else min(levels, self.depth)
+        with self.lock:
+            result = []
+            for side in (BID, ASK):
+                n = min(levels, self.sizes[side])
+                prices = self.levels[side, :n, PRICE]
+                prev_n = self.prev_sizes[side]
+                prev_prices = self.prev[side, :prev_n, PRICE]
+                prev_volumes = self.prev[side, :prev_n, VOLUME]
+                # 同一价格在两次盘口中的档位可能不同，按价格对齐
+                matches = prices[:, None] == prev_prices[None, :]
+                previous = (matches * prev_volumes).sum(axis=1)
+                deltas = self.levels[side, :n, VOLUME] - previous
+                result.append([(float(p), float(d)) for p, d in zip(prices, deltas)])
+            return result[BID], result[ASK]
+
+    def features(self, levels=5):
+        """价差、中间价、微观价格、前 levels 档挂单量失衡与累计 OFI，任一侧为空时只返回档数"""
+        with self.lock:
+            result = {
+                "bid_levels": self.sizes[BID],
+                "ask_levels": self.sizes[ASK],
+                "updates": self.updates,
+                "ofi": self.ofi,
+                "recv_time": self.recv_time,
+            }
+            if not (self.sizes[BID] and self.sizes[ASK]):
+                return result
+            bid, ask = self.levels[BID], self.levels[ASK]
+            bid_price, bid_volume = bid[0, PRICE], bid[0, VOLUME]
+            ask_price, ask_volume = ask[0, PRICE], ask[0, VOLUME]
+            bid_depth = bid[:levels, VOLUME].sum()
+            ask_depth = ask[:levels, VOLUME].sum()
+            result.update({
+                "bid": float(bid_price),
+                "ask": float(ask_price),
+                "bid_volume": float(bid_volume),
+                "ask_volume": float(ask_volume),
+                "spread": float(ask_price - bid_price),
+                "mid": float((ask_price + bid_price) / 2),
+                # 按对侧挂单量加权：买盘厚时价格更可能向卖价移动
+                "microprice": float((bid_price * ask_volume + ask_price * bid_volume) / (bid_volume + ask_volume))
+                              if bid_volume + ask_volume else float((ask_price + bid_price) / 2),
+                "depth_levels": levels,
+                "bid_depth": float(bid_depth),
+                "ask_depth": float(ask_depth),
+                "depth_imbalance": float((bid_depth - ask_depth) / (bid_depth + ask_depth))
+                                   if bid_depth + ask_depth else 0.0,
+            })
+            return result
+
+    def snapshot(self):
+        """当前盘口 {"Bid": [(价格, 数量, 笔数)], "Ask": [...]}"""
+        with self.lock:
+            return {
+                "Bid": [tuple(map(float, level)) for level in self.levels[BID, :self.sizes[BID]]],
+                "Ask": [tuple(map(float, level)) for level in self.levels[ASK, :self.sizes[ASK]]],
+            }
+
+
+class OrderBooks:
+    """多只股票的定深摆盘，按需为新股票创建"""
+    def __init__(self, depth=DEFAULT_DEPTH):
+        self.depth = depth
+        self.books = {}
+        self.lock = threading.Lock()
+
+    def get(self, code, create=False):
+        book = self.books.get(code)
+        if book is None and create:
+            with self.lock:
+                book = self.books.setdefault(code, OrderBook(self.depth))
+        return book
+
+    def on_order_book(self, data, recv_time=None):
+        """处理一条摆盘推送字典"""
+        self.get(data['code'], create=True).update(data.get('Bid') or (), data.get('Ask') or (), recv_time)
+
+    def features(self, code_list=None, levels=5, include_deltas=False):
+        """多只股票的盘口特征 {code: features}，没有摆盘数据的股票列入 missing"""
+        code_list = list(self.books) if code_list is None else code_list
+        result, missing = {}, []
+        for code in code_list:
+            book = self.get(code)
+            if book is None:
+                missing.append(code)
+                continue
+            result[code] = book.features(levels)
+            if include_deltas:
+                bid_deltas, ask_deltas = book.queue_deltas(levels)
+                result[code]["bid_deltas"] = bid_deltas
+                result[code]["ask_deltas"] = ask_deltas
+        return {"data": result, "missing": missing}
+
+
+class OrderBookHandler(OrderBookHandlerBase):
+    """把摆盘推送写入 OrderBooks 的处理器，供策略在自己的行情连接上使用"""
+    def __init__(self, books):
+        super(OrderBookHandler, self).__init__()
+        self.books = books
+
+    def on_recv_rsp(self, rsp_pb):
+        ret_code, data = super(OrderBookHandler, self).on_recv_rsp(rsp_pb)
+        if ret_code == RET_OK:
+            self.books.on_order_book(data)
+        return ret_code, data
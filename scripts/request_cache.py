@@ -0,0 +1,113 @@
+"""请求结果缓存
+
+短TTL缓存加单飞(single-flight)：同一键在有效期内直接返回缓存结果，
+缓存失效时并发到达的相同请求只实际调用一次，其余请求等待并共享结果。
+"""
+import time
+import threading
+from collections import OrderedDict
+from futu import RET_OK
+
+
+def is_ok(result):
+    """默认只缓存 ret_code 为 RET_OK 的 SDK 返回结果"""
+    return isinstance(result, tuple) and len(result) > 0 and result[0] == RET_OK
+
+
+class _Flight:
+    """进行中的一次调用"""
+    __slots__ = ('event', 'value', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class RequestCache:
+    """带TTL与请求合并的结果缓存"""
+    def __init__(self, ttl=3.0, max_entries=4096, cache_if=is_ok):
+        """
+        Args:
+            ttl (float): 默认有效期(秒)
+            max_entries (int): 最多缓存的键数，超出时淘汰最早写入的键
+            cache_if (callable): 结果 -> bool，决定结果是否写入缓存，默认只缓存成功结果
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.cache_if = cache_if
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (过期时间, 结果)
+        self._inflight = {}             # key -> _Flight
+        self.hits = 0                   # 命中缓存
+        self.misses = 0                 # 实际发起调用
+        self.coalesced = 0              # 等待并共享进行中的调用
+        self.errors = 0                 # 调用抛出异常
+
+    def get(self, key, loader, ttl=None):
+        """返回 key 的结果，缓存失效时调用 loader()
+
+        Args:
+            key: 可哈希的缓存键，例如 ('snapshot', 'HK.800000')
+            loader (callable): 无参函数，返回要缓存的结果
+            ttl (float): 本次写入的有效期，默认使用构造时的 ttl
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+        except BaseException as e:
+            flight.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                if flight.error is None and self.cache_if(flight.value):
+                    self._entries.pop(key, None)
+                    self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), flight.value)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                del self._inflight[key]
+            flight.event.set()
+        return flight.value
+
+    def invalidate(self, key=None):
+        """删除一个键的缓存，key 为 None 时清空"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        """返回命中率等统计，合并的请求计为命中"""
+        with self._lock:
+            total = self.hits + self.misses + self.coalesced
+            return {
+                'entries': len(self._entries),
+                'inflight': len(self._inflight),
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'errors': self.errors,
+                'hit_rate': (self.hits + self.coalesced) / total if total else 0.0,
+            }
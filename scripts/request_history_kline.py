@@ -1,21 +1,98 @@
 import argparse
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
 from futu import KLType, AuType, KL_FIELD
 from utils import (
     setup_logger, create_quote_context, process_dataframe,
-    print_json_result, handle_exception, RET_OK
+    print_json_result, print_json_line, handle_exception, RET_OK
 )
+from kline_store import (
+    get_kline_store, parse_date, time_keys_to_seconds, seconds_to_time_keys,
+    subtract_ranges, OUTPUT_COLUMNS
+)
+from kline_resample import RESAMPLE_MINUTES, resample_market, resample_bars
+from trading_calendar import trading_day_type
+from market_sessions import market_of, market_today, last_closed_day
 
 # 设置日志
 setup_logger()
 
-def request_history_kline(quote_ctx, code, start=None, end=None, ktype=KLType.K_DAY, 
-                          autype=AuType.QFQ, fields=[KL_FIELD.ALL], max_count=1000, 
-                          extended_time=False):
-    """获取股票的历史K线数据"""
-    results = {}
-    page_req_key = None
-    all_data = []
+# K线类型参数映射
+KTYPE_MAP = {
+    'K_DAY': KLType.K_DAY,
+    'K_WEEK': KLType.K_WEEK,
+    'K_MON': KLType.K_MON,
+    'K_YEAR': KLType.K_YEAR,
+    'K_1M': KLType.K_1M,
+    'K_5M': KLType.K_5M,
+    'K_15M': KLType.K_15M,
+    'K_30M': KLType.K_30M,
+    'K_60M': KLType.K_60M,
+    'K_3M': KLType.K_3M,
+    'K_QUARTER': KLType.K_QUARTER,
+    'NONE': KLType.NONE
+}
+
+# 复权类型参数映射
+AUTYPE_MAP = {
+    0: AuType.NONE,
+    1: AuType.QFQ,
+    2: AuType.HFQ
+}
+
+def parse_ktype(ktype_str):
+    """将字符串形式的K线类型转换为 KLType，未知类型默认为日K线"""
+    return KTYPE_MAP.get(ktype_str, KLType.K_DAY)
+
+def parse_autype(autype):
+    """将整数形式的复权类型转换为 AuType，未知类型默认为前复权"""
+    return AUTYPE_MAP.get(autype, AuType.QFQ)
+
+def parse_fields(field_list):
+    """将字段名列表转换为 KL_FIELD 列表，为空时返回 [KL_FIELD.ALL]"""
+    fields = []
+    for field in field_list or []:
+        if field == 'ALL':
+            fields.append(KL_FIELD.ALL)
+        elif hasattr(KL_FIELD, field):
+            fields.append(getattr(KL_FIELD, field))
     
+    # 如果fields为空，则使用默认值
+    if not fields:
+        fields = [KL_FIELD.ALL]
+    return fields
+
+# 可使用本地存储的K线类型：周/月/季/年K线的最后一根会随当期变化，不做存储
+STORABLE_KTYPES = {
+    KLType.K_DAY, KLType.K_1M, KLType.K_3M, KLType.K_5M,
+    KLType.K_15M, KLType.K_30M, KLType.K_60M
+}
+
+# 字段对应的输出列
+FIELD_COLUMNS = {
+    KL_FIELD.DATE_TIME: 'time_key',
+    KL_FIELD.HIGH: 'high',
+    KL_FIELD.OPEN: 'open',
+    KL_FIELD.LOW: 'low',
+    KL_FIELD.CLOSE: 'close',
+    KL_FIELD.LAST_CLOSE: 'last_close',
+    KL_FIELD.TRADE_VOL: 'volume',
+    KL_FIELD.TRADE_VAL: 'turnover',
+    KL_FIELD.TURNOVER_RATE: 'turnover_rate',
+    KL_FIELD.PE_RATIO: 'pe_ratio',
+    KL_FIELD.CHANGE_RATE: 'change_rate',
+}
+
+def iter_history_kline_pages(quote_ctx, code, start=None, end=None, ktype=KLType.K_DAY,
+                             autype=AuType.QFQ, fields=[KL_FIELD.ALL], max_count=1000,
+                             extended_time=False):
+    """逐页获取历史K线
+
+    Yields:
+        tuple: (ret_code, data_frame)，失败时 data_frame 为错误信息且不再继续翻页
+    """
+    page_req_key = None
     while True:
         # 调用SDK提供的历史K线查询接口
         ret_code, data_frame, next_page_req_key = quote_ctx.request_history_kline(
@@ -23,26 +100,296 @@ def request_history_kline(quote_ctx, code, start=None, end=None, ktype=KLType.K_
             fields=fields, max_count=max_count, page_req_key=page_req_key,
             extended_time=extended_time
         )
+        yield ret_code, data_frame
         
-        if ret_code == RET_OK:
-            # 处理数据
-            if not data_frame.empty:
-                processed_data = process_dataframe(data_frame)
-                all_data.extend(processed_data)
+        # 失败或没有更多数据时结束
+        if ret_code != RET_OK or next_page_req_key is None:
+            break
+        page_req_key = next_page_req_key
+
+def fetch_history_kline_frame(quote_ctx, code, start, end, ktype, autype, max_count=1000):
+    """获取 [start, end] 范围内的全部K线并合并为一个 DataFrame
+
+    Returns:
+        tuple: (ret_code, data_frame 或错误信息)
+    """
+    frames = []
+    for ret_code, data_frame in iter_history_kline_pages(
+            quote_ctx, code, start.isoformat(), end.isoformat(), ktype, autype,
+            [KL_FIELD.ALL], max_count):
+        if ret_code != RET_OK:
+            return ret_code, data_frame
+        if not data_frame.empty:
+            frames.append(data_frame)
+    if not frames:
+        return RET_OK, pd.DataFrame(columns=OUTPUT_COLUMNS)
+    return RET_OK, pd.concat(frames, ignore_index=True)
+
+def adjustment_changed(stored_bars, data_frame):
+    """检查新获取的数据与本地重叠部分的价格是否一致
+
+    前复权价格会在除权除息后整体改变，重叠部分不一致时说明本地数据已失效。
+    """
+    if len(stored_bars) == 0 or data_frame.empty:
+        return False
+    times = time_keys_to_seconds(data_frame['time_key'].to_numpy())
+    stored_times = np.asarray(stored_bars['time'])
+    positions = np.searchsorted(stored_times, times)
+    positions = np.minimum(positions, len(stored_times) - 1)
+    overlap = stored_times[positions] == times
+    if not overlap.any():
+        return False
+    fetched_close = data_frame['close'].to_numpy(dtype='f8')[overlap]
+    stored_close = np.asarray(stored_bars['close'])[positions[overlap]]
+    return not np.allclose(fetched_close, stored_close, rtol=1e-6, equal_nan=True)
+
+def adjustment_check_due(store, code, ktype, autype, stored_bars, last_stable):
+    """前复权数据自上次比对以来是否又有交易日收盘，需要重新比对复权价格"""
+    return (autype == AuType.QFQ and len(stored_bars) > 0
+            and store.load_meta(code, ktype, autype).get("adjust_checked", "") < last_stable.isoformat())
+
+def check_adjustment(quote_ctx, code, ktype, autype, stored_bars, max_count=1000):
+    """向OpenD获取最新一根已存储K线所在日期的K线，与本地比对复权价格
+
+    本地已完整覆盖时没有缺口可比对，除权后前复权价格会整体改变，需要单独检查
+
+    Returns:
+        tuple: (ret_code, 价格是否已变化或错误信息)
+    """
+    last_day = parse_date(seconds_to_time_keys(np.asarray(stored_bars['time'][-1:]))[0])
+    ret_code, data_frame = fetch_history_kline_frame(quote_ctx, code, last_day, last_day, ktype, autype, max_count)
+    if ret_code != RET_OK:
+        return ret_code, data_frame
+    return RET_OK, adjustment_changed(stored_bars, data_frame)
+
+def select_columns(fields):
+    """根据字段列表返回需要输出的列"""
+    if KL_FIELD.ALL in fields:
+        return OUTPUT_COLUMNS
+    selected = {FIELD_COLUMNS[field] for field in fields if field in FIELD_COLUMNS}
+    return [column for column in OUTPUT_COLUMNS if column in ('code', 'name') or column in selected]
+
+def stored_bars_to_frame(code, name, bars):
+    """将存储的K线数组转换为与SDK返回结构一致的 DataFrame"""
+    data_frame = pd.DataFrame({column: bars[column] for column in bars.dtype.names if column != 'time'})
+    data_frame.insert(0, 'time_key', seconds_to_time_keys(bars['time']))
+    data_frame.insert(0, 'name', name)
+    data_frame.insert(0, 'code', code)
+    return data_frame
+
+def ensure_history_kline_stored(quote_ctx, store, code, start=None, end=None, ktype=KLType.K_DAY,
+                                autype=AuType.QFQ, max_count=1000):
+    """向OpenD补齐本地K线存储中缺失的日期区间，并读出区间内的已存储K线
+
+    市场当地尚未收盘的K线仍在变化，只返回不落盘；补齐缺口时会多取相邻的一根已存储K线，
+    若价格与本地不一致(如前复权遇到除权)则清空本地数据后整体重新获取。
+    前复权数据即使没有缺口，每有一个交易日收盘也会向OpenD重新获取最新一根已存储K线所在日期比对一次。
+
+    Returns:
+        tuple: (ret_code, 错误信息或 (区间内的已存储K线, 股票名称, 当天仍在变化的K线 DataFrame 列表))
+    """
+    market = market_of(code)
+    end_date = parse_date(end) or market_today(market)
+    start_date = parse_date(start) or end_date - timedelta(days=365)
+    # time_key 为交易所当地时间，按该市场的收盘判断K线是否已固定，与本机时区无关
+    last_stable = last_closed_day(market)
+    
+    with store.lock(code, ktype, autype):
+        for _ in range(2):
+            stored_bars = store.load_bars(code, ktype, autype)
+            stored_dates = seconds_to_time_keys(np.asarray(stored_bars['time'])).astype('U10') \
+                if len(stored_bars) else np.empty(0, dtype='U10')
+            
+            fetched, covered, live, name = [], [], [], None
+            invalidated = False
+            verified = False            # 本次是否已从OpenD获取数据并与本地比对过复权价格
+            for gap_start, gap_end in store.missing_ranges(code, ktype, autype, start_date, end_date):
+                # 向两侧各扩展到相邻的已存储K线，用于校验价格一致性
+                before = np.searchsorted(stored_dates, gap_start.isoformat(), 'left')
+                after = np.searchsorted(stored_dates, gap_end.isoformat(), 'right')
+                fetch_start = parse_date(stored_dates[before - 1]) if before > 0 else gap_start
+                fetch_end = parse_date(stored_dates[after]) if after < len(stored_dates) else gap_end
+                
+                ret_code, data_frame = fetch_history_kline_frame(
+                    quote_ctx, code, fetch_start, fetch_end, ktype, autype, max_count
+                )
+                if ret_code != RET_OK:
+                    return ret_code, data_frame
+                if adjustment_changed(stored_bars, data_frame):
+                    invalidated = True
+                    break
+                verified = True     # 刚从OpenD获取的数据即为当前的复权价格
+                
+                if not data_frame.empty:
+                    name = data_frame['name'].iloc[0] if 'name' in data_frame.columns else name
+                    is_live = data_frame['time_key'].str[:10] > last_stable.isoformat()
+                    fetched.append(data_frame[~is_live])
+                    live.append(data_frame[is_live])
+                if gap_start <= last_stable:
+                    covered.append((gap_start, min(gap_end, last_stable)))
             
-            # 检查是否还有更多数据需要获取
-            if next_page_req_key is None:
+            if (not invalidated and not verified
+                    and adjustment_check_due(store, code, ktype, autype, stored_bars, last_stable)):
+                ret_code, invalidated = check_adjustment(quote_ctx, code, ktype, autype, stored_bars, max_count)
+                if ret_code != RET_OK:
+                    return ret_code, invalidated
+                verified = not invalidated
+            
+            if not invalidated:
                 break
+            # 复权价格已变化，清空后整体重新获取
+            store.invalidate(code, ktype, autype)
+        
+        if fetched or covered:
+            frame = pd.concat(fetched, ignore_index=True) if fetched else None
+            store.write(code, ktype, autype, frame, covered, name)
+        if verified and autype == AuType.QFQ:
+            store.update_meta(code, ktype, autype, adjust_checked=last_stable.isoformat())
+        bars = store.read(code, ktype, autype, start_date, end_date)
+        name = name or store.load_meta(code, ktype, autype)["name"]
+    return RET_OK, (bars, name, live)
+
+def iter_history_kline_stored(quote_ctx, store, code, start=None, end=None, ktype=KLType.K_DAY,
+                              autype=AuType.QFQ, fields=[KL_FIELD.ALL], max_count=1000):
+    """通过本地K线存储逐页获取历史K线，只向OpenD请求本地缺失的日期区间(见 ensure_history_kline_stored)
+
+    Yields:
+        tuple: (ret_code, 每页最多 max_count 条的记录列表或错误信息)
+    """
+    ret_code, result = ensure_history_kline_stored(quote_ctx, store, code, start, end, ktype, autype, max_count)
+    if ret_code != RET_OK:
+        yield ret_code, result
+        return
+    bars, name, live = result
+    
+    # 输出：本地存储的K线按页切片，之后是当天仍在变化的K线
+    columns = select_columns(fields)
+    for offset in range(0, len(bars), max_count):
+        page = stored_bars_to_frame(code, name, bars[offset:offset + max_count])
+        yield RET_OK, process_dataframe(page[columns])
+    for data_frame in live:
+        if not data_frame.empty:
+            yield RET_OK, process_dataframe(data_frame[columns])
+
+def iter_history_kline_resampled(quote_ctx, store, code, start=None, end=None, ktype=KLType.K_5M,
+                                 autype=AuType.QFQ, fields=[KL_FIELD.ALL], max_count=1000):
+    """由本地存储的1分钟K线按交易时段合成分钟K线，1分钟K线未覆盖的日期向OpenD获取 ktype 本身
+
+    日期区间按顺序分段：1分钟K线已覆盖的日期本地合成，其余日期(包括当天)交给 iter_history_kline_stored，
+    OpenD 只需返回缺失日期的 ktype K线。
+
+    Yields:
+        tuple: (ret_code, 每页最多 max_count 条的记录列表或错误信息)
+    """
+    end_date = parse_date(end) or market_today(market_of(code))
+    start_date = parse_date(start) or end_date - timedelta(days=365)
+    minutes = RESAMPLE_MINUTES[str(ktype)]
+    market = resample_market(code)
+    
+    # 合成使用的1分钟K线同样需要定期比对前复权价格，已变化时清空，全部日期改为向OpenD获取
+    last_stable = last_closed_day(market_of(code))
+    with store.lock(code, KLType.K_1M, autype):
+        minute_bars = store.load_bars(code, KLType.K_1M, autype)
+        if adjustment_check_due(store, code, KLType.K_1M, autype, minute_bars, last_stable):
+            ret_code, changed = check_adjustment(quote_ctx, code, KLType.K_1M, autype, minute_bars, max_count)
+            if ret_code != RET_OK:
+                yield ret_code, changed
+                return
+            if changed:
+                store.invalidate(code, KLType.K_1M, autype)
             else:
-                page_req_key = next_page_req_key
-        else:
+                store.update_meta(code, KLType.K_1M, autype, adjust_checked=last_stable.isoformat())
+    
+    missing = [(s.toordinal(), e.toordinal())
+               for s, e in store.missing_ranges(code, KLType.K_1M, autype, start_date, end_date)]
+    local = subtract_ranges(start_date.toordinal(), end_date.toordinal(), missing)
+    segments = sorted([(s, e, False) for s, e in missing] + [(s, e, True) for s, e in local])
+    name = store.load_meta(code, KLType.K_1M, autype)["name"] if local else None
+    columns = select_columns(fields)
+    
+    for segment_start, segment_end, is_local in segments:
+        segment_start, segment_end = date.fromordinal(segment_start), date.fromordinal(segment_end)
+        if not is_local:
+            for ret_code, records in iter_history_kline_stored(
+                    quote_ctx, store, code, segment_start, segment_end, ktype, autype, fields, max_count):
+                yield ret_code, records
+                if ret_code != RET_OK:
+                    return
+            continue
+        minute_bars = store.read(code, KLType.K_1M, autype, segment_start, segment_end)
+        bars = resample_bars(minute_bars, minutes, market, trading_day_type)
+        for offset in range(0, len(bars), max_count):
+            page = stored_bars_to_frame(code, name, bars[offset:offset + max_count])
+            yield RET_OK, process_dataframe(page[columns])
+
+def iter_history_kline(quote_ctx, code, start=None, end=None, ktype=KLType.K_DAY,
+                       autype=AuType.QFQ, fields=[KL_FIELD.ALL], max_count=1000,
+                       extended_time=False, store=None):
+    """逐页获取处理后的历史K线记录
+
+    提供 store 时，日K线和分钟K线优先从本地存储读取，只补齐缺失的区间；
+    3/5/15/30/60 分钟K线在本地已有1分钟K线的日期上由1分钟K线合成
+
+    Yields:
+        tuple: (ret_code, 记录列表或错误信息)，失败后不再继续
+    """
+    if store is not None and str(ktype) in RESAMPLE_MINUTES and resample_market(code) and not extended_time:
+        yield from iter_history_kline_resampled(
+            quote_ctx, store, code, start, end, ktype, autype, fields, max_count
+        )
+        return
+    if store is not None and ktype in STORABLE_KTYPES and not extended_time:
+        yield from iter_history_kline_stored(
+            quote_ctx, store, code, start, end, ktype, autype, fields, max_count
+        )
+        return
+    
+    for ret_code, data_frame in iter_history_kline_pages(
+            quote_ctx, code, start, end, ktype, autype, fields, max_count, extended_time):
+        if ret_code != RET_OK:
+            yield ret_code, data_frame
+            return
+        
+        # 处理数据
+        if not data_frame.empty:
+            yield RET_OK, process_dataframe(data_frame)
+
+def request_history_kline(quote_ctx, code, start=None, end=None, ktype=KLType.K_DAY, 
+                          autype=AuType.QFQ, fields=[KL_FIELD.ALL], max_count=1000, 
+                          extended_time=False, store=None):
+    """获取股票的历史K线数据"""
+    results = {}
+    all_data = []
+    
+    for ret_code, records in iter_history_kline(
+            quote_ctx, code, start, end, ktype, autype, fields, max_count, extended_time, store):
+        if ret_code != RET_OK:
             results["error"] = {"message": "获取K线数据失败", "ret_code": ret_code}
             return results
+        all_data.extend(records)
     
     # 按股票代码组织结果
     results[code] = all_data
     return results
 
+def stream_history_kline(quote_ctx, code, start=None, end=None, ktype=KLType.K_DAY,
+                         autype=AuType.QFQ, fields=[KL_FIELD.ALL], max_count=1000,
+                         extended_time=False, store=None):
+    """以流式消息逐页产出历史K线，每页获取后立即产出，不在内存中累积
+
+    Yields:
+        dict: {"type": "page", "code", "data"}、{"type": "error", "error"} 或最后的 {"type": "end", "code", "count"}
+    """
+    count = 0
+    for ret_code, records in iter_history_kline(
+            quote_ctx, code, start, end, ktype, autype, fields, max_count, extended_time, store):
+        if ret_code != RET_OK:
+            yield {"type": "error", "error": {"message": "获取K线数据失败", "ret_code": ret_code}}
+            return
+        count += len(records)
+        yield {"type": "page", "code": code, "data": records}
+    yield {"type": "end", "code": code, "count": count}
+
 def main():
     parser = argparse.ArgumentParser(description='获取股票历史K线数据')
     parser.add_argument('--code', type=str, required=True,
@@ -61,59 +408,43 @@ def main():
                         help='单次请求最大数据条数')
     parser.add_argument('--extended_time', action='store_true',
                         help='是否允许美股盘前盘后数据')
+    parser.add_argument('--no_store', action='store_true',
+                        help='不使用本地K线存储，全部从OpenD获取')
+    parser.add_argument('--stream', action='store_true',
+                        help='以NDJSON逐页输出，每获取一页立即输出一行')
     
     args = parser.parse_args()
     
-    # 转换K线类型参数
-    ktype_map = {
-        'K_DAY': KLType.K_DAY,
-        'K_WEEK': KLType.K_WEEK,
-        'K_MON': KLType.K_MON,
-        'K_YEAR': KLType.K_YEAR,
-        'K_1M': KLType.K_1M,
-        'K_5M': KLType.K_5M,
-        'K_15M': KLType.K_15M,
-        'K_30M': KLType.K_30M,
-        'K_60M': KLType.K_60M,
-        'K_3M': KLType.K_3M,
-        'K_QUARTER': KLType.K_QUARTER,
-        'NONE': KLType.NONE
-    }
-    ktype = ktype_map.get(args.ktype, KLType.K_DAY)
-    
-    # 转换复权类型参数
-    autype_map = {
-        0: AuType.NONE,
-        1: AuType.QFQ,
-        2: AuType.HFQ
-    }
-    autype = autype_map.get(args.autype, AuType.QFQ)
-    
-    # 转换字段参数
-    fields = []
-    for field in args.fields:
-        if field == 'ALL':
-            fields.append(KL_FIELD.ALL)
-        elif hasattr(KL_FIELD, field):
-            fields.append(getattr(KL_FIELD, field))
-    
-    # 如果fields为空，则使用默认值
-    if not fields:
-        fields = [KL_FIELD.ALL]
+    ktype = parse_ktype(args.ktype)
+    autype = parse_autype(args.autype)
+    fields = parse_fields(args.fields)
     
     quote_ctx = None
     try:
         # 创建行情对象
         quote_ctx = create_quote_context()
-        results = request_history_kline(
-            quote_ctx, args.code, args.start, args.end, ktype, autype, 
-            fields, args.max_count, args.extended_time
-        )
+        store = None if args.no_store else get_kline_store()
         
-        # 输出结果
-        print_json_result(results)
+        if args.stream:
+            # 流式输出，每页一行
+            for message in stream_history_kline(
+                    quote_ctx, args.code, args.start, args.end, ktype, autype,
+                    fields, args.max_count, args.extended_time, store):
+                print_json_line(message)
+        else:
+            results = request_history_kline(
+                quote_ctx, args.code, args.start, args.end, ktype, autype, 
+                fields, args.max_count, args.extended_time, store
+            )
+            
+            # 输出结果
+            print_json_result(results)
         
     except Exception as e:
+        if args.stream:
+            # 错误已作为一条记录输出，与获取失败时的流式输出一样正常退出，调用方据此取得错误信息
+            print_json_line({"type": "error", "error": {"message": str(e)}})
+            return
         handle_exception(e)
     finally:
         if quote_ctx:
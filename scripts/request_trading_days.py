@@ -8,6 +8,22 @@ from utils import (
 # 设置日志
 setup_logger()
 
+# 市场类型参数映射
+MARKET_MAP = {
+    'HK': TradeDateMarket.HK,
+    'US': TradeDateMarket.US,
+    'CN': TradeDateMarket.CN,
+    'NT': TradeDateMarket.NT,
+    'ST': TradeDateMarket.ST,
+    'JP_FUTURE': TradeDateMarket.JP_FUTURE,
+    'SG_FUTURE': TradeDateMarket.SG_FUTURE,
+    'NONE': TradeDateMarket.NONE
+}
+
+def parse_market(market_str):
+    """将字符串形式的市场类型转换为 TradeDateMarket，未知类型返回None"""
+    return MARKET_MAP.get(market_str)
+
 def request_trading_days(quote_ctx, market=None, start=None, end=None, code=None):
     """获取交易日历"""
     results = {}
@@ -49,21 +65,7 @@ def main():
     
     args = parser.parse_args()
     
-    # 转换市场类型参数
-    market_map = {
-        'HK': TradeDateMarket.HK,
-        'US': TradeDateMarket.US,
-        'CN': TradeDateMarket.CN,
-        'NT': TradeDateMarket.NT,
-        'ST': TradeDateMarket.ST,
-        'JP_FUTURE': TradeDateMarket.JP_FUTURE,
-        'SG_FUTURE': TradeDateMarket.SG_FUTURE,
-        'NONE': TradeDateMarket.NONE
-    }
-    
-    market = None
-    if args.market in market_map:
-        market = market_map[args.market]
+    market = parse_market(args.market)
     
     quote_ctx = None
     try:
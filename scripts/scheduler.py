@@ -0,0 +1,263 @@
+"""OpenD 请求调度器
+
+按接口维护令牌桶，桶状态保存在本地状态文件中并以文件锁保护，
+同一台机器上的MCP工作进程、脚本和策略进程共享同一份额度。
+等待中的请求登记在状态文件里，优先级高(数值小)的请求先放行，同优先级按登记先后放行。
+"""
+import os
+import json
+import time
+import uuid
+import tempfile
+import threading
+from collections import deque
+from contextlib import contextmanager
+from futu import RET_OK
+
+try:
+    import fcntl
+except ImportError:  # Windows 下退化为仅进程内互斥
+    fcntl = None
+
+# OpenD 各接口的频率限制: (次数, 秒)
+OPEND_RATE_LIMITS = {
+    'request_history_kline': (60, 30),
+    'get_market_snapshot': (60, 30),
+    'request_trading_days': (30, 30),
+    'get_capital_flow': (30, 30),
+}
+
+# 请求优先级，数值越小越优先
+PRIORITY_STRATEGY = 0     # 实盘策略
+PRIORITY_ADHOC = 10       # MCP 工具等临时查询
+
+DEFAULT_STATE_DIR = os.environ.get(
+    'FUTU_SCHEDULER_DIR', os.path.join(tempfile.gettempdir(), 'futu-scheduler')
+)
+
+# 等待登记的有效期，等待方每次轮询时续期，进程退出后自动失效
+WAITER_TTL = 5.0
+
+
+def bucket_params(max_calls, period):
+    """由"period 秒内最多 max_calls 次"推导令牌桶容量和补充速率
+
+    令牌桶在任意 period 秒内最多放行 容量 + 速率 * period 次，
+    取容量为限额的十分之一、其余按匀速补充，保证不超过OpenD的滑动窗口限制。
+    """
+    capacity = max(1, max_calls // 10)
+    rate = (max_calls - capacity) / period
+    return capacity, rate
+
+
+class RequestScheduler:
+    """跨进程共享的按接口令牌桶调度器"""
+    def __init__(self, state_dir=None, limits=None):
+        self.state_dir = state_dir or DEFAULT_STATE_DIR
+        self.limits = dict(OPEND_RATE_LIMITS, **(limits or {}))
+        os.makedirs(self.state_dir, exist_ok=True)
+        self._local_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._waiting = {}        # 本进程内各接口正在等待的请求数
+        self._acquired = {}       # 各接口已放行次数
+        self._wait_total = {}     # 各接口累计等待秒数
+        self._wait_max = {}       # 各接口最长等待秒数
+        self._recent_waits = {}   # 各接口最近的等待时长样本
+
+    @contextmanager
+    def _locked(self, api):
+        """获取接口状态文件的进程内和跨进程锁"""
+        with self._local_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.state_dir, f'{api}.lock'), 'a+') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self, api, capacity):
+        path = os.path.join(self.state_dir, f'{api}.json')
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"tokens": capacity, "updated": time.time(), "waiters": {}}
+
+    def _save(self, api, state):
+        path = os.path.join(self.state_dir, f'{api}.json')
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
+
+    def _try_acquire(self, api, waiter_id, priority, enqueued_at):
+        """尝试取一个令牌
+
+        Returns:
+            float: 0 表示已取得令牌，否则为建议的等待秒数
+        """
+        max_calls, period = self.limits.get(api, (60, 30))
+        capacity, rate = bucket_params(max_calls, period)
+        with self._locked(api):
+            state = self._load(api, capacity)
+            now = time.time()
+            state["tokens"] = min(capacity, state["tokens"] + (now - state["updated"]) * rate)
+            state["updated"] = now
+
+            # 清理过期登记并续期自己的登记
+            waiters = {k: v for k, v in state["waiters"].items() if v[2] > now}
+            waiters[waiter_id] = [priority, enqueued_at, now + WAITER_TTL]
+            head = min(waiters.items(), key=lambda item: (item[1][0], item[1][1], item[0]))[0]
+
+            if head == waiter_id and state["tokens"] >= 1:
+                state["tokens"] -= 1
+                del waiters[waiter_id]
+                state["waiters"] = waiters
+                self._save(api, state)
+                return 0.0
+
+            state["waiters"] = waiters
+            self._save(api, state)
+            if head != waiter_id:
+                return 0.02
+            return max((1 - state["tokens"]) / rate, 0.001)
+
+    def _leave(self, api, waiter_id):
+        """取消等待登记(超时或异常时)"""
+        max_calls, period = self.limits.get(api, (60, 30))
+        capacity, _ = bucket_params(max_calls, period)
+        with self._locked(api):
+            state = self._load(api, capacity)
+            if state["waiters"].pop(waiter_id, None) is not None:
+                self._save(api, state)
+
+    def acquire(self, api, priority=PRIORITY_ADHOC, timeout=None):
+        """阻塞直到可以调用 api，返回等待的秒数
+
+        Args:
+            api (str): 接口名，例如 request_history_kline；不在限频表中的接口直接放行
+            priority (int): 优先级，数值越小越优先
+            timeout (float): 最长等待秒数，超时抛出 TimeoutError
+        """
+        if api not in self.limits:
+            return 0.0
+        waiter_id = f'{os.getpid()}-{uuid.uuid4().hex}'
+        start = time.time()
+        self._update_waiting(api, 1)
+        try:
+            while True:
+                wait = self._try_acquire(api, waiter_id, priority, start)
+                if wait == 0:
+                    break
+                if timeout is not None and time.time() - start + wait > timeout:
+                    self._leave(api, waiter_id)
+                    raise TimeoutError(f"等待 {api} 请求额度超时")
+                time.sleep(min(wait, WAITER_TTL / 2))
+        except BaseException:
+            self._leave(api, waiter_id)
+            raise
+        finally:
+            self._update_waiting(api, -1)
+        waited = time.time() - start
+        self._record(api, waited)
+        return waited
+
+    def call(self, api, func, *args, priority=PRIORITY_ADHOC, **kwargs):
+        """在取得 api 的额度后执行 func(*args, **kwargs)"""
+        self.acquire(api, priority)
+        return func(*args, **kwargs)
+
+    def _update_waiting(self, api, delta):
+        with self._stats_lock:
+            self._waiting[api] = self._waiting.get(api, 0) + delta
+
+    def _record(self, api, waited):
+        with self._stats_lock:
+            self._acquired[api] = self._acquired.get(api, 0) + 1
+            self._wait_total[api] = self._wait_total.get(api, 0.0) + waited
+            self._wait_max[api] = max(self._wait_max.get(api, 0.0), waited)
+            self._recent_waits.setdefault(api, deque(maxlen=1000)).append(waited)
+
+    def stats(self):
+        """返回各接口的排队深度与等待时间统计
+
+        queue_depth 为所有进程中正在等待的请求数，local_waiting 为本进程中的等待数
+        """
+        result = {}
+        for api, (max_calls, period) in self.limits.items():
+            capacity, _ = bucket_params(max_calls, period)
+            with self._locked(api):
+                state = self._load(api, capacity)
+            now = time.time()
+            with self._stats_lock:
+                recent = sorted(self._recent_waits.get(api, ()))
+                acquired = self._acquired.get(api, 0)
+                result[api] = {
+                    "limit": f"{max_calls}/{period}s",
+                    "queue_depth": sum(1 for v in state["waiters"].values() if v[2] > now),
+                    "local_waiting": self._waiting.get(api, 0),
+                    "acquired": acquired,
+                    "wait_avg": self._wait_total.get(api, 0.0) / acquired if acquired else 0.0,
+                    "wait_p50": recent[len(recent) // 2] if recent else 0.0,
+                    "wait_p99": recent[min(len(recent) - 1, int(len(recent) * 0.99))] if recent else 0.0,
+                    "wait_max": self._wait_max.get(api, 0.0),
+                }
+        return result
+
+
+class ScheduledQuoteContext:
+    """行情对象代理：限频接口的调用先经过调度器取得额度，其余属性直接透传
+
+    设置 timer(stage_timer.StageTimer) 后，所有接口调用的耗时计入 opend 阶段，
+    限频等待计入 rate_wait 阶段；连接池借出连接时设置、归还时清除。
+    接口返回错误码时记录在 last_error 中，连接池据此在下次借出前检查连接是否仍然可用。
+    """
+    def __init__(self, quote_ctx, scheduler=None, priority=PRIORITY_ADHOC):
+        self._quote_ctx = quote_ctx
+        self._scheduler = scheduler or get_scheduler()
+        self.priority = priority
+        self.timer = None
+        self.last_error = None
+
+    @property
+    def raw(self):
+        """被代理的原始行情对象"""
+        return self._quote_ctx
+
+    def __getattr__(self, name):
+        attr = getattr(self._quote_ctx, name)
+        if not callable(attr):
+            return attr
+        timer = self.timer
+        limited = name in self._scheduler.limits
+
+        def scheduled(*args, **kwargs):
+            if limited:
+                waited = self._scheduler.acquire(name, self.priority)
+                if timer is not None:
+                    timer.add('rate_wait', waited)
+            if timer is None:
+                result = attr(*args, **kwargs)
+            else:
+                with timer.measure('opend'):
+                    result = attr(*args, **kwargs)
+            # 接口返回 (ret, data) 或 (ret, data, page_req_key) 等，错误信息均在第二项
+            if type(result) is tuple and len(result) >= 2 and result[0] != RET_OK:
+                self.last_error = result[1]
+            return result
+        return scheduled
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """获取进程内共享的调度器"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler()
+        return _scheduler
@@ -0,0 +1,55 @@
+"""请求阶段计时
+
+工作进程为每个请求创建一个 StageTimer，记录排队、租用连接、限频等待、OpenD 调用、
+处理与序列化等阶段的耗时，随结果一起返回给 Node 端汇总。
+同一请求内并发的线程共享一个计时器，各阶段按累计耗时记录。
+"""
+import time
+import threading
+
+
+class StageTimer:
+    """线程安全的分阶段耗时累计"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seconds = {}   # 阶段 -> 累计秒数
+        self.counts = {}    # 阶段 -> 次数
+        self.totals = {}    # 计数项 -> 累计值，例如 response_bytes
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+            self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    def incr(self, name, value=1):
+        """累加一个非耗时的计数项"""
+        with self._lock:
+            self.totals[name] = self.totals.get(name, 0) + value
+
+    def measure(self, stage):
+        """返回计时上下文: with timer.measure('opend'): ..."""
+        return _Measure(self, stage)
+
+    def as_dict(self):
+        """返回 {阶段_ms: 毫秒, 计数项: 值}，另附 OpenD 调用次数 opend_calls"""
+        with self._lock:
+            result = {f'{stage}_ms': round(seconds * 1000, 3) for stage, seconds in self.seconds.items()}
+            result.update(self.totals)
+            result['opend_calls'] = self.counts.get('opend', 0)
+            return result
+
+
+class _Measure:
+    __slots__ = ('timer', 'stage', 'start')
+
+    def __init__(self, timer, stage):
+        self.timer = timer
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.add(self.stage, time.perf_counter() - self.start)
+        return False
@@ -163,6 +163,51 @@ def query_subscription_status(quote_ctx):
     
     return results
 
+def run_subscription_command(quote_ctx, command, code_list=None, subtype_list=None,
+                             is_first_push=True, subscribe_push=True, is_detailed_orderbook=False,
+                             extended_time=False, unsubscribe_all=False):
+    """
+    执行订阅管理命令
+    
+    Args:
+        quote_ctx: 富途行情上下文
+        command (str): subscribe、unsubscribe 或 query
+        code_list (list): 股票代码列表
+        subtype_list (list): 字符串形式的订阅类型列表
+        其余参数与 subscribe_stocks / unsubscribe_stocks 一致
+        
+    Returns:
+        dict: 命令执行结果
+    """
+    if command == 'subscribe':
+        if not code_list or not subtype_list:
+            raise ValueError("订阅时必须提供股票代码列表和订阅类型列表")
+        # 解析订阅类型
+        subtypes = parse_subtype(subtype_list)
+        # 执行订阅
+        return subscribe_stocks(
+            quote_ctx, code_list, subtypes, 
+            is_first_push, subscribe_push, 
+            is_detailed_orderbook, extended_time
+        )
+    elif command == 'unsubscribe':
+        # 处理取消所有订阅的情况
+        if unsubscribe_all:
+            return unsubscribe_stocks(quote_ctx, unsubscribe_all=True)
+        # 确保至少提供了代码列表或类型列表
+        if not code_list and not subtype_list:
+            raise ValueError("取消订阅时必须提供股票代码列表或订阅类型列表")
+        # 解析订阅类型(如果有)
+        subtypes = None
+        if subtype_list:
+            subtypes = parse_subtype(subtype_list)
+        # 执行取消订阅
+        return unsubscribe_stocks(quote_ctx, code_list, subtypes)
+    elif command == 'query':
+        # 查询订阅状态
+        return query_subscription_status(quote_ctx)
+    return {"error": {"message": "无效的命令，请使用 subscribe、unsubscribe 或 query"}}
+
 def main():
     parser = argparse.ArgumentParser(description='股票订阅与取消订阅')
     subparsers = parser.add_subparsers(dest='command', help='子命令')
@@ -201,34 +246,16 @@ def main():
         # 创建行情对象
         quote_ctx = create_quote_context()
         
-        if args.command == 'subscribe':
-            # 解析订阅类型
-            subtypes = parse_subtype(args.subtype_list)
-            # 执行订阅
-            results = subscribe_stocks(
-                quote_ctx, args.code_list, subtypes, 
-                args.is_first_push, args.subscribe_push, 
-                args.is_detailed_orderbook, args.extended_time
-            )
-        elif args.command == 'unsubscribe':
-            # 处理取消所有订阅的情况
-            if args.unsubscribe_all:
-                results = unsubscribe_stocks(quote_ctx, unsubscribe_all=True)
-            else:
-                # 确保至少提供了代码列表或类型列表
-                if not args.code_list and not args.subtype_list:
-                    raise ValueError("取消订阅时必须提供股票代码列表或订阅类型列表")
-                # 解析订阅类型(如果有)
-                subtypes = None
-                if args.subtype_list:
-                    subtypes = parse_subtype(args.subtype_list)
-                # 执行取消订阅
-                results = unsubscribe_stocks(quote_ctx, args.code_list, subtypes)
-        elif args.command == 'query':
-            # 查询订阅状态
-            results = query_subscription_status(quote_ctx)
-        else:
-            results = {"error": {"message": "无效的命令，请使用 subscribe、unsubscribe 或 query"}}
+        results = run_subscription_command(
+            quote_ctx, args.command,
+            code_list=getattr(args, 'code_list', None),
+            subtype_list=getattr(args, 'subtype_list', None),
+            is_first_push=getattr(args, 'is_first_push', True),
+            subscribe_push=getattr(args, 'subscribe_push', True),
+            is_detailed_orderbook=getattr(args, 'is_detailed_orderbook', False),
+            extended_time=getattr(args, 'extended_time', False),
+            unsubscribe_all=getattr(args, 'unsubscribe_all', False)
+        )
         
         # 输出结果
         print_json_result(results)
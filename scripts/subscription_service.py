@@ -0,0 +1,182 @@
+"""常驻订阅服务与最新值存储
+
+OpenD 的订阅归属于连接，订阅服务持有一个常驻行情连接和其上的全部订阅，
+收到的报价(QUOTE)、摆盘(ORDER_BOOK)、分时(RT_DATA)推送按股票只保留最新一条，
+已转换为JSON兼容的字典，读取时只需一次字典查找，不再请求 OpenD。
+其他模块可通过 add_listener 接收同一连接上的推送(SDK 每种推送只能设置一个处理器)。
+"""
+import time
+import threading
+from futu import (
+    RET_OK, StockQuoteHandlerBase, OrderBookHandlerBase, RTDataHandlerBase,
+    TickerHandlerBase, CurKlineHandlerBase
+)
+from utils import create_quote_context, process_dataframe
+from subscription_manager import run_subscription_command
+
+# 保存最新值的推送类型
+LATEST_KINDS = ('QUOTE', 'ORDER_BOOK', 'RT_DATA')
+
+
+class LatestValueStore:
+    """按推送类型与股票代码保存最新一条推送"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {kind: {} for kind in LATEST_KINDS}  # kind -> {code: (接收时间戳, 记录)}
+        self.updates = {kind: 0 for kind in LATEST_KINDS}
+
+    def update(self, kind, code, record, recv_time=None):
+        recv_time = time.time() if recv_time is None else recv_time
+        with self._lock:
+            self._values[kind][code] = (recv_time, record)
+            self.updates[kind] += 1
+
+    def update_frame(self, kind, data, recv_time=None):
+        """以推送 DataFrame 更新，每只股票保留最后一行"""
+        recv_time = time.time() if recv_time is None else recv_time
+        latest = {record['code']: record for record in process_dataframe(data)}
+        with self._lock:
+            values = self._values[kind]
+            for code, record in latest.items():
+                values[code] = (recv_time, record)
+            self.updates[kind] += len(latest)
+
+    def get(self, kind, code_list=None, fields=None):
+        """读取最新值
+
+        Args:
+            kind (str): QUOTE、ORDER_BOOK 或 RT_DATA
+            code_list (list): 股票代码，默认全部
+            fields (list): 只返回这些字段，默认全部
+
+        Returns:
+            dict: {"data": {code: {..., "recv_time", "age_ms"}}, "missing": [尚未收到推送的代码]}
+        """
+        if kind not in self._values:
+            raise ValueError(f"不支持的类型: {kind}, 支持的类型: {list(LATEST_KINDS)}")
+        now = time.time()
+        with self._lock:
+            values = self._values[kind]
+            codes = list(values) if code_list is None else code_list
+            found = {code: values[code] for code in codes if code in values}
+        data = {}
+        for code, (recv_time, record) in found.items():
+            item = {key: record[key] for key in fields if key in record} if fields else dict(record)
+            item['recv_time'] = recv_time
+            item['age_ms'] = round((now - recv_time) * 1000, 3)
+            data[code] = item
+        return {"data": data, "missing": [code for code in codes if code not in found]}
+
+    def discard(self, code_list=None, kinds=LATEST_KINDS):
+        """删除股票的最新值，code_list 为 None 时删除全部股票"""
+        with self._lock:
+            for kind in kinds:
+                values = self._values[kind]
+                if code_list is None:
+                    values.clear()
+                else:
+                    for code in code_list:
+                        values.pop(code, None)
+
+    def stats(self):
+        with self._lock:
+            return {kind: {"codes": len(self._values[kind]), "updates": self.updates[kind]} for kind in LATEST_KINDS}
+
+
+class _ServiceHandler:
+    """把解析后的推送交给订阅服务"""
+    kind = None
+
+    def __init__(self, service):
+        super().__init__()
+        self.service = service
+
+    def on_recv_rsp(self, rsp_pb):
+        ret_code, data = super().on_recv_rsp(rsp_pb)
+        if ret_code == RET_OK:
+            self.service.on_push(self.kind, data)
+        return ret_code, data
+
+
+class QuoteServiceHandler(_ServiceHandler, StockQuoteHandlerBase):
+    kind = 'QUOTE'
+
+
+class OrderBookServiceHandler(_ServiceHandler, OrderBookHandlerBase):
+    kind = 'ORDER_BOOK'
+
+
+class RTDataServiceHandler(_ServiceHandler, RTDataHandlerBase):
+    kind = 'RT_DATA'
+
+
+class TickerServiceHandler(_ServiceHandler, TickerHandlerBase):
+    kind = 'TICKER'
+
+
+class KLineServiceHandler(_ServiceHandler, CurKlineHandlerBase):
+    kind = 'KLINE'
+
+
+SERVICE_HANDLERS = (
+    QuoteServiceHandler, OrderBookServiceHandler, RTDataServiceHandler,
+    TickerServiceHandler, KLineServiceHandler,
+)
+
+
+class SubscriptionService:
+    """持有常驻行情连接与订阅，维护最新值存储并把推送分发给监听者"""
+    def __init__(self, quote_ctx=None, store=None):
+        """
+        Args:
+            quote_ctx: 行情对象，默认新建一个常驻连接
+            store (LatestValueStore): 最新值存储，默认新建
+        """
+        self.quote_ctx = quote_ctx or create_quote_context()
+        self.store = store or LatestValueStore()
+        self._listeners = {}        # kind -> [callback(data)]
+        self.errors = 0
+        for handler_class in SERVICE_HANDLERS:
+            self.quote_ctx.set_handler(handler_class(self))
+
+    def add_listener(self, kind, callback):
+        """注册推送回调 callback(data)，kind 取 QUOTE、ORDER_BOOK、RT_DATA、TICKER、KLINE"""
+        self._listeners.setdefault(kind, []).append(callback)
+
+    def on_push(self, kind, data):
+        """在 SDK 回调线程中处理一条推送"""
+        recv_time = time.time()
+        try:
+            if kind == 'ORDER_BOOK':
+                self.store.update(kind, data['code'], dict(data), recv_time)
+            elif kind in LATEST_KINDS:
+                self.store.update_frame(kind, data, recv_time)
+            for callback in self._listeners.get(kind, ()):
+                callback(data)
+        except Exception as e:
+            self.errors += 1
+            print(f"[错误] 处理 {kind} 推送失败: {e}")
+
+    def run_command(self, command, **kwargs):
+        """在常驻连接上执行 subscribe、unsubscribe 或 query，参数同 run_subscription_command
+
+        取消订阅后对应股票的最新值随之删除
+        """
+        result = run_subscription_command(self.quote_ctx, command, **kwargs)
+        if command == 'unsubscribe' and result.get('success'):
+            if kwargs.get('unsubscribe_all'):
+                self.store.discard()
+            else:
+                subtypes = [subtype.upper() for subtype in kwargs.get('subtype_list') or LATEST_KINDS]
+                self.store.discard(kwargs.get('code_list'), [kind for kind in LATEST_KINDS if kind in subtypes])
+        return result
+
+    def latest(self, kind, code_list=None, fields=None):
+        """读取最新值，参见 LatestValueStore.get"""
+        return self.store.get(kind, code_list, fields)
+
+    def stats(self):
+        return {"store": self.store.stats(), "errors": self.errors}
+
+    def close(self):
+        self.quote_ctx.close()  # 关闭对象，防止连接条数用尽
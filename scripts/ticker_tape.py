@@ -0,0 +1,193 @@
+"""逐笔成交环形缓冲区与窗口分析
+
+每只股票一个定长 numpy 结构化数组(时间、价格、成交量、方向)，内存占用固定；
+每笔成交同时写入位置 i 与 i + capacity，最近 capacity 笔始终是一段连续切片，
+窗口查询不需要拼接或复制。在最近 N 秒的窗口上向量化计算 VWAP、买卖量失衡、
+成交笔数速率与大单。
+
+时间使用成交时间(交易所当地时间的毫秒时间戳)，窗口默认以最新一笔成交的时间为终点。
+重新订阅时 OpenD 会重推最近的成交，按推送中的逐笔序号(sequence)去重。
+"""
+import threading
+import numpy as np
+from futu import RET_OK, TickerHandlerBase
+
+TICK_DTYPE = np.dtype([('time', 'i8'), ('price', 'f8'), ('volume', 'i8'), ('direction', 'i1'), ('sequence', 'i8')])
+# 逐笔方向 -> 数值
+DIRECTIONS = {'BUY': 1, 'SELL': -1}
+DEFAULT_CAPACITY = 16384  # 每只股票约 1MB(双倍缓冲)
+
+
+def parse_ticks(data):
+    """将逐笔推送 DataFrame 转为 TICK_DTYPE 数组"""
+    ticks = np.empty(len(data), dtype=TICK_DTYPE)
+    # 推送通常只有一两行，tolist 比经由 pandas 扩展数组转换快
+    ticks['time'] = np.array(data['time'].tolist(), dtype='datetime64[ms]').astype('i8')
+    ticks['price'] = data['price'].to_numpy(dtype='f8')
+    ticks['volume'] = data['volume'].to_numpy(dtype='i8')
+    ticks['direction'] = [DIRECTIONS.get(direction, 0) for direction in data['ticker_direction'].tolist()]
+    # 没有序号的数据记为 0，不参与去重
+    ticks['sequence'] = data['sequence'].to_numpy(dtype='i8') if 'sequence' in data else 0
+    return ticks
+
+
+class TickerTape:
+    """单只股票的逐笔成交环形缓冲区"""
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.buffer = np.zeros(capacity * 2, dtype=TICK_DTYPE)
+        self.head = 0       # 下一笔写入位置 [0, capacity)
+        self.count = 0      # 有效笔数，不超过 capacity
+        self.total = 0      # 累计收到的笔数
+        self.sequence = 0   # 已写入成交的最大逐笔序号
+        self.lock = threading.Lock()
+
+    def append(self, ticks):
+        """追加按时间排列的成交，超过容量时覆盖最早的成交，逐笔序号不大于已写入序号的成交视为重推丢弃"""
+        with self.lock:
+            if self.sequence:
+                ticks = ticks[(ticks['sequence'] > self.sequence) | (ticks['sequence'] == 0)]
+            n = len(ticks)
+            if n == 0:
+                return
+            self.sequence = max(self.sequence, int(ticks['sequence'].max()))
+            if n > self.capacity:
+                ticks = ticks[-self.capacity:]
+                n = self.capacity
+            start = self.head
+            first = min(n, self.capacity - start)
+            # 每笔写入两处，保证最近 capacity 笔是连续切片
+            for offset in (0, self.capacity):
+                self.buffer[start + offset:start + offset + first] = ticks[:first]
+                self.buffer[offset:offset + n - first] = ticks[first:]
+            self.head = (start + n) % self.capacity
+            self.count = min(self.capacity, self.count + n)
+            self.total += n
+
+    def recent(self):
+        """按时间排列的全部有效成交(缓冲区切片的副本)"""
+        with self.lock:
+            end = self.head + self.capacity
+            return self.buffer[end - self.count:end].copy()
+
+    def window(self, seconds, now=None):
+        """最近 seconds 秒的成交(副本)
+
+        Args:
+            seconds (float): 窗口长度
+            now (int): 窗口终点(毫秒时间戳)，默认最新一笔成交的时间
+        """
+        with self.lock:
+            end = self.head + self.capacity
+            view = self.buffer[end - self.count:end]
+            if len(view) == 0:
+                return view.copy()
+            now = int(view['time'][-1]) if now is None else now
+            start = np.searchsorted(view['time'], now - int(seconds * 1000), 'right')
+            stop = np.searchsorted(view['time'], now, 'right')
+            return view[start:stop].copy()
+
+    def stats(self, seconds, now=None, large_volume=None, large_multiple=10.0, max_large=20):
+        """最近 seconds 秒的成交统计
+
+        Args:
+            large_volume (int): 大单的成交量下限，默认为窗口内成交量中位数的 large_multiple 倍
+            max_large (int): 最多返回的大单笔数(按成交量从大到小)
+
+        Returns:
+            dict: 笔数、成交量、成交额、VWAP、最高/最低/最新价、主动买卖量与失衡、每秒笔数与大单
+        """
+        ticks = self.window(seconds, now)
+        if len(ticks) == 0:
+            return {"count": 0, "seconds": seconds}
+        price = ticks['price']
+        volume = ticks['volume'].astype('f8')
+        direction = ticks['direction']
+        turnover = price * volume
+        total_volume = volume.sum()
+        buy_volume = volume[direction > 0].sum()
+        sell_volume = volume[direction < 0].sum()
+        threshold = large_volume if large_volume is not None else np.median(volume) * large_multiple
+        large = np.flatnonzero(volume >= threshold)
+        largest = large[np.argsort(volume[large])[::-1][:max_large]]
+        return {
+            "count": int(len(ticks)),
+            "seconds": seconds,
+            "volume": int(total_volume),
+            "turnover": float(turnover.sum()),
+            "vwap": float(turnover.sum() / total_volume) if total_volume else None,
+            "high": float(price.max()),
+            "low": float(price.min()),
+            "last": float(price[-1]),
+            "buy_volume": int(buy_volume),
+            "sell_volume": int(sell_volume),
+            "imbalance": float((buy_volume - sell_volume) / (buy_volume + sell_volume))
+                         if buy_volume + sell_volume else 0.0,
+            "trade_rate": float(len(ticks) / seconds),
+            "large_threshold": float(threshold),
+            "large_count": int(len(large)),
+            "large_volume": int(volume[large].sum()),
+            "large_trades": [
+                {
+                    "time": str(np.datetime64(int(ticks['time'][i]), 'ms')).replace('T', ' '),
+                    "price": float(price[i]),
+                    "volume": int(volume[i]),
+                    "direction": int(direction[i]),
+                }
+                for i in np.sort(largest)
+            ],
+        }
+
+
+class TickerTapes:
+    """多只股票的逐笔成交缓冲区，按需为新股票创建"""
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.tapes = {}
+        self.lock = threading.Lock()
+
+    def get(self, code, create=False):
+        tape = self.tapes.get(code)
+        if tape is None and create:
+            with self.lock:
+                tape = self.tapes.setdefault(code, TickerTape(self.capacity))
+        return tape
+
+    def on_ticker(self, data):
+        """处理一条逐笔推送 DataFrame(可包含多只股票)"""
+        codes = data['code'].tolist()
+        if not codes:
+            return
+        ticks = parse_ticks(data)
+        unique = dict.fromkeys(codes)
+        if len(unique) == 1:
+            self.get(codes[0], create=True).append(ticks)
+            return
+        codes = np.array(codes, dtype=object)
+        for code in unique:
+            self.get(code, create=True).append(ticks[codes == code])
+
+    def stats(self, code_list=None, seconds=60, **kwargs):
+        """多只股票的窗口统计 {code: stats}，没有逐笔数据的股票列入 missing"""
+        code_list = list(self.tapes) if code_list is None else code_list
+        result, missing = {}, []
+        for code in code_list:
+            tape = self.get(code)
+            if tape is None:
+                missing.append(code)
+            else:
+                result[code] = tape.stats(seconds, **kwargs)
+        return {"data": result, "missing": missing}
+
+
+class TickerTapeHandler(TickerHandlerBase):
+    """把逐笔推送写入 TickerTapes 的处理器，供策略在自己的行情连接上使用"""
+    def __init__(self, tapes):
+        super(TickerTapeHandler, self).__init__()
+        self.tapes = tapes
+
+    def on_recv_rsp(self, rsp_pb):
+        ret_code, data = super(TickerTapeHandler, self).on_recv_rsp(rsp_pb)
+        if ret_code == RET_OK:
+            self.tapes.on_ticker(data)
+        return ret_code, data
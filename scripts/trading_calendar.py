@@ -0,0 +1,375 @@
+"""本地交易日历
+
+按 TradeDateMarket 将交易日保存为有序的日期序数数组(.npy)，并记录交易日类型(全天/半日市)。
+meta.json 记录已向OpenD查询过的日期区间，查询只对未覆盖的区间(通常是未来的新日期)发起请求，
+之后的判断、前后N个交易日、区间计数等均为 searchsorted 二分查找。
+"""
+import os
+import json
+import time
+import argparse
+import threading
+from datetime import date, timedelta
+import numpy as np
+from futu import RET_OK
+from utils import (
+    setup_logger, get_quote_context_pool, print_json_result, handle_exception
+)
+from request_trading_days import parse_market
+from kline_store import parse_date, merge_ranges, subtract_ranges
+from market_sessions import MARKET_SESSIONS, day_session_minutes, is_weekday
+
+# 设置日志
+setup_logger()
+
+# 默认存储目录，可通过环境变量覆盖
+DEFAULT_CALENDAR_ROOT = os.environ.get(
+    'FUTU_CALENDAR_STORE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'calendar')
+)
+
+# 交易日类型编码
+DAY_TYPES = ('WHOLE', 'MORNING', 'AFTERNOON')
+
+# OpenD 单次查询的最大跨度(天)
+MAX_QUERY_DAYS = 365
+
+# 未来日期的覆盖记录超过该天数后重新查询，以获取交易所新公布的假期
+FUTURE_REFRESH_DAYS = 30
+
+# 分钟K线类型 -> 每根K线的分钟数
+KTYPE_MINUTES = {
+    'K_1M': 1,
+    'K_3M': 3,
+    'K_5M': 5,
+    'K_15M': 15,
+    'K_30M': 30,
+    'K_60M': 60,
+}
+
+# 支持的查询
+SUPPORTED_QUERIES = (
+    'is_trading_day', 'trading_days', 'previous_trading_days', 'next_trading_day',
+    'count_trading_days', 'expected_bars'
+)
+
+
+def query_trading_days(quote_ctx, market, start, end):
+    """按最大跨度分段查询 [start, end] 的交易日
+
+    Returns:
+        tuple: (日期序数数组, 交易日类型编码数组)
+    """
+    ordinals, types = [], []
+    cursor = start
+    while cursor <= end:
+        chunk_end = min(end, cursor + timedelta(days=MAX_QUERY_DAYS - 1))
+        ret_code, data = quote_ctx.request_trading_days(
+            market=parse_market(market), start=cursor.isoformat(), end=chunk_end.isoformat()
+        )
+        if ret_code != RET_OK:
+            raise RuntimeError(f"获取{market}交易日历失败: {data}")
+        for item in data:
+            ordinals.append(parse_date(item['time']).toordinal())
+            day_type = item.get('trade_date_type', 'WHOLE')
+            types.append(DAY_TYPES.index(day_type) if day_type in DAY_TYPES else 0)
+        cursor = chunk_end + timedelta(days=1)
+    return np.asarray(ordinals, dtype='i4'), np.asarray(types, dtype='i1')
+
+
+class TradingCalendar:
+    """单个市场的本地交易日历"""
+    def __init__(self, market, root=None, context_factory=None):
+        """
+        Args:
+            market (str): 市场，例如 HK、US、CN
+            root (str): 存储目录
+            context_factory (callable): 返回行情对象上下文管理器的函数，默认从连接池租用
+        """
+        if parse_market(market) is None:
+            raise ValueError(f"不支持的市场: {market}")
+        self.market = market
+        self.root = os.path.abspath(root or DEFAULT_CALENDAR_ROOT)
+        self.context_factory = context_factory or (lambda: get_quote_context_pool().lease())
+        self.lock = threading.RLock()
+        self._ordinals = None     # 有序的交易日序数
+        self._types = None        # 对应的交易日类型编码
+        self._meta = None         # {"ranges": [[起, 止], ...], "checked": 上次查询日期序数}
+
+    def _path(self, filename):
+        return os.path.join(self.root, self.market, filename)
+
+    def _load(self):
+        """首次使用时从磁盘加载"""
+        if self._meta is not None:
+            return
+        meta_path = self._path('meta.json')
+        days_path = self._path('days.npy')
+        if os.path.exists(meta_path) and os.path.exists(days_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                self._meta = json.load(f)
+            days = np.load(days_path)
+            self._ordinals, self._types = days[0].astype('i4'), days[1].astype('i1')
+        else:
+            self._meta = {"ranges": [], "checked": 0}
+            self._ordinals = np.empty(0, dtype='i4')
+            self._types = np.empty(0, dtype='i1')
+
+    def _save(self):
+        os.makedirs(self._path(''), exist_ok=True)
+        # 先写临时文件再原子替换
+        days_tmp = self._path(f'days.npy.{os.getpid()}.tmp')
+        with open(days_tmp, 'wb') as f:
+            np.save(f, np.stack([self._ordinals.astype('i4'), self._types.astype('i4')]))
+        os.replace(days_tmp, self._path('days.npy'))
+        meta_tmp = self._path(f'meta.json.{os.getpid()}.tmp')
+        with open(meta_tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._meta, f)
+        os.replace(meta_tmp, self._path('meta.json'))
+
+    def _expire_future(self, today):
+        """覆盖记录过旧时丢弃今天之后的部分，下次查询重新获取"""
+        if today - self._meta.get("checked", 0) <= FUTURE_REFRESH_DAYS:
+            return
+        self._meta["ranges"] = [
+            [start, min(end, today)] for start, end in self._meta["ranges"] if start <= today
+        ]
+        keep = self._ordinals <= today
+        self._ordinals, self._types = self._ordinals[keep], self._types[keep]
+
+    def ensure(self, start, end):
+        """保证 [start, end] 已在本地覆盖，只查询缺失的区间
+
+        查询范围按自然年扩展，逐日判断时每年最多请求一次
+        """
+        start, end = parse_date(start), parse_date(end)
+        start, end = date(start.year, 1, 1), date(end.year, 12, 31)
+        with self.lock:
+            self._load()
+            today = date.today().toordinal()
+            if end.toordinal() > today:
+                self._expire_future(today)
+            missing = subtract_ranges(start.toordinal(), end.toordinal(), self._meta["ranges"])
+            if not missing:
+                return
+
+            ordinals, types = [self._ordinals], [self._types]
+            with self.context_factory() as quote_ctx:
+                for lo, hi in missing:
+                    new_ordinals, new_types = query_trading_days(
+                        quote_ctx, self.market, date.fromordinal(lo), date.fromordinal(hi)
+                    )
+                    ordinals.append(new_ordinals)
+                    types.append(new_types)
+
+            merged = np.concatenate(ordinals)
+            merged_types = np.concatenate(types)
+            unique, first = np.unique(merged, return_index=True)
+            self._ordinals, self._types = unique.astype('i4'), merged_types[first]
+            self._meta["ranges"] = merge_ranges(self._meta["ranges"] + missing)
+            if end.toordinal() > today:
+                self._meta["checked"] = today
+            self._save()
+
+    def _slice(self, start, end):
+        """返回 [start, end] 内交易日在数组中的下标范围"""
+        lo = np.searchsorted(self._ordinals, start.toordinal(), 'left')
+        hi = np.searchsorted(self._ordinals, end.toordinal(), 'right')
+        return lo, hi
+
+    def day_type(self, day):
+        """返回交易日类型 WHOLE/MORNING/AFTERNOON，非交易日返回 None"""
+        day = parse_date(day)
+        self.ensure(day, day)
+        with self.lock:
+            index = np.searchsorted(self._ordinals, day.toordinal())
+            if index < len(self._ordinals) and self._ordinals[index] == day.toordinal():
+                return DAY_TYPES[self._types[index]]
+        return None
+
+    def is_trading_day(self, day):
+        """是否为交易日"""
+        return self.day_type(day) is not None
+
+    def trading_days(self, start, end):
+        """返回 [start, end] 内的交易日列表"""
+        start, end = parse_date(start), parse_date(end)
+        self.ensure(start, end)
+        with self.lock:
+            lo, hi = self._slice(start, end)
+            return [date.fromordinal(int(x)) for x in self._ordinals[lo:hi]]
+
+    def count_trading_days(self, start, end):
+        """返回 [start, end] 内的交易日数"""
+        start, end = parse_date(start), parse_date(end)
+        self.ensure(start, end)
+        with self.lock:
+            lo, hi = self._slice(start, end)
+            return int(hi - lo)
+
+    def previous_trading_days(self, n, before=None, inclusive=False):
+        """返回 before 之前最近的 n 个交易日(升序)
+
+        Args:
+            inclusive (bool): before 本身为交易日时是否计入
+        """
+        before = parse_date(before) or date.today()
+        end = before if inclusive else before - timedelta(days=1)
+        span = n * 7 // 5 + 14
+        while True:
+            start = end - timedelta(days=span)
+            self.ensure(start, end)
+            with self.lock:
+                lo, hi = self._slice(start, end)
+                if hi - lo >= n or span > 366 * 50:
+                    return [date.fromordinal(int(x)) for x in self._ordinals[max(lo, hi - n):hi]]
+            span *= 2
+
+    def next_trading_day(self, after=None, inclusive=False):
+        """返回 after 之后的第一个交易日，一年内没有时返回 None"""
+        after = parse_date(after) or date.today()
+        start = after if inclusive else after + timedelta(days=1)
+        end = start + timedelta(days=MAX_QUERY_DAYS - 1)
+        self.ensure(start, end)
+        with self.lock:
+            lo, hi = self._slice(start, end)
+            return date.fromordinal(int(self._ordinals[lo])) if hi > lo else None
+
+    def expected_bars(self, start, end, ktype='K_DAY'):
+        """返回 [start, end] 内常规交易时段应有的K线根数，半日市只计开市的时段
+
+        Args:
+            ktype (str): K_DAY 或分钟K线类型 K_1M/K_3M/K_5M/K_15M/K_30M/K_60M
+        """
+        ktype = str(ktype)
+        if ktype == 'K_DAY':
+            return self.count_trading_days(start, end)
+        if ktype not in KTYPE_MINUTES:
+            raise ValueError(f"不支持的K线类型: {ktype}")
+        if self.market not in MARKET_SESSIONS:
+            raise ValueError(f"{self.market} 没有交易时段信息，无法计算分钟K线数量")
+        start, end = parse_date(start), parse_date(end)
+        self.ensure(start, end)
+        minutes = KTYPE_MINUTES[ktype]
+        # 每类交易日的K线根数：每个时段向上取整
+        bars_per_type = np.array([
+            sum(-(-(close - open_) // minutes) for open_, close in day_session_minutes(self.market, day_type))
+            for day_type in DAY_TYPES
+        ])
+        with self.lock:
+            lo, hi = self._slice(start, end)
+            counts = np.bincount(self._types[lo:hi], minlength=len(DAY_TYPES))
+        return int(counts @ bars_per_type)
+
+
+_calendars = {}
+_calendars_lock = threading.Lock()
+
+def get_trading_calendar(market):
+    """获取进程内共享的某市场交易日历"""
+    with _calendars_lock:
+        if market not in _calendars:
+            _calendars[market] = TradingCalendar(market)
+        return _calendars[market]
+
+
+# 查询失败后在该秒数内直接按工作日判断，避免OpenD不可用时反复请求
+FALLBACK_SECONDS = 60
+_failed_at = {}
+
+def is_trading_day(market, day):
+    """(market, date) -> bool，可直接作为缓存等组件的交易日判断函数
+
+    日历获取失败时退回到只排除周末的判断
+    """
+    if time.time() - _failed_at.get(market, 0) < FALLBACK_SECONDS:
+        return is_weekday(day)
+    try:
+        return get_trading_calendar(market).is_trading_day(day)
+    except Exception:
+        _failed_at[market] = time.time()
+        return is_weekday(day)
+
+
+def trading_day_type(market, day):
+    """(market, date) -> WHOLE/MORNING/AFTERNOON，非交易日返回 None，可作为K线聚合与重采样的半日市判断
+
+    日历获取失败时按全天处理
+    """
+    if time.time() - _failed_at.get(market, 0) < FALLBACK_SECONDS:
+        return 'WHOLE'
+    try:
+        return get_trading_calendar(market).day_type(day)
+    except Exception:
+        _failed_at[market] = time.time()
+        return 'WHOLE'
+
+
+def query_calendar(market, query, day=None, start=None, end=None, n=1, ktype='K_DAY', inclusive=False):
+    """执行一次日历查询，返回可序列化的结果"""
+    if query not in SUPPORTED_QUERIES:
+        raise ValueError(f"不支持的查询: {query}, 支持的查询: {list(SUPPORTED_QUERIES)}")
+    calendar = get_trading_calendar(market)
+    day = parse_date(day) or date.today()
+    start = parse_date(start)
+    end = parse_date(end) or date.today()
+    if query in ('trading_days', 'count_trading_days', 'expected_bars') and start is None:
+        raise ValueError(f"{query} 需要 start 参数")
+
+    result = {"market": market, "query": query}
+    if query == 'is_trading_day':
+        result["date"] = day.isoformat()
+        result["is_trading_day"] = calendar.is_trading_day(day)
+        result["trade_date_type"] = calendar.day_type(day)
+    elif query == 'trading_days':
+        result["trading_days"] = [d.isoformat() for d in calendar.trading_days(start, end)]
+    elif query == 'previous_trading_days':
+        result["trading_days"] = [d.isoformat() for d in calendar.previous_trading_days(n, day, inclusive)]
+    elif query == 'next_trading_day':
+        next_day = calendar.next_trading_day(day, inclusive)
+        result["next_trading_day"] = next_day.isoformat() if next_day else None
+    elif query == 'count_trading_days':
+        result["count"] = calendar.count_trading_days(start, end)
+    elif query == 'expected_bars':
+        result["ktype"] = ktype
+        result["count"] = calendar.expected_bars(start, end, ktype)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='查询本地缓存的交易日历')
+    parser.add_argument('--market', type=str, required=True,
+                        help='市场类型: HK=香港市场, US=美国市场, CN=A股市场, NT=深(沪)股通, ST=港股通(深、沪), JP_FUTURE=日本期货, SG_FUTURE=新加坡期货')
+    parser.add_argument('--query', type=str, default='is_trading_day', choices=SUPPORTED_QUERIES,
+                        help='查询类型')
+    parser.add_argument('--date', type=str, default=None,
+                        help='基准日期, 格式: yyyy-MM-dd, 默认今天(is_trading_day/previous_trading_days/next_trading_day)')
+    parser.add_argument('--start', type=str, default=None,
+                        help='起始日期, 格式: yyyy-MM-dd(trading_days/count_trading_days/expected_bars)')
+    parser.add_argument('--end', type=str, default=None,
+                        help='结束日期, 格式: yyyy-MM-dd, 默认今天')
+    parser.add_argument('--n', type=int, default=1,
+                        help='previous_trading_days 返回的交易日个数')
+    parser.add_argument('--ktype', type=str, default='K_DAY',
+                        help='expected_bars 的K线类型: K_DAY, K_1M, K_3M, K_5M, K_15M, K_30M, K_60M')
+    parser.add_argument('--inclusive', action='store_true',
+                        help='基准日期本身是否计入 previous_trading_days/next_trading_day')
+
+    args = parser.parse_args()
+
+    try:
+        results = query_calendar(
+            args.market, args.query, args.date, args.start, args.end,
+            args.n, args.ktype, args.inclusive
+        )
+
+        # 输出结果
+        print_json_result(results)
+
+    except Exception as e:
+        handle_exception(e)
+    finally:
+        get_quote_context_pool().close()  # 关闭连接，防止连接条数用尽
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,25 @@
 from futu import *
 import json
+import math
 import numpy as np
+import pandas as pd
+import os
 import sys
+import time
+import threading
 import logging
+from contextlib import contextmanager
+from scheduler import ScheduledQuoteContext, PRIORITY_ADHOC
+
+try:
+    import orjson  # 可选的快速JSON编码器
+except ImportError:
+    orjson = None
+
+# OpenD 连接配置，可通过环境变量覆盖
+OPEND_HOST = os.environ.get('FUTU_OPEND_HOST', '127.0.0.1')
+OPEND_PORT = int(os.environ.get('FUTU_OPEND_PORT', '11111'))
+QUOTE_POOL_SIZE = int(os.environ.get('FUTU_QUOTE_POOL_SIZE', '4'))
 
 # 配置日志
 def setup_logger():
@@ -11,35 +28,203 @@ def setup_logger():
     logging.basicConfig(level=logging.ERROR, stream=sys.stderr)
 
 # 创建行情连接上下文
-def create_quote_context():
-    """创建并返回行情对象"""
-    return OpenQuoteContext(host='127.0.0.1', port=11111)
+def create_quote_context(host=None, port=None, priority=PRIORITY_ADHOC):
+    """创建并返回行情对象，限频接口的调用经请求调度器按 priority 排队"""
+    return ScheduledQuoteContext(
+        OpenQuoteContext(host=host or OPEND_HOST, port=port or OPEND_PORT),
+        priority=priority
+    )
 
-# 处理DataFrame为JSON兼容格式
-def process_dataframe(data_frame):
-    """将DataFrame处理为JSON兼容的格式"""
-    # 处理NaN值等
-    data_dict = data_frame.replace({np.nan: None, np.inf: None, -np.inf: None}).to_dict(orient='records')
-    
-    # 处理numpy类型
-    result = []
-    for item in data_dict:
-        processed_item = {}
-        for key, value in item.items():
-            if isinstance(value, (np.integer, np.floating)):
-                processed_item[key] = value.item()  # 转换numpy类型为Python原生类型
+def is_quote_context_alive(quote_ctx):
+    """检查行情对象与OpenD的连接是否可用"""
+    try:
+        ret_code, _ = quote_ctx.get_global_state()
+        return ret_code == RET_OK
+    except Exception:
+        return False
+
+class QuoteContextPool:
+    """行情对象连接池
+
+    按需创建行情对象，最多同时保持 size 个连接。调用方通过 lease() 借出、用完自动归还；
+    空闲超过 check_interval 秒或上次使用出错(抛出异常或接口返回错误码)的连接在借出前会做存活检查，失败则重建。
+    """
+    def __init__(self, size=None, host=None, port=None, check_interval=30):
+        self.size = size or QUOTE_POOL_SIZE
+        self.host = host or OPEND_HOST
+        self.port = port or OPEND_PORT
+        self.check_interval = check_interval
+        self._idle = []           # 空闲连接: [quote_ctx, 上次确认可用时间, 是否需要检查]
+        self._in_use = 0          # 已借出的连接数
+        self._reconnects = 0      # 因检查失败重建的次数
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _create(self):
+        return create_quote_context(self.host, self.port)
+
+    def acquire(self, timeout=None):
+        """借出一个可用的行情对象，连接数已满时等待其他调用方归还"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._idle and self._in_use >= self.size:
+                if self._closed:
+                    raise RuntimeError("行情连接池已关闭")
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("等待行情连接超时")
+                self._cond.wait(remaining)
+            if self._closed:
+                raise RuntimeError("行情连接池已关闭")
+            entry = self._idle.pop() if self._idle else None
+            self._in_use += 1
+
+        try:
+            if entry is None:
+                return self._create()
+            quote_ctx, checked_at, suspect = entry
+            if suspect or time.monotonic() - checked_at > self.check_interval:
+                if not is_quote_context_alive(quote_ctx):
+                    # 连接失效，关闭后重建
+                    quote_ctx.close()
+                    with self._cond:
+                        self._reconnects += 1
+                    return self._create()
+            return quote_ctx
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, quote_ctx, suspect=False):
+        """归还行情对象，suspect 为 True 时下次借出前会先做存活检查"""
+        with self._cond:
+            self._in_use -= 1
+            if self._closed:
+                quote_ctx.close()
             else:
-                processed_item[key] = value
-        result.append(processed_item)
+                self._idle.append([quote_ctx, time.monotonic(), suspect])
+            self._cond.notify()
+
+    @contextmanager
+    def lease(self, timeout=None, timer=None):
+        """以上下文管理器方式借出行情对象
+
+        Args:
+            timer (StageTimer): 提供时记录等待连接的耗时(lease 阶段)，并在借出期间记录接口调用耗时
+        """
+        start = time.perf_counter()
+        quote_ctx = self.acquire(timeout)
+        if timer is not None:
+            timer.add('lease', time.perf_counter() - start)
+            quote_ctx.timer = timer
+        quote_ctx.last_error = None
+        suspect = False
+        try:
+            yield quote_ctx
+        except Exception:
+            suspect = True
+            raise
+        finally:
+            if timer is not None:
+                quote_ctx.timer = None
+            # 断线时接口通常只返回错误码而不抛异常，同样在下次借出前检查连接
+            suspect = suspect or quote_ctx.last_error is not None
+            self.release(quote_ctx, suspect)
+
+    def stats(self):
+        """返回连接池使用情况"""
+        with self._cond:
+            return {
+                "size": self.size,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "reconnects": self._reconnects
+            }
+
+    def close(self):
+        """关闭所有空闲连接，已借出的连接在归还时关闭"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for quote_ctx, _, _ in idle:
+            quote_ctx.close()  # 关闭对象，防止连接条数用尽
+
+_quote_context_pool = None
+_quote_context_pool_lock = threading.Lock()
+
+def get_quote_context_pool():
+    """获取进程内共享的行情连接池"""
+    global _quote_context_pool
+    with _quote_context_pool_lock:
+        if _quote_context_pool is None:
+            _quote_context_pool = QuoteContextPool()
+        return _quote_context_pool
+
+# 将单列转换为JSON兼容的Python原生值列表
+def column_to_list(values):
+    """按列一次性转换numpy数组为Python原生类型列表，NaN/inf 转为 None"""
+    kind = values.dtype.kind
+    if kind == 'f':
+        invalid = ~np.isfinite(values)
+        if invalid.any():
+            values = values.astype(object)
+            values[invalid] = None
+        return values.tolist()
+    if kind in 'iub':
+        return values.tolist()
+    if kind == 'M':
+        text = np.datetime_as_string(values, unit='s').astype(object)
+        text[np.isnat(values)] = None
+        return [v.replace('T', ' ') if v is not None else None for v in text.tolist()]
+    
+    # object列：缺失值转为None，仅在存在numpy标量时逐个转换
+    values = values.astype(object)
+    values[pd.isna(values)] = None
+    result = values.tolist()
+    if pd.api.types.infer_dtype(values, skipna=True) not in ('string', 'empty', 'boolean'):
+        result = [v.item() if isinstance(v, np.generic) else v for v in result]
+        result = [None if isinstance(v, float) and not math.isfinite(v) else v for v in result]
     return result
 
+# 处理DataFrame为列式JSON兼容格式
+def dataframe_to_columns(data_frame):
+    """将DataFrame按列转换为 {列名: 值列表} 的JSON兼容格式"""
+    return {
+        str(name): column_to_list(data_frame[name].to_numpy())
+        for name in data_frame.columns
+    }
+
+# 处理DataFrame为JSON兼容格式
+def process_dataframe(data_frame):
+    """将DataFrame处理为JSON兼容的格式(逐行字典列表)"""
+    columns = dataframe_to_columns(data_frame)
+    names = list(columns.keys())
+    return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+# 序列化JSON结果
+def to_json(results):
+    """将结果序列化为JSON字符串，安装了orjson时使用orjson"""
+    if orjson is not None:
+        return orjson.dumps(
+            results, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        ).decode('utf-8')
+    return json.dumps(results, ensure_ascii=False)
+
 # 打印JSON结果
 def print_json_result(results):
     """以标准格式打印JSON结果"""
     print("###JSON_BEGIN###")
-    print(json.dumps(results, ensure_ascii=False))
+    print(to_json(results))
     print("###JSON_END###")
 
+# 打印单行JSON(NDJSON流式输出)
+def print_json_line(record):
+    """输出一行JSON并立即刷新，用于流式输出"""
+    print(to_json(record), flush=True)
+
 # 处理异常并打印错误
 def handle_exception(e):
     """处理异常并以标准格式输出错误"""
@@ -0,0 +1,311 @@
+"""常驻Python工作进程
+
+由Node服务启动一次并常驻，通过标准输入输出按行交换JSON消息，
+避免每次工具调用都重新启动解释器、导入futu/pandas/numpy以及建立OpenD连接。
+
+请求格式(每行一个):  {"id": 1, "method": "get_market_snapshot", "params": {...}}
+响应格式(每行一个):  {"id": 1, "result": {...}, "timings": {...}} 或 {"id": 1, "error": "...", "timings": {...}}
+流式方法在最终响应前会先逐条发送 {"id": 1, "chunk": {...}}
+timings 为本次请求各阶段的毫秒数：queue(等待工作线程)、lease(等待行情连接)、rate_wait(限频等待)、
+opend(OpenD 接口调用，并发时为累计值)、handler(方法执行)、serialize(JSON序列化)，以及 opend_calls 与 response_bytes
+"""
+import time
+STARTED_AT = time.perf_counter()  # 导入依赖模块之前的时间，用于统计启动时的导入耗时
+
+import argparse
+import inspect
+import sys
+import threading
+import json
+from concurrent.futures import ThreadPoolExecutor
+from stage_timer import StageTimer
+from utils import (
+    setup_logger, create_quote_context, get_quote_context_pool, to_json
+)
+from get_market_snapshot import get_market_snapshot
+from request_history_kline import (
+    request_history_kline, stream_history_kline, parse_ktype, parse_autype, parse_fields
+)
+from kline_store import get_kline_store
+from scheduler import get_scheduler
+from request_trading_days import request_trading_days, parse_market
+from trading_calendar import query_calendar
+from calculate_moving_average import get_stock_ma
+from subscription_service import SubscriptionService
+from ticker_tape import TickerTapes
+from order_book import OrderBooks
+
+# 设置日志
+setup_logger()
+
+
+class Worker:
+    """按行读取请求并在常驻行情上下文中执行的工作进程"""
+    def __init__(self, output, threads=4):
+        self.output = output              # 协议输出通道(原始stdout)
+        self.output_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.pool = get_quote_context_pool()
+        self.subscription_service = None  # 订阅归属于连接，使用独立的常驻连接并保存推送的最新值
+        self.ticker_tapes = TickerTapes()  # 订阅服务收到的逐笔成交
+        self.order_books = OrderBooks()    # 订阅服务收到的摆盘
+        self.local = threading.local()    # 当前线程正在处理的请求的计时器
+        self.ctx_lock = threading.Lock()
+        self.methods = {
+            'get_market_snapshot': self.get_market_snapshot,
+            'request_history_kline': self.request_history_kline,
+            'request_trading_days': self.request_trading_days,
+            'trading_calendar': self.trading_calendar,
+            'calculate_moving_average': self.calculate_moving_average,
+            'subscription_manager': self.subscription_manager,
+            'latest_market_data': self.latest_market_data,
+            'ticker_stats': self.ticker_stats,
+            'order_book_features': self.order_book_features,
+            'pool_stats': self.pool_stats,
+            'scheduler_stats': self.scheduler_stats,
+            'ping': self.ping,
+        }
+
+    def get_subscription_service(self):
+        """获取订阅服务(持有订阅专用的常驻行情上下文)，首次调用时创建"""
+        with self.ctx_lock:
+            if self.subscription_service is None:
+                self.subscription_service = SubscriptionService(create_quote_context())
+                self.subscription_service.add_listener('TICKER', self.ticker_tapes.on_ticker)
+                self.subscription_service.add_listener('ORDER_BOOK', self.order_books.on_order_book)
+            return self.subscription_service
+
+    def lease(self):
+        """从连接池借出行情对象，等待与接口调用耗时计入当前请求的计时器"""
+        return self.pool.lease(timer=getattr(self.local, 'timer', None))
+
+    def ping(self, params):
+        return {"pong": True}
+
+    def pool_stats(self, params):
+        return self.pool.stats()
+
+    def scheduler_stats(self, params):
+        return get_scheduler().stats()
+
+    def get_market_snapshot(self, params):
+        code_list = params.get('code_list') or []
+        if not code_list:
+            raise ValueError("code_list 参数不能为空")
+        with self.lease() as quote_ctx:
+            return get_market_snapshot(
+                quote_ctx, code_list,
+                concurrency=params.get('concurrency', 4),
+                columnar=bool(params.get('columnar', False))
+            )
+
+    def request_history_kline(self, params):
+        code = params.get('code')
+        if not code:
+            raise ValueError("code 参数不能为空")
+        kwargs = dict(
+            start=params.get('start'),
+            end=params.get('end'),
+            ktype=parse_ktype(params.get('ktype', 'K_DAY')),
+            autype=parse_autype(params.get('autype', 1)),
+            fields=parse_fields(params.get('fields')),
+            max_count=params.get('max_count', 1000),
+            extended_time=bool(params.get('extended_time', False)),
+            store=get_kline_store() if params.get('use_store', True) else None
+        )
+        if params.get('stream'):
+            return self.stream_history_kline(code, kwargs)
+        with self.lease() as quote_ctx:
+            return request_history_kline(quote_ctx, code, **kwargs)
+
+    def stream_history_kline(self, code, kwargs):
+        """流式获取K线，租用的连接在生成器结束时归还"""
+        with self.lease() as quote_ctx:
+            yield from stream_history_kline(quote_ctx, code, **kwargs)
+
+    def request_trading_days(self, params):
+        with self.lease() as quote_ctx:
+            return request_trading_days(
+                quote_ctx,
+                parse_market(params.get('market')),
+                params.get('start'),
+                params.get('end'),
+                params.get('code')
+            )
+
+    def trading_calendar(self, params):
+        market = params.get('market')
+        if not market:
+            raise ValueError("market 参数不能为空")
+        # 日历缺失区间时自行从连接池租用连接，这里不预先占用
+        return query_calendar(
+            market, params.get('query', 'is_trading_day'),
+            day=params.get('date'),
+            start=params.get('start'),
+            end=params.get('end'),
+            n=params.get('n', 1),
+            ktype=params.get('ktype', 'K_DAY'),
+            inclusive=bool(params.get('inclusive', False))
+        )
+
+    def calculate_moving_average(self, params):
+        code_list = params.get('code_list') or []
+        if not code_list:
+            raise ValueError("code_list 参数不能为空")
+        with self.lease() as quote_ctx:
+            return get_stock_ma(
+                quote_ctx, code_list,
+                params.get('ma_periods') or [5, 10, 20],
+                params.get('indicators') or ['ma'],
+                concurrency=params.get('concurrency', 4),
+                boll_period=params.get('boll_period', 20),
+                boll_k=params.get('boll_k', 2.0),
+                rsi_period=params.get('rsi_period', 14),
+                macd_fast=params.get('macd_fast', 12),
+                macd_slow=params.get('macd_slow', 26),
+                macd_signal=params.get('macd_signal', 9)
+            )
+
+    def subscription_manager(self, params):
+        return self.get_subscription_service().run_command(
+            params.get('command'),
+            code_list=params.get('code_list'),
+            subtype_list=params.get('subtype_list'),
+            is_first_push=params.get('is_first_push', True),
+            subscribe_push=params.get('subscribe_push', True),
+            is_detailed_orderbook=params.get('is_detailed_orderbook', False),
+            extended_time=params.get('extended_time', False),
+            unsubscribe_all=params.get('unsubscribe_all', False)
+        )
+
+    def latest_market_data(self, params):
+        """读取订阅推送的最新报价、摆盘或分时，不请求 OpenD"""
+        subtype = (params.get('subtype') or 'QUOTE').upper()
+        with self.ctx_lock:
+            service = self.subscription_service
+        if service is None:
+            return {"error": {"message": "尚未订阅任何股票，请先通过 subscription_manager 订阅"}}
+        result = service.latest(subtype, params.get('code_list') or None, params.get('fields') or None)
+        if result["missing"]:
+            result["message"] = "部分股票尚未收到推送，请确认已订阅对应类型"
+        return result
+
+    def ticker_stats(self, params):
+        """在订阅推送的逐笔成交上计算最近一段时间的 VWAP、买卖失衡与大单，不请求 OpenD"""
+        result = self.ticker_tapes.stats(
+            params.get('code_list') or None,
+            seconds=params.get('seconds', 60),
+            large_volume=params.get('large_volume'),
+            large_multiple=params.get('large_multiple', 10),
+        )
+        if result["missing"]:
+            result["message"] = "部分股票尚未收到逐笔推送，请先通过 subscription_manager 订阅 TICKER"
+        return result
+
+    def order_book_features(self, params):
+        """在订阅推送维护的摆盘上计算价差、微观价格、挂单量失衡与排队量变化，不请求 OpenD"""
+        result = self.order_books.features(
+            params.get('code_list') or None,
+            levels=params.get('levels', 5),
+            include_deltas=params.get('include_deltas', False),
+        )
+        if result["missing"]:
+            result["message"] = "部分股票尚未收到摆盘推送，请先通过 subscription_manager 订阅 ORDER_BOOK"
+        return result
+
+    def send(self, message):
+        """向协议通道写入一行JSON消息"""
+        self.write(to_json(message))
+
+    def write(self, line):
+        with self.output_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def send_timed(self, timer, request_id, key, value):
+        """序列化并发送一条消息，序列化耗时与字节数计入计时器"""
+        with timer.measure('serialize'):
+            body = to_json(value)
+        timer.incr('response_bytes', len(body))
+        self.write(f'{{"id":{to_json(request_id)},"{key}":{body}}}')
+
+    def handle(self, request, received_at=None):
+        """执行单个请求并返回响应，响应附带各阶段耗时"""
+        timer = StageTimer()
+        if received_at is not None:
+            timer.add('queue', time.perf_counter() - received_at)
+        request_id = request.get('id')
+        method = self.methods.get(request.get('method'))
+        if method is None:
+            self.send({"id": request_id, "error": f"未知方法: {request.get('method')}"})
+            return
+        self.local.timer = timer
+        start = time.perf_counter()
+        sending = 0.0       # 流式发送(序列化与写出)的耗时，不计入 handler
+        error = None
+        try:
+            result = method(request.get('params') or {})
+            if inspect.isgenerator(result):
+                # 流式结果逐条发送，最后以条数作为最终响应
+                count = 0
+                for chunk in result:
+                    sent_at = time.perf_counter()
+                    self.send_timed(timer, request_id, "chunk", chunk)
+                    sending += time.perf_counter() - sent_at
+                    count += 1
+                result = {"chunks": count}
+        except Exception as e:
+            error = str(e)
+        finally:
+            self.local.timer = None
+            timer.add('handler', time.perf_counter() - start - sending)
+
+        if error is None:
+            with timer.measure('serialize'):
+                body = to_json(result)
+            timer.incr('response_bytes', len(body))
+            message = f'{{"id":{to_json(request_id)},"result":{body}'
+        else:
+            message = f'{{"id":{to_json(request_id)},"error":{to_json(error)}'
+        self.write(f'{message},"timings":{to_json(timer.as_dict())}}}')
+
+    def serve(self, input_stream):
+        """循环读取请求直到输入关闭"""
+        for line in input_stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                self.send({"id": None, "error": f"请求解析失败: {e}"})
+                continue
+            self.executor.submit(self.handle, request, time.perf_counter())
+        self.close()
+
+    def close(self):
+        """等待进行中的请求完成并关闭行情上下文"""
+        self.executor.shutdown(wait=True)
+        self.pool.close()
+        if self.subscription_service:
+            self.subscription_service.close()
+            self.subscription_service = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='常驻Python工作进程')
+    parser.add_argument('--threads', type=int, default=4,
+                        help='并发处理请求的线程数，建议与行情连接池大小(FUTU_QUOTE_POOL_SIZE)一致')
+
+    args = parser.parse_args()
+
+    # 协议独占stdout，脚本中的普通print输出转到stderr
+    output = sys.stdout
+    sys.stdout = sys.stderr
+
+    worker = Worker(output, threads=args.threads)
+    worker.send({"id": None, "ready": True, "import_ms": round((time.perf_counter() - STARTED_AT) * 1000, 3)})
+    worker.serve(sys.stdin)
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 export const calculateMovingAverageDefinition = {
   "name": "calculate_moving_average",
-  "description": "计算指定股票的多种周期移动平均线(MA)，支持5日、10日、20日等自定义周期",
+  "description": "计算指定股票的移动平均线(MA)及EMA、WMA、布林带、RSI、MACD等技术指标，支持自定义周期，结果按列返回(time_key与各指标等长数组)",
   "inputSchema": {
     "type": "object",
     "properties": {
@@ -16,7 +16,43 @@ export const calculateMovingAverageDefinition = {
         "items": {
           "type": "number"
         },
-        "description": "移动平均线周期列表，例如：[5, 10, 20, 60]，默认为[5, 10, 20]"
+        "description": "移动平均线周期列表，例如：[5, 10, 20, 60]，默认为[5, 10, 20]；ma/ema/wma 均使用该周期列表"
+      },
+      "indicators": {
+        "type": "array",
+        "items": {
+          "type": "string",
+          "enum": ["ma", "ema", "wma", "boll", "rsi", "macd"]
+        },
+        "description": "需要计算的指标列表：ma(简单均线)、ema(指数均线)、wma(加权均线)、boll(布林带)、rsi(相对强弱)、macd，默认为[\"ma\"]"
+      },
+      "concurrency": {
+        "type": "number",
+        "description": "并发获取K线的线程数，默认4；整体请求速率仍受OpenD历史K线频率限制(30秒60次)"
+      },
+      "boll_period": {
+        "type": "number",
+        "description": "布林带周期，默认20"
+      },
+      "boll_k": {
+        "type": "number",
+        "description": "布林带标准差倍数，默认2"
+      },
+      "rsi_period": {
+        "type": "number",
+        "description": "RSI周期，默认14"
+      },
+      "macd_fast": {
+        "type": "number",
+        "description": "MACD快线周期，默认12"
+      },
+      "macd_slow": {
+        "type": "number",
+        "description": "MACD慢线周期，默认26"
+      },
+      "macd_signal": {
+        "type": "number",
+        "description": "MACD信号线周期，默认9"
       }
     },
     "required": ["code_list"]
@@ -0,0 +1,30 @@
+export const getLatestMarketDataDefinition = {
+  "name": "get_latest_market_data",
+  "description": "读取已订阅股票最近一次推送的报价(QUOTE)、摆盘(ORDER_BOOK)或分时(RT_DATA)，数据保存在常驻工作进程内存中，不请求OpenD。需先用 subscription_manager 订阅对应类型，返回中的 age_ms 为距收到推送的毫秒数",
+  "inputSchema": {
+    "type": "object",
+    "properties": {
+      "subtype": {
+        "type": "string",
+        "enum": ["QUOTE", "ORDER_BOOK", "RT_DATA"],
+        "description": "数据类型，默认 QUOTE",
+        "default": "QUOTE"
+      },
+      "code_list": {
+        "type": "array",
+        "items": {
+          "type": "string"
+        },
+        "description": "股票代码列表，默认返回所有已收到推送的股票"
+      },
+      "fields": {
+        "type": "array",
+        "items": {
+          "type": "string"
+        },
+        "description": "只返回这些字段，例如 last_price、volume，默认全部字段"
+      }
+    },
+    "required": [],
+  }
+};
@@ -9,7 +9,15 @@ export const getMarketSnapshotDefinition = {
         "items": {
           "type": "string"
         },
-        "description": "需要查询的证券代码列表，支持股票/窝轮/期权等多种类型，最大支持400个代码"
+        "description": "需要查询的证券代码列表，支持股票/窝轮/期权等多种类型，数量不限，超过400个时自动分组并发请求"
+      },
+      "concurrency": {
+        "type": "number",
+        "description": "分组并发请求的线程数，默认4；整体请求速率仍受OpenD快照频率限制(30秒60次)"
+      },
+      "columnar": {
+        "type": "boolean",
+        "description": "是否以列式返回结果 {\"columns\": {列名: [...]}}，大量代码时体积更小，默认false"
       }
     },
     "required": ["code_list"]
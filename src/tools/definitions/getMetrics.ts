@@ -0,0 +1,24 @@
+export const getMetricsDefinition = {
+  "name": "get_metrics",
+  "description": "查询MCP服务的运行指标：各工具的调用次数、错误数、延迟分布(p50/p99)与返回大小，各Python方法的调用方式(常驻进程/启动脚本)及排队、等待连接、限频等待、OpenD调用、序列化等阶段耗时，常驻工作进程的启动与导入耗时，以及连接池和请求调度器状态",
+  "inputSchema": {
+    "type": "object",
+    "properties": {
+      "reset": {
+        "type": "boolean",
+        "description": "返回后是否清空已累计的指标，默认false",
+        "default": false
+      },
+      "include_worker": {
+        "type": "boolean",
+        "description": "常驻工作进程已启动时是否附带连接池与请求调度器状态，默认true",
+        "default": true
+      },
+      "dump_file": {
+        "type": "string",
+        "description": "同时将指标快照写入该本地文件路径(JSON)"
+      }
+    },
+    "required": [],
+  }
+};
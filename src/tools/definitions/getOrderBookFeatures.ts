@@ -0,0 +1,27 @@
+export const getOrderBookFeaturesDefinition = {
+  "name": "get_order_book_features",
+  "description": "在已订阅股票的摆盘(ORDER_BOOK)推送维护的本地盘口上计算特征：买一/卖一价量、价差、中间价、微观价格(按对侧挂单量加权)、前N档挂单量失衡、累计最优档委托流失衡(ofi)，可选各档相对上一次推送的排队量变化。盘口保存在常驻工作进程内存中，不请求OpenD，需先用 subscription_manager 订阅 ORDER_BOOK",
+  "inputSchema": {
+    "type": "object",
+    "properties": {
+      "code_list": {
+        "type": "array",
+        "items": {
+          "type": "string"
+        },
+        "description": "股票代码列表，默认返回所有已收到摆盘推送的股票"
+      },
+      "levels": {
+        "type": "number",
+        "description": "计算挂单量失衡与排队量变化的档数，默认5",
+        "default": 5
+      },
+      "include_deltas": {
+        "type": "boolean",
+        "description": "是否返回各档排队量变化 bid_deltas/ask_deltas，默认false",
+        "default": false
+      }
+    },
+    "required": [],
+  }
+};
@@ -0,0 +1,31 @@
+export const getTickerStatsDefinition = {
+  "name": "get_ticker_stats",
+  "description": "在已订阅股票的逐笔成交(TICKER)推送上计算最近一段时间的统计：成交笔数与每秒笔数、成交量与成交额、VWAP、最高/最低/最新价、主动买卖量与失衡度以及大单。逐笔数据保存在常驻工作进程内存中，不请求OpenD，需先用 subscription_manager 订阅 TICKER",
+  "inputSchema": {
+    "type": "object",
+    "properties": {
+      "code_list": {
+        "type": "array",
+        "items": {
+          "type": "string"
+        },
+        "description": "股票代码列表，默认返回所有已收到逐笔推送的股票"
+      },
+      "seconds": {
+        "type": "number",
+        "description": "统计窗口(秒)，以最新一笔成交时间为终点，默认60",
+        "default": 60
+      },
+      "large_volume": {
+        "type": "number",
+        "description": "大单的成交量下限，不填时取窗口内成交量中位数的 large_multiple 倍"
+      },
+      "large_multiple": {
+        "type": "number",
+        "description": "未指定 large_volume 时，大单为成交量中位数的倍数，默认10",
+        "default": 10
+      }
+    },
+    "required": [],
+  }
+};
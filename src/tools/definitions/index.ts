@@ -3,6 +3,11 @@ import { requestHistoryKlineDefinition } from './requestHistoryKline.js';
 import { requestTradingDaysDefinition } from './requestTradingDays.js';
 import { calculateMovingAverageDefinition } from './calculateMovingAverage.js';
 import { subscriptionManagerDefinition } from './subscriptionManager.js';
+import { tradingCalendarDefinition } from './tradingCalendar.js';
+import { getMetricsDefinition } from './getMetrics.js';
+import { getLatestMarketDataDefinition } from './getLatestMarketData.js';
+import { getTickerStatsDefinition } from './getTickerStats.js';
+import { getOrderBookFeaturesDefinition } from './getOrderBookFeatures.js';
 
 // 导出所有工具定义
 export const tools = [
@@ -10,5 +15,10 @@ export const tools = [
   requestHistoryKlineDefinition,
   requestTradingDaysDefinition,
   calculateMovingAverageDefinition,
-  subscriptionManagerDefinition
+  subscriptionManagerDefinition,
+  tradingCalendarDefinition,
+  getMetricsDefinition,
+  getLatestMarketDataDefinition,
+  getTickerStatsDefinition,
+  getOrderBookFeaturesDefinition
 ];
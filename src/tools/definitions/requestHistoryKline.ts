@@ -39,6 +39,10 @@ export const requestHistoryKlineDefinition = {
         "type": "boolean",
         "description": "是否允许美股盘前盘后数据，默认false",
       },
+      "use_store": {
+        "type": "boolean",
+        "description": "是否使用本地K线存储，日K线和分钟K线只向OpenD补齐本地缺失的区间，默认true",
+      },
     },
     "required": ["code"],
   }
@@ -1,6 +1,6 @@
 export const subscriptionManagerDefinition = {
   "name": "subscription_manager",
-  "description": "管理股票行情订阅，支持订阅、取消订阅和查询订阅状态",
+  "description": "管理股票行情订阅，支持订阅、取消订阅和查询订阅状态。订阅保持在常驻工作进程的行情连接上，报价、摆盘、分时推送的最新值可通过 get_latest_market_data 读取",
   "inputSchema": {
     "type": "object",
     "properties": {
@@ -0,0 +1,47 @@
+export const tradingCalendarDefinition = {
+  "name": "trading_calendar",
+  "description": "查询本地缓存的交易日历：是否交易日、区间内交易日、前N个/下一个交易日、交易日数以及区间内应有的K线根数。只对本地未覆盖的日期向OpenD查询",
+  "inputSchema": {
+    "type": "object",
+    "properties": {
+      "market": {
+        "type": "string",
+        "description": "市场类型: HK=香港市场, US=美国市场, CN=A股市场, NT=深(沪)股通, ST=港股通(深、沪), JP_FUTURE=日本期货, SG_FUTURE=新加坡期货",
+      },
+      "query": {
+        "type": "string",
+        "enum": ["is_trading_day", "trading_days", "previous_trading_days", "next_trading_day", "count_trading_days", "expected_bars"],
+        "description": "查询类型，默认 is_trading_day",
+        "default": "is_trading_day"
+      },
+      "date": {
+        "type": "string",
+        "description": "基准日期, 格式: yyyy-MM-dd，默认今天。用于 is_trading_day、previous_trading_days、next_trading_day",
+      },
+      "start": {
+        "type": "string",
+        "description": "起始日期, 格式: yyyy-MM-dd。trading_days、count_trading_days、expected_bars 必填",
+      },
+      "end": {
+        "type": "string",
+        "description": "结束日期, 格式: yyyy-MM-dd，默认今天",
+      },
+      "n": {
+        "type": "number",
+        "description": "previous_trading_days 返回的交易日个数，默认1",
+        "default": 1
+      },
+      "ktype": {
+        "type": "string",
+        "description": "expected_bars 的K线类型: K_DAY, K_1M, K_3M, K_5M, K_15M, K_30M, K_60M，默认 K_DAY",
+        "default": "K_DAY"
+      },
+      "inclusive": {
+        "type": "boolean",
+        "description": "previous_trading_days/next_trading_day 是否计入基准日期本身，默认false",
+        "default": false
+      }
+    },
+    "required": ["market"],
+  }
+};
@@ -1,4 +1,4 @@
-import CommandExecutor from "../../utils/CommandExecutor.js";
+import { callPython } from "../../utils/PythonWorker.js";
 import path from 'path';
 import { fileURLToPath } from 'url';
 
@@ -6,7 +6,6 @@ const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
 
 export async function handleCalculateMovingAverage(params: Record<string, unknown> = {}) {
-  const command = new CommandExecutor();
   const scriptPath = path.join(__dirname, "../../../scripts/calculate_moving_average.py");
 
   // 从参数中获取股票代码列表
@@ -27,15 +26,28 @@ export async function handleCalculateMovingAverage(params: Record<string, unknow
     cmdArgs += ` --ma_periods ${params.ma_periods.join(' ')}`;
   }
 
+  // 添加指标参数（如果提供）
+  if (params.indicators && Array.isArray(params.indicators)) {
+    cmdArgs += ` --indicators ${params.indicators.join(' ')}`;
+  }
+  if (params.concurrency !== undefined) cmdArgs += ` --concurrency ${params.concurrency}`;
+  if (params.boll_period !== undefined) cmdArgs += ` --boll_period ${params.boll_period}`;
+  if (params.boll_k !== undefined) cmdArgs += ` --boll_k ${params.boll_k}`;
+  if (params.rsi_period !== undefined) cmdArgs += ` --rsi_period ${params.rsi_period}`;
+  if (params.macd_fast !== undefined || params.macd_slow !== undefined || params.macd_signal !== undefined) {
+    cmdArgs += ` --macd ${params.macd_fast ?? 12} ${params.macd_slow ?? 26} ${params.macd_signal ?? 9}`;
+  }
+
   const cmd = `python "${scriptPath}" ${cmdArgs}`;
 
   try {
     // 执行命令并解析JSON结果
-    const parsedResult = await command.executeJSONCommand(cmd, { debug: true });
+    const parsedResult = await callPython('calculate_moving_average', params, cmd);
 
     // 检查结果是否包含错误
     if (parsedResult.error) {
       return {
+        isError: true,
         content: [{
           type: "text",
           text: `计算移动平均线失败: ${JSON.stringify(parsedResult.error)}`
@@ -51,6 +63,7 @@ export async function handleCalculateMovingAverage(params: Record<string, unknow
     };
   } catch (error: any) {
     return {
+      isError: true,
       content: [{
         type: "text",
         text: `计算移动平均线失败: ${error.message}`
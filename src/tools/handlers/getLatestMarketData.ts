@@ -0,0 +1,44 @@
+import { getPythonWorker, isWorkerEnabled } from "../../utils/PythonWorker.js";
+
+export async function handleGetLatestMarketData(params: Record<string, unknown> = {}) {
+  // 订阅与推送数据只存在于常驻工作进程中，启动脚本的模式下无法读取
+  if (!isWorkerEnabled()) {
+    return {
+      isError: true,
+      content: [{
+        type: "text",
+        text: `读取订阅数据失败: 需要启用常驻工作进程(未设置 FUTU_MCP_WORKER=0)`
+      }]
+    };
+  }
+
+  try {
+    const parsedResult = await getPythonWorker().call('latest_market_data', params);
+
+    // 检查结果是否包含错误
+    if (parsedResult.error) {
+      return {
+        isError: true,
+        content: [{
+          type: "text",
+          text: `读取订阅数据失败: ${JSON.stringify(parsedResult.error)}`
+        }]
+      };
+    }
+
+    return {
+      content: [{
+        type: "text",
+        text: `订阅数据最新值: ${JSON.stringify(parsedResult, null, 2)}`
+      }]
+    };
+  } catch (error: any) {
+    return {
+      isError: true,
+      content: [{
+        type: "text",
+        text: `读取订阅数据失败: ${error.message}`
+      }]
+    };
+  }
+}
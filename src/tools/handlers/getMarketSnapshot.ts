@@ -1,4 +1,4 @@
-import CommandExecutor from "../../utils/CommandExecutor.js";
+import { callPython } from "../../utils/PythonWorker.js";
 import path from 'path';
 import { fileURLToPath } from 'url';
 
@@ -6,7 +6,6 @@ const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
 
 export async function handleGetMarketSnapshot(params: Record<string, unknown> = {}) {
-  const command = new CommandExecutor();
   const scriptPath = path.join(__dirname, "../../../scripts/get_market_snapshot.py");
 
   // 从参数中获取股票代码列表
@@ -19,15 +18,22 @@ export async function handleGetMarketSnapshot(params: Record<string, unknown> =
   // 正确处理多个股票代码，将每个股票代码作为单独的参数传递
   const formattedCodeList = codeList.map(code => `"${code}"`);
 
-  const cmd = `python "${scriptPath}" --code_list ${formattedCodeList.join(' ')}`;
+  let cmd = `python "${scriptPath}" --code_list ${formattedCodeList.join(' ')}`;
+  if (params.concurrency) cmd += ` --concurrency ${params.concurrency}`;
+  if (params.columnar) cmd += ` --columnar`;
 
   try {
     // 使用executeJSONCommand方法执行命令并解析JSON结果
-    const parsedResult = await command.executeJSONCommand(cmd, { debug: true });
+    const parsedResult = await callPython('get_market_snapshot', {
+      code_list: codeList,
+      concurrency: params.concurrency,
+      columnar: params.columnar
+    }, cmd);
 
     // 检查结果是否包含错误
     if (parsedResult.error) {
       return {
+        isError: true,
         content: [{
           type: "text",
           text: `获取市场快照数据失败: ${JSON.stringify(parsedResult.error)}`
@@ -35,14 +41,18 @@ export async function handleGetMarketSnapshot(params: Record<string, unknown> =
       };
     }
 
+    // 部分分组失败时仍返回成功分组的数据，并提示失败的分组
+    const failed = parsedResult.errors ? `(${parsedResult.errors.length} 组请求失败，见 errors)` : "";
+
     return {
       content: [{
         type: "text",
-        text: `获取到市场快照数据: ${JSON.stringify(parsedResult, null, 2)}`
+        text: `获取到市场快照数据${failed}: ${JSON.stringify(parsedResult, null, 2)}`
       }]
     };
   } catch (error: any) {
     return {
+      isError: true,
       content: [{
         type: "text",
         text: `获取市场快照数据失败: ${error.message}`
@@ -0,0 +1,40 @@
+import { getMetrics } from "../../utils/Metrics.js";
+import { getPythonWorker, isWorkerEnabled } from "../../utils/PythonWorker.js";
+
+export async function handleGetMetrics(params: Record<string, unknown> = {}) {
+  const metrics = getMetrics();
+
+  try {
+    const result: Record<string, unknown> = metrics.snapshot();
+
+    // 常驻工作进程已启动时附带连接池与调度器状态，未启动时不为此启动进程
+    if (params.include_worker !== false && isWorkerEnabled() && getPythonWorker().isRunning()) {
+      const worker = getPythonWorker();
+      const [pool, scheduler] = await Promise.all([worker.call('pool_stats'), worker.call('scheduler_stats')]);
+      result.pool = pool;
+      result.scheduler = scheduler;
+    }
+
+    if (typeof params.dump_file === 'string' && params.dump_file) {
+      metrics.dump(params.dump_file);
+    }
+    if (params.reset === true) {
+      metrics.reset();
+    }
+
+    return {
+      content: [{
+        type: "text",
+        text: `运行指标: ${JSON.stringify(result, null, 2)}`
+      }]
+    };
+  } catch (error: any) {
+    return {
+      isError: true,
+      content: [{
+        type: "text",
+        text: `查询运行指标失败: ${error.message}`
+      }]
+    };
+  }
+}
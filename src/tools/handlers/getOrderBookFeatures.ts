@@ -0,0 +1,44 @@
+import { getPythonWorker, isWorkerEnabled } from "../../utils/PythonWorker.js";
+
+export async function handleGetOrderBookFeatures(params: Record<string, unknown> = {}) {
+  // 摆盘只保存在常驻工作进程中，启动脚本的模式下无法读取
+  if (!isWorkerEnabled()) {
+    return {
+      isError: true,
+      content: [{
+        type: "text",
+        text: `计算盘口特征失败: 需要启用常驻工作进程(未设置 FUTU_MCP_WORKER=0)`
+      }]
+    };
+  }
+
+  try {
+    const parsedResult = await getPythonWorker().call('order_book_features', params);
+
+    // 检查结果是否包含错误
+    if (parsedResult.error) {
+      return {
+        isError: true,
+        content: [{
+          type: "text",
+          text: `计算盘口特征失败: ${JSON.stringify(parsedResult.error)}`
+        }]
+      };
+    }
+
+    return {
+      content: [{
+        type: "text",
+        text: `盘口特征: ${JSON.stringify(parsedResult, null, 2)}`
+      }]
+    };
+  } catch (error: any) {
+    return {
+      isError: true,
+      content: [{
+        type: "text",
+        text: `计算盘口特征失败: ${error.message}`
+      }]
+    };
+  }
+}
@@ -3,6 +3,11 @@ import { handleRequestHistoryKline } from './requestHistoryKline.js';
 import { handleRequestTradingDays } from './requestTradingDays.js';
 import { handleCalculateMovingAverage } from './calculateMovingAverage.js';
 import { handleSubscriptionManager } from './subscriptionManager.js';
+import { handleTradingCalendar } from './tradingCalendar.js';
+import { handleGetMetrics } from './getMetrics.js';
+import { handleGetLatestMarketData } from './getLatestMarketData.js';
+import { handleGetTickerStats } from './getTickerStats.js';
+import { handleGetOrderBookFeatures } from './getOrderBookFeatures.js';
 
 // 导出处理函数映射表
 export const handlers = {
@@ -10,5 +15,10 @@ export const handlers = {
   'request_history_kline': handleRequestHistoryKline,
   'request_trading_days': handleRequestTradingDays,
   'calculate_moving_average': handleCalculateMovingAverage,
-  'subscription_manager': handleSubscriptionManager
+  'subscription_manager': handleSubscriptionManager,
+  'trading_calendar': handleTradingCalendar,
+  'get_metrics': handleGetMetrics,
+  'get_latest_market_data': handleGetLatestMarketData,
+  'get_ticker_stats': handleGetTickerStats,
+  'get_order_book_features': handleGetOrderBookFeatures
 };
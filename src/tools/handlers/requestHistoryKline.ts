@@ -1,4 +1,4 @@
-import CommandExecutor from "../../utils/CommandExecutor.js";
+import { streamPython } from "../../utils/PythonWorker.js";
 import path from 'path';
 import { fileURLToPath } from 'url';
 
@@ -6,7 +6,6 @@ const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
 
 export async function handleRequestHistoryKline(params: Record<string, unknown> = {}) {
-  const command = new CommandExecutor();
   const scriptPath = path.join(__dirname, "../../../scripts/request_history_kline.py");
 
   // 获取必要参数
@@ -25,7 +24,8 @@ export async function handleRequestHistoryKline(params: Record<string, unknown>
   if (params.ktype !== undefined) cmdArgs += ` --ktype "${params.ktype}"`;
   if (params.autype !== undefined) cmdArgs += ` --autype ${params.autype}`;
   if (params.max_count !== undefined) cmdArgs += ` --max_count ${params.max_count}`;
-  if (params.extended_time !== undefined) cmdArgs += ` --extended_time ${params.extended_time}`;
+  if (params.extended_time === true) cmdArgs += ` --extended_time`;
+  if (params.use_store === false) cmdArgs += ` --no_store`;
 
   // 处理fields参数，如果是数组则添加所有项
   if (params.fields && Array.isArray(params.fields)) {
@@ -36,27 +36,39 @@ export async function handleRequestHistoryKline(params: Record<string, unknown>
   const cmd = `python "${scriptPath}" ${cmdArgs}`;
 
   try {
-    // 使用executeJSONCommand方法执行命令并解析JSON结果
-    const parsedResult = await command.executeJSONCommand(cmd, { debug: true });
+    // 以流式方式逐页接收K线，每页序列化为文本片段后即释放解析后的对象
+    const pages: string[] = [];
+    let streamError: unknown = null;
+
+    await streamPython('request_history_kline', params, cmd, (record) => {
+      if (record.type === 'page' && Array.isArray(record.data) && record.data.length > 0) {
+        pages.push(record.data.map((item: unknown) => JSON.stringify(item)).join(',\n    '));
+      } else if (record.type === 'error') {
+        streamError = record.error;
+      }
+    });
 
     // 检查结果是否包含错误
-    if (parsedResult.error) {
+    if (streamError) {
       return {
+        isError: true,
         content: [{
           type: "text",
-          text: `获取历史K线数据失败: ${JSON.stringify(parsedResult.error)}`
+          text: `获取历史K线数据失败: ${JSON.stringify(streamError)}`
         }]
       };
     }
 
+    const body = pages.length > 0 ? `\n    ${pages.join(',\n    ')}\n  ` : '';
     return {
       content: [{
         type: "text",
-        text: `获取到历史K线数据: ${JSON.stringify(parsedResult, null, 2)}`
+        text: `获取到历史K线数据: {\n  ${JSON.stringify(code)}: [${body}]\n}`
       }]
     };
   } catch (error: any) {
     return {
+      isError: true,
       content: [{
         type: "text",
         text: `获取历史K线数据失败: ${error.message}`
@@ -1,4 +1,4 @@
-import CommandExecutor from "../../utils/CommandExecutor.js";
+import { callPython } from "../../utils/PythonWorker.js";
 import path from 'path';
 import { fileURLToPath } from 'url';
 
@@ -6,7 +6,6 @@ const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
 
 export async function handleRequestTradingDays(params: Record<string, unknown> = {}) {
-  const command = new CommandExecutor();
   const scriptPath = path.join(__dirname, "../../../scripts/request_trading_days.py");
 
   // 构建命令参数
@@ -22,11 +21,12 @@ export async function handleRequestTradingDays(params: Record<string, unknown> =
 
   try {
     // 使用executeJSONCommand方法执行命令并解析JSON结果
-    const parsedResult = await command.executeJSONCommand(cmd, { debug: true });
+    const parsedResult = await callPython('request_trading_days', params, cmd);
 
     // 检查结果是否包含错误
     if (parsedResult.error) {
       return {
+        isError: true,
         content: [{
           type: "text",
           text: `获取交易日历失败: ${JSON.stringify(parsedResult.error)}`
@@ -42,6 +42,7 @@ export async function handleRequestTradingDays(params: Record<string, unknown> =
     };
   } catch (error: any) {
     return {
+      isError: true,
       content: [{
         type: "text",
         text: `获取交易日历失败: ${error.message}`
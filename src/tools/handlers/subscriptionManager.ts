@@ -1,4 +1,4 @@
-import CommandExecutor from "../../utils/CommandExecutor.js";
+import { callPython } from "../../utils/PythonWorker.js";
 import path from 'path';
 import { fileURLToPath } from 'url';
 
@@ -6,7 +6,6 @@ const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
 
 export async function handleSubscriptionManager(params: Record<string, unknown> = {}) {
-  const command = new CommandExecutor();
   const scriptPath = path.join(__dirname, "../../../scripts/subscription_manager.py");
 
   // 获取必要参数
@@ -80,11 +79,12 @@ export async function handleSubscriptionManager(params: Record<string, unknown>
 
   try {
     // 执行命令并解析JSON结果
-    const parsedResult = await command.executeJSONCommand(cmd, { debug: true });
+    const parsedResult = await callPython('subscription_manager', params, cmd);
 
     // 检查结果是否包含错误
     if (parsedResult.error) {
       return {
+        isError: true,
         content: [{
           type: "text",
           text: `订阅管理操作失败: ${JSON.stringify(parsedResult.error)}`
@@ -114,6 +114,7 @@ export async function handleSubscriptionManager(params: Record<string, unknown>
     };
   } catch (error: any) {
     return {
+      isError: true,
       content: [{
         type: "text",
         text: `订阅管理操作失败: ${error.message}`
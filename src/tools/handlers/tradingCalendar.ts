@@ -0,0 +1,54 @@
+import { callPython } from "../../utils/PythonWorker.js";
+import path from 'path';
+import { fileURLToPath } from 'url';
+
+const __filename = fileURLToPath(import.meta.url);
+const __dirname = path.dirname(__filename);
+
+export async function handleTradingCalendar(params: Record<string, unknown> = {}) {
+  const scriptPath = path.join(__dirname, "../../../scripts/trading_calendar.py");
+
+  // 构建命令参数
+  let cmdArgs = ` --market "${params.market}"`;
+
+  // 添加可选参数
+  if (params.query) cmdArgs += ` --query "${params.query}"`;
+  if (params.date) cmdArgs += ` --date "${params.date}"`;
+  if (params.start) cmdArgs += ` --start "${params.start}"`;
+  if (params.end) cmdArgs += ` --end "${params.end}"`;
+  if (params.n) cmdArgs += ` --n ${params.n}`;
+  if (params.ktype) cmdArgs += ` --ktype "${params.ktype}"`;
+  if (params.inclusive) cmdArgs += ` --inclusive`;
+
+  const cmd = `python "${scriptPath}"${cmdArgs}`;
+
+  try {
+    const parsedResult = await callPython('trading_calendar', params, cmd);
+
+    // 检查结果是否包含错误
+    if (parsedResult.error) {
+      return {
+        isError: true,
+        content: [{
+          type: "text",
+          text: `查询交易日历失败: ${JSON.stringify(parsedResult.error)}`
+        }]
+      };
+    }
+
+    return {
+      content: [{
+        type: "text",
+        text: `交易日历查询结果: ${JSON.stringify(parsedResult, null, 2)}`
+      }]
+    };
+  } catch (error: any) {
+    return {
+      isError: true,
+      content: [{
+        type: "text",
+        text: `查询交易日历失败: ${error.message}`
+      }]
+    };
+  }
+}
@@ -8,6 +8,18 @@ const __dirname = path.dirname(__filename);
 
 // 从处理函数索引中导入处理函数映射表
 import { handlers } from './handlers/index.js';
+import { getMetrics } from '../utils/Metrics.js';
+import { performance } from 'perf_hooks';
+
+/**
+ * 计算工具返回内容的字节数
+ */
+function responseBytes(result: any): number {
+  if (!result || !Array.isArray(result.content)) {
+    return 0;
+  }
+  return result.content.reduce((total: number, item: any) => total + (typeof item.text === 'string' ? Buffer.byteLength(item.text) : 0), 0);
+}
 
 export async function runToolsAction(methodName: keyof typeof handlers, params: Record<string, unknown> = {}) {
   // 查找对应的处理函数
@@ -17,6 +29,15 @@ export async function runToolsAction(methodName: keyof typeof handlers, params:
     throw new Error("Unknown tool");
   }
 
-  // 调用对应的处理函数
-  return await handler(params);
+  // 调用对应的处理函数，记录耗时与返回大小
+  const startedAt = performance.now();
+  let result: any;
+  try {
+    result = await handler(params);
+    return result;
+  } finally {
+    // 处理函数以 isError 标记失败(MCP 约定)，参数校验失败返回 error 字段
+    const ok = result !== undefined && !result.error && !result.isError;
+    getMetrics().recordTool(methodName, performance.now() - startedAt, ok, responseBytes(result));
+  }
 }
\ No newline at end of file
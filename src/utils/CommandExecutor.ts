@@ -1,7 +1,6 @@
-import { exec } from 'child_process';
-import { promisify } from 'util';
-
-const execPromise = promisify(exec);
+import { spawn, ChildProcessByStdio } from 'child_process';
+import { createInterface } from 'readline';
+import { Readable } from 'stream';
 
 /**
  * 命令执行器类，将命令行操作封装成 Promise
@@ -9,6 +8,7 @@ const execPromise = promisify(exec);
 export class CommandExecutor {
   /**
    * 执行命令并返回标准输出
+   * 基于 spawn 按块收集输出，不受 exec 的 maxBuffer 上限限制
    * @param cmd 要执行的命令
    * @param options 执行选项
    * @returns 命令执行的标准输出结果
@@ -20,26 +20,120 @@ export class CommandExecutor {
       console.log(`执行命令: ${cmd}`);
     }
 
+    const stdoutChunks: Buffer[] = [];
+    const stderrChunks: Buffer[] = [];
+
     try {
-      const { stdout, stderr } = await execPromise(cmd, {
-        timeout: options.timeout || 30000, // 默认30秒超时
-        maxBuffer: 1024 * 1024 * 10 // 增加缓冲区大小到10MB
+      await this.spawnCommand(cmd, options.timeout || 30000, (child) => { // 默认30秒超时
+        child.stdout.on('data', (chunk: Buffer) => stdoutChunks.push(chunk));
+        child.stderr.on('data', (chunk: Buffer) => stderrChunks.push(chunk));
       });
-
-      if (debug && stderr) {
-        console.warn(`命令标准错误输出: ${stderr}`);
+    } catch (error: any) {
+      const stderr = Buffer.concat(stderrChunks).toString();
+      console.error(`命令执行失败: ${error.message || error}`);
+      if (stderr) {
+        console.error(`标准错误: ${stderr}`);
       }
+      throw new Error(`命令执行失败: ${error.message || error}`);
+    }
+
+    const stderr = Buffer.concat(stderrChunks).toString();
+    if (debug && stderr) {
+      console.warn(`命令标准错误输出: ${stderr}`);
+    }
+
+    return Buffer.concat(stdoutChunks).toString().trim();
+  }
+
+  /**
+   * 执行逐行输出JSON(NDJSON)的命令，每解析出一条记录立即回调，不缓存完整输出
+   * @param cmd 要执行的命令
+   * @param onRecord 每条JSON记录的回调
+   * @param options 执行选项，timeout 为两条输出之间允许的最长间隔
+   */
+  async executeStreamCommand(cmd: string, onRecord: (record: any) => void, options: { timeout?: number, debug?: boolean } = {}): Promise<void> {
+    const debug = options.debug || false;
+
+    if (debug) {
+      console.log(`执行流式命令: ${cmd}`);
+    }
+
+    const stderrChunks: Buffer[] = [];
 
-      return stdout.trim();
+    try {
+      await this.spawnCommand(cmd, options.timeout || 30000, (child, touch) => {
+        const lines = createInterface({ input: child.stdout });
+        lines.on('line', (line) => {
+          touch();
+          const text = line.trim();
+          if (!text.startsWith('{')) {
+            return;
+          }
+          try {
+            onRecord(JSON.parse(text));
+          } catch (error: any) {
+            console.error(`流式输出解析失败: ${error.message}, 原始输出: ${text.substring(0, 200)}`);
+          }
+        });
+        child.stderr.on('data', (chunk: Buffer) => stderrChunks.push(chunk));
+      });
     } catch (error: any) {
+      const stderr = Buffer.concat(stderrChunks).toString();
       console.error(`命令执行失败: ${error.message || error}`);
-      if (error.stderr) {
-        console.error(`标准错误: ${error.stderr}`);
+      if (stderr) {
+        console.error(`标准错误: ${stderr}`);
       }
       throw new Error(`命令执行失败: ${error.message || error}`);
     }
   }
 
+  /**
+   * 启动子进程并等待其退出，超过 timeout 毫秒无输出时终止
+   * @param cmd 要执行的命令
+   * @param timeout 超时时间(毫秒)
+   * @param attach 绑定输出处理，touch() 用于在收到输出时重置超时
+   */
+  private spawnCommand(cmd: string, timeout: number, attach: (child: ChildProcessByStdio<null, Readable, Readable>, touch: () => void) => void): Promise<void> {
+    return new Promise((resolve, reject) => {
+      const child = spawn(cmd, { shell: true, stdio: ['ignore', 'pipe', 'pipe'] });
+      let timer: NodeJS.Timeout | null = null;
+      let timedOut = false;
+
+      const touch = () => {
+        if (timer) {
+          clearTimeout(timer);
+        }
+        timer = setTimeout(() => {
+          timedOut = true;
+          child.kill('SIGTERM');
+        }, timeout);
+      };
+
+      attach(child, touch);
+      touch();
+
+      child.on('error', (error) => {
+        if (timer) {
+          clearTimeout(timer);
+        }
+        reject(error);
+      });
+
+      child.on('close', (code, signal) => {
+        if (timer) {
+          clearTimeout(timer);
+        }
+        if (timedOut) {
+          reject(new Error(`命令执行超时(${timeout}ms)`));
+        } else if (code !== 0) {
+          reject(new Error(`命令退出码 ${code}${signal ? `, 信号 ${signal}` : ''}`));
+        } else {
+          resolve();
+        }
+      });
+    });
+  }
+
   /**
    * 执行可能输出JSON的命令，并解析结果
    * @param cmd 要执行的命令
@@ -0,0 +1,283 @@
+import fs from 'fs';
+import path from 'path';
+
+/**
+ * 延迟直方图的桶上界(毫秒)，最后一个桶收纳更大的值
+ */
+const LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000, 60000];
+
+/**
+ * 固定桶的延迟直方图，分位数按所在桶的上界估计
+ */
+export class Histogram {
+  private counts = new Array<number>(LATENCY_BUCKETS_MS.length + 1).fill(0);
+  count = 0;
+  sum = 0;
+  max = 0;
+
+  observe(value: number) {
+    let index = LATENCY_BUCKETS_MS.findIndex((bound) => value <= bound);
+    if (index === -1) {
+      index = LATENCY_BUCKETS_MS.length;
+    }
+    this.counts[index]++;
+    this.count++;
+    this.sum += value;
+    this.max = Math.max(this.max, value);
+  }
+
+  percentile(q: number): number {
+    if (this.count === 0) {
+      return 0;
+    }
+    const rank = Math.ceil(this.count * q);
+    let seen = 0;
+    for (let i = 0; i < this.counts.length; i++) {
+      seen += this.counts[i];
+      if (seen >= rank) {
+        return i < LATENCY_BUCKETS_MS.length ? Math.min(LATENCY_BUCKETS_MS[i], this.max) : this.max;
+      }
+    }
+    return this.max;
+  }
+
+  toJSON() {
+    const buckets: Record<string, number> = {};
+    this.counts.forEach((count, i) => {
+      if (count > 0) {
+        buckets[i < LATENCY_BUCKETS_MS.length ? `le_${LATENCY_BUCKETS_MS[i]}` : 'inf'] = count;
+      }
+    });
+    return {
+      count: this.count,
+      avg_ms: this.count ? round(this.sum / this.count) : 0,
+      p50_ms: round(this.percentile(0.5)),
+      p99_ms: round(this.percentile(0.99)),
+      max_ms: round(this.max),
+      buckets
+    };
+  }
+}
+
+interface ToolMetrics {
+  calls: number;
+  errors: number;
+  latency: Histogram;
+  responseBytes: number;
+  maxResponseBytes: number;
+}
+
+interface PythonMetrics {
+  calls: number;
+  errors: number;
+  modes: Record<string, number>;
+  latency: Histogram;
+  stages: Record<string, Histogram>;
+  opendCalls: number;
+  responseBytes: number;
+}
+
+function round(value: number): number {
+  return Math.round(value * 1000) / 1000;
+}
+
+/**
+ * MCP 服务的运行指标
+ * 按工具统计调用次数、错误数、端到端延迟与响应大小；按 Python 方法统计调用方式
+ * (worker 常驻进程 / spawn 启动脚本)、往返延迟以及 Python 端返回的各阶段耗时
+ */
+export class Metrics {
+  private startedAt = Date.now();
+  private tools = new Map<string, ToolMetrics>();
+  private python = new Map<string, PythonMetrics>();
+  private workerStarts = 0;
+  private workerStartup = new Histogram();
+  private workerImport = new Histogram();
+  private dumpTimer: NodeJS.Timeout | null = null;
+
+  /**
+   * 记录一次工具调用
+   * @param name 工具名
+   * @param durationMs 端到端耗时
+   * @param ok 是否成功
+   * @param responseBytes 返回内容的字节数
+   */
+  recordTool(name: string, durationMs: number, ok: boolean, responseBytes: number) {
+    let entry = this.tools.get(name);
+    if (!entry) {
+      entry = { calls: 0, errors: 0, latency: new Histogram(), responseBytes: 0, maxResponseBytes: 0 };
+      this.tools.set(name, entry);
+    }
+    entry.calls++;
+    entry.errors += ok ? 0 : 1;
+    entry.latency.observe(durationMs);
+    entry.responseBytes += responseBytes;
+    entry.maxResponseBytes = Math.max(entry.maxResponseBytes, responseBytes);
+  }
+
+  /**
+   * 记录一次 Python 调用
+   * @param method 方法名
+   * @param mode worker 或 spawn
+   * @param durationMs Node 端观察到的往返耗时
+   * @param ok 是否成功
+   * @param timings Python 端返回的阶段耗时，例如 {opend_ms, serialize_ms, opend_calls, response_bytes}
+   */
+  recordPython(method: string, mode: 'worker' | 'spawn', durationMs: number, ok: boolean, timings?: Record<string, number>) {
+    let entry = this.python.get(method);
+    if (!entry) {
+      entry = { calls: 0, errors: 0, modes: {}, latency: new Histogram(), stages: {}, opendCalls: 0, responseBytes: 0 };
+      this.python.set(method, entry);
+    }
+    entry.calls++;
+    entry.errors += ok ? 0 : 1;
+    entry.modes[mode] = (entry.modes[mode] || 0) + 1;
+    entry.latency.observe(durationMs);
+    if (mode === 'spawn') {
+      // 启动脚本的耗时包含进程启动、导入与 OpenD 连接
+      this.observeStage(entry, 'spawn_ms', durationMs);
+    }
+    if (!timings) {
+      return;
+    }
+    let pythonMs = 0;
+    for (const [key, value] of Object.entries(timings)) {
+      if (key.endsWith('_ms')) {
+        this.observeStage(entry, key, value);
+        if (key === 'queue_ms' || key === 'handler_ms' || key === 'serialize_ms') {
+          pythonMs += value;
+        }
+      }
+    }
+    // 往返耗时中 Python 端未覆盖的部分：管道传输与 Node 端解析
+    this.observeStage(entry, 'transport_ms', Math.max(0, durationMs - pythonMs));
+    entry.opendCalls += timings.opend_calls || 0;
+    entry.responseBytes += timings.response_bytes || 0;
+  }
+
+  private observeStage(entry: PythonMetrics, stage: string, value: number) {
+    if (!entry.stages[stage]) {
+      entry.stages[stage] = new Histogram();
+    }
+    entry.stages[stage].observe(value);
+  }
+
+  /**
+   * 记录常驻工作进程的一次启动
+   * @param startupMs 从启动进程到收到就绪消息的耗时
+   * @param importMs Python 端报告的模块导入耗时
+   */
+  recordWorkerStart(startupMs: number, importMs?: number) {
+    this.workerStarts++;
+    this.workerStartup.observe(startupMs);
+    if (importMs !== undefined) {
+      this.workerImport.observe(importMs);
+    }
+  }
+
+  /**
+   * 返回当前指标的快照
+   */
+  snapshot() {
+    const tools: Record<string, unknown> = {};
+    for (const [name, entry] of this.tools) {
+      tools[name] = {
+        calls: entry.calls,
+        errors: entry.errors,
+        latency: entry.latency.toJSON(),
+        response_bytes_avg: entry.calls ? Math.round(entry.responseBytes / entry.calls) : 0,
+        response_bytes_max: entry.maxResponseBytes
+      };
+    }
+    const python: Record<string, unknown> = {};
+    for (const [method, entry] of this.python) {
+      const stages: Record<string, unknown> = {};
+      for (const [stage, histogram] of Object.entries(entry.stages)) {
+        stages[stage] = histogram.toJSON();
+      }
+      python[method] = {
+        calls: entry.calls,
+        errors: entry.errors,
+        modes: entry.modes,
+        latency: entry.latency.toJSON(),
+        stages,
+        opend_calls: entry.opendCalls,
+        response_bytes: entry.responseBytes
+      };
+    }
+    return {
+      since: new Date(this.startedAt).toISOString(),
+      uptime_s: Math.round((Date.now() - this.startedAt) / 1000),
+      tools,
+      python,
+      worker: {
+        starts: this.workerStarts,
+        startup: this.workerStartup.toJSON(),
+        import: this.workerImport.toJSON()
+      }
+    };
+  }
+
+  /**
+   * 清空所有指标
+   */
+  reset() {
+    this.startedAt = Date.now();
+    this.tools.clear();
+    this.python.clear();
+    this.workerStarts = 0;
+    this.workerStartup = new Histogram();
+    this.workerImport = new Histogram();
+  }
+
+  /**
+   * 将快照写入文件(先写临时文件再改名，读取方不会看到写了一半的内容)
+   * @param filePath 目标文件路径
+   */
+  dump(filePath: string) {
+    fs.mkdirSync(path.dirname(filePath), { recursive: true });
+    const tmpPath = `${filePath}.tmp`;
+    fs.writeFileSync(tmpPath, JSON.stringify(this.snapshot(), null, 2));
+    fs.renameSync(tmpPath, filePath);
+  }
+
+  /**
+   * 每隔 intervalMs 毫秒把快照写入文件，进程退出时再写一次
+   * @param filePath 目标文件路径
+   * @param intervalMs 写入间隔
+   */
+  startDump(filePath: string, intervalMs: number) {
+    if (this.dumpTimer) {
+      clearInterval(this.dumpTimer);
+    }
+    const write = () => {
+      try {
+        this.dump(filePath);
+      } catch (error: any) {
+        console.error(`指标写入失败: ${error.message}`);
+      }
+    };
+    this.dumpTimer = setInterval(write, intervalMs);
+    this.dumpTimer.unref();
+    process.once('exit', write);
+  }
+}
+
+let sharedMetrics: Metrics | null = null;
+
+/**
+ * 获取全局共享的指标对象
+ * 设置 FUTU_MCP_METRICS_FILE 时定期写入该文件，间隔由 FUTU_MCP_METRICS_INTERVAL(秒，默认60)指定
+ */
+export function getMetrics(): Metrics {
+  if (!sharedMetrics) {
+    sharedMetrics = new Metrics();
+    const filePath = process.env.FUTU_MCP_METRICS_FILE;
+    if (filePath) {
+      sharedMetrics.startDump(filePath, Number(process.env.FUTU_MCP_METRICS_INTERVAL || 60) * 1000);
+    }
+  }
+  return sharedMetrics;
+}
+
+export default Metrics;
@@ -0,0 +1,244 @@
+import { spawn, ChildProcessWithoutNullStreams } from 'child_process';
+import { createInterface } from 'readline';
+import { performance } from 'perf_hooks';
+import path from 'path';
+import { fileURLToPath } from 'url';
+import CommandExecutor from "./CommandExecutor.js";
+import { getMetrics } from "./Metrics.js";
+
+const __filename = fileURLToPath(import.meta.url);
+const __dirname = path.dirname(__filename);
+
+interface PendingCall {
+  method: string;
+  startedAt: number;
+  resolve: (value: any) => void;
+  reject: (reason: Error) => void;
+  timer: NodeJS.Timeout;
+  onChunk?: (chunk: any) => void;
+  refresh: () => void;
+}
+
+/**
+ * 常驻Python工作进程客户端
+ * 启动一次 scripts/worker.py，之后通过标准输入输出按行交换JSON请求与响应
+ */
+export class PythonWorker {
+  private child: ChildProcessWithoutNullStreams | null = null;
+  private pending = new Map<number, PendingCall>();
+  private nextId = 1;
+  private spawnedAt = 0;
+
+  constructor(
+    private scriptPath: string = path.join(__dirname, "../../scripts/worker.py"),
+    private pythonBin: string = process.env.FUTU_MCP_PYTHON || "python"
+  ) {}
+
+  /**
+   * 启动工作进程(已启动则直接返回)
+   */
+  private ensureStarted(): ChildProcessWithoutNullStreams {
+    if (this.child) {
+      return this.child;
+    }
+
+    this.spawnedAt = performance.now();
+    const child = spawn(this.pythonBin, [this.scriptPath], {
+      cwd: path.dirname(this.scriptPath),
+      stdio: ['pipe', 'pipe', 'pipe']
+    });
+
+    const lines = createInterface({ input: child.stdout });
+    lines.on('line', (line) => this.onLine(line));
+
+    child.stderr.on('data', (chunk) => {
+      console.error(`工作进程标准错误: ${chunk.toString().trimEnd()}`);
+    });
+
+    child.on('exit', (code, signal) => {
+      console.error(`工作进程退出: code=${code} signal=${signal}`);
+      this.child = null;
+      this.rejectAll(new Error(`工作进程已退出: code=${code} signal=${signal}`));
+    });
+
+    child.on('error', (error) => {
+      console.error(`工作进程启动失败: ${error.message}`);
+      this.child = null;
+      this.rejectAll(error);
+    });
+
+    this.child = child;
+    return child;
+  }
+
+  private onLine(line: string) {
+    let message: any;
+    try {
+      message = JSON.parse(line);
+    } catch (error: any) {
+      console.error(`工作进程输出解析失败: ${line.substring(0, 200)}`);
+      return;
+    }
+
+    if (message.ready) {
+      getMetrics().recordWorkerStart(performance.now() - this.spawnedAt, message.import_ms);
+      return;
+    }
+
+    const call = message.id === null || message.id === undefined ? undefined : this.pending.get(message.id);
+    if (!call) {
+      return;
+    }
+
+    if (message.chunk !== undefined) {
+      // 流式结果：收到数据即重置超时
+      call.refresh();
+      call.onChunk?.(message.chunk);
+      return;
+    }
+
+    this.pending.delete(message.id);
+    clearTimeout(call.timer);
+    getMetrics().recordPython(call.method, 'worker', performance.now() - call.startedAt, message.error === undefined, message.timings);
+
+    if (message.error !== undefined) {
+      call.reject(new Error(typeof message.error === 'string' ? message.error : JSON.stringify(message.error)));
+    } else {
+      call.resolve(message.result);
+    }
+  }
+
+  private rejectAll(error: Error) {
+    for (const [id, call] of this.pending) {
+      clearTimeout(call.timer);
+      getMetrics().recordPython(call.method, 'worker', performance.now() - call.startedAt, false);
+      call.reject(error);
+      this.pending.delete(id);
+    }
+  }
+
+  /**
+   * 调用工作进程中的方法
+   * @param method 方法名，例如 get_market_snapshot
+   * @param params 方法参数
+   * @param options 调用选项，onChunk 接收流式方法逐条发送的数据，timeout 为两条消息之间允许的最长间隔
+   * @returns 方法返回的结果对象
+   */
+  call(method: string, params: Record<string, unknown> = {}, options: { timeout?: number, onChunk?: (chunk: any) => void } = {}): Promise<any> {
+    const child = this.ensureStarted();
+    const id = this.nextId++;
+    const timeout = options.timeout || 30000; // 默认30秒超时
+
+    return new Promise((resolve, reject) => {
+      const onTimeout = () => {
+        this.pending.delete(id);
+        getMetrics().recordPython(method, 'worker', performance.now() - call.startedAt, false);
+        reject(new Error(`工作进程调用超时: ${method}`));
+      };
+
+      const call: PendingCall = {
+        method,
+        startedAt: performance.now(),
+        resolve,
+        reject,
+        timer: setTimeout(onTimeout, timeout),
+        onChunk: options.onChunk,
+        refresh: () => {
+          clearTimeout(call.timer);
+          call.timer = setTimeout(onTimeout, timeout);
+        }
+      };
+
+      this.pending.set(id, call);
+      child.stdin.write(JSON.stringify({ id, method, params }) + "\n");
+    });
+  }
+
+  /**
+   * 工作进程是否已启动
+   */
+  isRunning(): boolean {
+    return this.child !== null;
+  }
+
+  /**
+   * 关闭工作进程
+   */
+  close() {
+    if (this.child) {
+      this.child.stdin.end();
+      this.child = null;
+    }
+  }
+}
+
+let sharedWorker: PythonWorker | null = null;
+
+/**
+ * 获取全局共享的工作进程客户端
+ */
+export function getPythonWorker(): PythonWorker {
+  if (!sharedWorker) {
+    sharedWorker = new PythonWorker();
+  }
+  return sharedWorker;
+}
+
+/**
+ * 是否启用常驻工作进程，设置 FUTU_MCP_WORKER=0 时退回到每次调用启动脚本
+ */
+export function isWorkerEnabled(): boolean {
+  return process.env.FUTU_MCP_WORKER !== '0';
+}
+
+/**
+ * 执行Python工具方法：优先通过常驻工作进程调用，未启用时执行独立脚本命令
+ * @param method 工作进程方法名
+ * @param params 方法参数
+ * @param fallbackCmd 未启用工作进程时执行的脚本命令
+ * @returns 解析后的JSON结果
+ */
+export async function callPython(method: string, params: Record<string, unknown>, fallbackCmd: string): Promise<any> {
+  if (isWorkerEnabled()) {
+    return await getPythonWorker().call(method, params);
+  }
+  const command = new CommandExecutor();
+  const startedAt = performance.now();
+  let ok = false;
+  try {
+    const result = await command.executeJSONCommand(fallbackCmd, { debug: true });
+    ok = true;
+    return result;
+  } finally {
+    getMetrics().recordPython(method, 'spawn', performance.now() - startedAt, ok);
+  }
+}
+
+/**
+ * 以流式方式执行Python工具方法，每收到一条记录立即回调
+ * 工作进程模式下传入 stream: true 并接收 chunk 消息；否则以 --stream 执行脚本并逐行解析NDJSON
+ * @param method 工作进程方法名
+ * @param params 方法参数
+ * @param fallbackCmd 未启用工作进程时执行的脚本命令(不含 --stream)
+ * @param onRecord 每条记录的回调
+ */
+export async function streamPython(method: string, params: Record<string, unknown>, fallbackCmd: string, onRecord: (record: any) => void): Promise<void> {
+  if (isWorkerEnabled()) {
+    const result = await getPythonWorker().call(method, { ...params, stream: true }, { onChunk: onRecord });
+    if (result && result.error) {
+      onRecord({ type: 'error', error: result.error });
+    }
+    return;
+  }
+  const command = new CommandExecutor();
+  const startedAt = performance.now();
+  let ok = false;
+  try {
+    await command.executeStreamCommand(`${fallbackCmd} --stream`, onRecord, { debug: true });
+    ok = true;
+  } finally {
+    getMetrics().recordPython(method, 'spawn', performance.now() - startedAt, ok);
+  }
+}
+
+export default PythonWorker;
@@ -0,0 +1,360 @@
+"""双均线策略向量化回测
+
+以与 MAStrategy 相同的规则(均线交叉 + 成交量放大/萎缩 + 大盘趋势与资金流向过滤)
+在本地K线存储的历史数据上回测。信号、持仓与收益均为整列 numpy 运算，不逐根循环。
+
+与实盘的差异：实盘在每次推送(包括同一根K线的更新)时判断信号，回测只在每根K线收盘时判断；
+大盘趋势和资金流向没有逐日历史数据，以可替换的过滤函数近似。
+"""
+import os
+import sys
+import argparse
+from datetime import date, timedelta
+import numpy as np
+from futu import KLType, AuType, RET_OK
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from indicators import sma
+from kline_store import get_kline_store, parse_date, seconds_to_time_keys
+from market_sessions import market_of, session_minutes
+
+# 成交方式：信号K线收盘价成交，或下一根K线开盘价成交
+FILL_MODES = ('close', 'next_open')
+
+# 每年交易日数，分钟K线按每日K线根数折算
+TRADING_DAYS_PER_YEAR = 252
+# 日K线以上周期每年的K线根数
+PERIODS_PER_YEAR = {
+    'K_DAY': TRADING_DAYS_PER_YEAR,
+    'K_WEEK': 52,
+    'K_MON': 12,
+    'K_QUARTER': 4,
+    'K_YEAR': 1,
+}
+
+
+def annual_periods(ktype, market='HK', trading_days=TRADING_DAYS_PER_YEAR):
+    """返回每年的K线根数，用于年化收益与夏普比率
+
+    分钟K线按市场常规交易时段计算每天的根数：每个时段从开盘起每 N 分钟一根，不足 N 分钟的尾段也算一根
+    """
+    ktype = str(ktype)
+    if ktype in PERIODS_PER_YEAR:
+        return PERIODS_PER_YEAR[ktype]
+    minutes = ktype[2:-1]
+    if not (ktype.startswith('K_') and ktype.endswith('M') and minutes.isdigit()):
+        raise ValueError(f"不支持的K线类型: {ktype}")
+    minutes = int(minutes)
+    return trading_days * sum(-(-(close - open_) // minutes) for open_, close in session_minutes(market))
+
+
+def crossover_signals(short_ma, long_ma, volume, volume_ma, volume_ratio_buy, volume_ratio_sell):
+    """由均线与成交量计算买卖信号，规则与 MAStrategy.evaluate_signal 一致
+
+    输入为一维或二维(每行一只股票)数组，返回与输入形状相同的布尔数组
+
+    Returns:
+        tuple: (买入信号, 卖出信号)，尚未接入大盘与资金流向过滤
+    """
+    golden, death = ma_crosses(short_ma, long_ma)
+    with np.errstate(invalid='ignore'):
+        buy = golden & (volume > volume_ma * volume_ratio_buy)
+        sell = death & (volume < volume_ma * volume_ratio_sell)
+    return buy, sell
+
+
+def ma_crosses(short_ma, long_ma):
+    """返回 (金叉, 死叉) 布尔数组，与上一根K线的均线比较"""
+    prev_short = np.roll(short_ma, 1, axis=-1)
+    prev_long = np.roll(long_ma, 1, axis=-1)
+    prev_short[..., 0] = np.nan
+    prev_long[..., 0] = np.nan
+    with np.errstate(invalid='ignore'):
+        golden = (prev_short <= prev_long) & (short_ma > long_ma)
+        death = (prev_short >= prev_long) & (short_ma < long_ma)
+    return golden, death
+
+
+def positions_from_signals(buy, sell):
+    """由买卖信号得到每根K线收盘后的目标持仓(0/1)
+
+    买入信号后持有直到卖出信号，空仓时的卖出信号与持仓时的买入信号不改变持仓
+    """
+    events = np.where(buy, 1, np.where(sell, -1, 0)).astype('i1')
+    index = np.where(events != 0, np.arange(events.shape[-1]), -1)
+    last = np.maximum.accumulate(index, axis=-1)
+    last_event = np.take_along_axis(events, np.maximum(last, 0), axis=-1)
+    return ((last >= 0) & (last_event == 1)).astype('i1')
+
+
+def simulate(bars, target, fill='next_open', fee_rate=0.001, slippage=0.0, trade_details=True):
+    """按目标持仓模拟成交并计算逐K线收益
+
+    Args:
+        bars: 含 time/open/close 字段的K线结构化数组(按时间排序)
+        target: 每根K线收盘后的目标持仓(0/1)
+        fill (str): close=信号K线收盘价成交；next_open=下一根K线开盘价成交
+        fee_rate (float): 单边交易费率(按成交金额)
+        slippage (float): 单边滑点比例，买入价上浮、卖出价下浮
+        trade_details (bool): 是否生成带时间与价格的交易列表，参数搜索时关闭以减少开销
+
+    Returns:
+        dict: returns(逐K线收益率)、equity(净值)、position(实际持仓)、
+              trade_returns(每笔交易收益率)、trades(交易列表，trade_details 为 False 时为空)
+    """
+    if fill not in FILL_MODES:
+        raise ValueError(f"不支持的成交方式: {fill}, 支持: {list(FILL_MODES)}")
+    open_ = np.asarray(bars['open'], dtype='f8')
+    close = np.asarray(bars['close'], dtype='f8')
+    n = len(close)
+
+    # 实际持仓与成交价：next_open 模式下持仓比信号晚一根K线
+    if fill == 'next_open':
+        position = np.concatenate([[0], target[:-1]]).astype('i1')
+        fill_price = open_
+    else:
+        position = target.astype('i1')
+        fill_price = close
+    prev_position = np.concatenate([[0], position[:-1]])
+    prev_close = np.concatenate([[np.nan], close[:-1]])
+    entry = (prev_position == 0) & (position == 1)
+    exit_ = (prev_position == 1) & (position == 0)
+    hold = (prev_position == 1) & (position == 1)
+    buy_price = fill_price * (1 + slippage)
+    sell_price = fill_price * (1 - slippage)
+
+    returns = np.zeros(n)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns[hold] = close[hold] / prev_close[hold] - 1
+        returns[entry] = close[entry] / buy_price[entry] - 1
+        returns[exit_] = sell_price[exit_] / prev_close[exit_] - 1
+    returns -= fee_rate * (entry | exit_)
+    returns = np.nan_to_num(returns)
+    equity = np.cumprod(1 + returns)
+
+    # 每笔交易的收益：未平仓的交易按最后收盘价计算，只扣买入费用
+    entries = np.flatnonzero(entry)
+    exits = np.flatnonzero(exit_)
+    is_open = np.arange(len(entries)) >= len(exits)
+    stops = np.concatenate([exits, np.full(is_open.sum(), n - 1)]).astype('i8')
+    exit_prices = np.where(is_open, close[stops], sell_price[stops]) if len(entries) else np.empty(0)
+    cost = np.where(is_open, 1 - fee_rate, (1 - fee_rate) ** 2)
+    trade_returns = exit_prices / buy_price[entries] * cost - 1
+
+    trades = []
+    if trade_details and len(entries):
+        time_keys = seconds_to_time_keys(bars['time'])
+        for start, stop, exit_price, trade_return, opened in zip(
+                entries, stops, exit_prices, trade_returns, is_open):
+            trades.append({
+                'entry_time': str(time_keys[start]),
+                'entry_price': round(float(buy_price[start]), 4),
+                'exit_time': None if opened else str(time_keys[stop]),
+                'exit_price': round(float(exit_price), 4),
+                'bars': int(stop - start),
+                'return': float(trade_return),
+                'open': bool(opened),
+            })
+    return {'returns': returns, 'equity': equity, 'position': position,
+            'trade_returns': trade_returns, 'trades': trades}
+
+
+def performance(returns, equity, position, trade_returns, periods_per_year=TRADING_DAYS_PER_YEAR):
+    """汇总收益、回撤与交易统计"""
+    n = len(returns)
+    if n == 0:
+        return {'bars': 0, 'total_return': 0.0, 'max_drawdown': 0.0, 'trades': 0, 'wins': 0, 'win_rate': 0.0}
+    drawdown = 1 - equity / np.maximum.accumulate(equity)
+    std = returns.std()
+    trades = len(trade_returns)
+    wins = int((trade_returns > 0).sum())
+    return {
+        'bars': n,
+        'total_return': float(equity[-1] - 1),
+        'annual_return': float(equity[-1] ** (periods_per_year / n) - 1) if equity[-1] > 0 else -1.0,
+        'max_drawdown': float(drawdown.max()),
+        'sharpe': float(returns.mean() / std * np.sqrt(periods_per_year)) if std > 0 else 0.0,
+        'exposure': float(position.mean()),
+        'trades': trades,
+        'wins': wins,
+        'win_rate': wins / trades if trades else 0.0,
+        'avg_trade_return': float(trade_returns.mean()) if trades else 0.0,
+    }
+
+
+def index_trend_filter(index_bars):
+    """以大盘K线近似 check_market_trend：K线时刻大盘最新收盘高于上一根收盘视为上涨
+
+    Returns:
+        callable: (code, bars) -> 布尔数组
+    """
+    index_time = np.asarray(index_bars['time'])
+    index_close = np.asarray(index_bars['close'], dtype='f8')
+    rising = np.concatenate([[False], index_close[1:] > index_close[:-1]])
+
+    def trend(code, bars):
+        position = np.searchsorted(index_time, bars['time'], 'right') - 1
+        return (position >= 0) & rising[np.maximum(position, 0)]
+    return trend
+
+
+def bar_direction_filter(code, bars):
+    """以K线涨跌近似 check_capital_flow：收盘高于开盘视为主力净流入"""
+    return np.asarray(bars['close']) > np.asarray(bars['open'])
+
+
+def backtest_bars(code, bars, short_period=5, long_period=20, volume_ratio_buy=1.2, volume_ratio_sell=0.85,
+                  fill='next_open', fee_rate=0.001, slippage=0.0, market_filter=None, flow_filter=None,
+                  periods_per_year=TRADING_DAYS_PER_YEAR, include_trades=True):
+    """回测单只股票
+
+    Args:
+        bars: 按时间排序的K线结构化数组(kline_store.BAR_DTYPE)
+        market_filter/flow_filter (callable): (code, bars) -> 布尔数组，只作用于买入信号，None 表示不过滤
+        periods_per_year (int): 每年的K线根数，日K线以外的周期见 annual_periods
+
+    Returns:
+        dict: 绩效统计，include_trades 为 True 时在 trade_list 中包含交易列表
+    """
+    close = np.asarray(bars['close'], dtype='f8')
+    volume = np.asarray(bars['volume'], dtype='f8')
+    mas = sma(close, (short_period, long_period))
+    volume_ma = sma(volume, (short_period,))[short_period]
+    buy, sell = crossover_signals(
+        mas[short_period], mas[long_period], volume, volume_ma, volume_ratio_buy, volume_ratio_sell
+    )
+    if market_filter is not None:
+        buy &= market_filter(code, bars)
+    if flow_filter is not None:
+        buy &= flow_filter(code, bars)
+
+    result = simulate(bars, positions_from_signals(buy, sell), fill, fee_rate, slippage, include_trades)
+    summary = performance(
+        result['returns'], result['equity'], result['position'], result['trade_returns'], periods_per_year
+    )
+    if include_trades:
+        summary['trade_list'] = result['trades']
+    return summary
+
+
+def load_bars(code, start, end, ktype=KLType.K_DAY, autype=AuType.QFQ, store=None, quote_ctx=None):
+    """从本地K线存储读取K线；提供 quote_ctx 时先向OpenD补齐缺失的区间"""
+    store = store or get_kline_store()
+    if quote_ctx is not None:
+        from request_history_kline import ensure_history_kline_stored
+        ret_code, data = ensure_history_kline_stored(quote_ctx, store, code, start, end, ktype, autype)
+        if ret_code != RET_OK:
+            raise RuntimeError(f"获取{code}K线失败: {data}")
+        return np.asarray(data[0])
+    return np.asarray(store.read(code, ktype, autype, start, end))
+
+
+def run_backtest(code_list, start=None, end=None, ktype=KLType.K_DAY, autype=AuType.QFQ,
+                 store=None, quote_ctx=None, index_code=None, use_flow_filter=False,
+                 include_trades=True, **params):
+    """回测股票池
+
+    Args:
+        code_list (list): 股票代码列表
+        start/end: 回测区间，默认最近一年
+        index_code (str): 大盘指数代码，提供时以其K线作为大盘趋势过滤
+        use_flow_filter (bool): 是否以K线涨跌近似资金流向过滤
+        params: 透传给 backtest_bars 的策略与成交参数，未指定 periods_per_year 时按 ktype 与股票所在市场计算
+
+    Returns:
+        dict: {"summary": 汇总统计, "symbols": {code: 单只股票结果}}
+    """
+    end = parse_date(end) or date.today()
+    start = parse_date(start) or end - timedelta(days=365)
+    market_filter = None
+    if index_code:
+        market_filter = index_trend_filter(load_bars(index_code, start, end, ktype, autype, store, quote_ctx))
+    flow_filter = bar_direction_filter if use_flow_filter else None
+
+    symbols = {}
+    for code in dict.fromkeys(code_list):
+        try:
+            bars = load_bars(code, start, end, ktype, autype, store, quote_ctx)
+        except Exception as e:
+            symbols[code] = {'error': str(e)}
+            continue
+        if len(bars) == 0:
+            symbols[code] = {'error': '本地没有K线数据'}
+            continue
+        symbol_params = params
+        if params.get('periods_per_year') is None:
+            symbol_params = dict(params, periods_per_year=annual_periods(ktype, market_of(code)))
+        symbols[code] = backtest_bars(
+            code, bars, market_filter=market_filter, flow_filter=flow_filter,
+            include_trades=include_trades, **symbol_params
+        )
+
+    results = [r for r in symbols.values() if 'error' not in r]
+    total_returns = np.array([r['total_return'] for r in results])
+    trades = sum(r['trades'] for r in results)
+    wins = sum(r['wins'] for r in results)
+    summary = {
+        'symbols': len(results),
+        'errors': len(symbols) - len(results),
+        'mean_return': float(total_returns.mean()) if len(results) else 0.0,
+        'median_return': float(np.median(total_returns)) if len(results) else 0.0,
+        'mean_max_drawdown': float(np.mean([r['max_drawdown'] for r in results])) if results else 0.0,
+        'trades': trades,
+        'win_rate': wins / trades if trades else 0.0,
+    }
+    return {'summary': summary, 'symbols': symbols}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='双均线策略历史回测')
+    parser.add_argument('--code_list', nargs='+', type=str, required=True,
+                        help='股票代码列表, 例如: HK.00700 HK.09988')
+    parser.add_argument('--start', type=str, default=None, help='开始日期, 格式: yyyy-MM-dd，默认一年前')
+    parser.add_argument('--end', type=str, default=None, help='结束日期, 格式: yyyy-MM-dd，默认今天')
+    parser.add_argument('--ktype', type=str, default='K_DAY', help='K线类型, 例如: K_DAY, K_60M')
+    parser.add_argument('--short_period', type=int, default=5, help='短期均线周期')
+    parser.add_argument('--long_period', type=int, default=20, help='长期均线周期')
+    parser.add_argument('--volume_ratio_buy', type=float, default=1.2, help='买入信号成交量放大比例')
+    parser.add_argument('--volume_ratio_sell', type=float, default=0.85, help='卖出信号成交量萎缩比例')
+    parser.add_argument('--fill', type=str, default='next_open', choices=FILL_MODES, help='成交方式')
+    parser.add_argument('--fee_rate', type=float, default=0.001, help='单边交易费率')
+    parser.add_argument('--slippage', type=float, default=0.0, help='单边滑点比例')
+    parser.add_argument('--index_code', type=str, default=None,
+                        help='大盘指数代码(需已在本地存储或配合 --fetch)，用于近似大盘趋势过滤')
+    parser.add_argument('--flow_filter', action='store_true', help='以K线涨跌近似资金流向过滤')
+    parser.add_argument('--fetch', action='store_true', help='先向OpenD补齐本地缺失的K线')
+    parser.add_argument('--periods_per_year', type=int, default=None,
+                        help='每年的K线根数，用于年化指标，默认按K线类型与市场交易时段计算')
+
+    args = parser.parse_args()
+
+    quote_ctx = None
+    try:
+        if args.fetch:
+            from utils import create_quote_context
+            quote_ctx = create_quote_context()
+        result = run_backtest(
+            args.code_list, args.start, args.end, getattr(KLType, args.ktype, KLType.K_DAY),
+            quote_ctx=quote_ctx, index_code=args.index_code, use_flow_filter=args.flow_filter,
+            include_trades=False, short_period=args.short_period, long_period=args.long_period,
+            volume_ratio_buy=args.volume_ratio_buy, volume_ratio_sell=args.volume_ratio_sell,
+            fill=args.fill, fee_rate=args.fee_rate, slippage=args.slippage,
+            periods_per_year=args.periods_per_year
+        )
+    finally:
+        if quote_ctx:
+            quote_ctx.close()  # 关闭对象，防止连接条数用尽
+
+    for code, r in result['symbols'].items():
+        if 'error' in r:
+            print(f"{code}: {r['error']}")
+            continue
+        print(f"{code}: 收益 {r['total_return']:.2%} | 最大回撤 {r['max_drawdown']:.2%} | "
+              f"交易 {r['trades']} 次 | 胜率 {r['win_rate']:.1%}")
+    s = result['summary']
+    print(f"[汇总] {s['symbols']} 只股票 | 平均收益 {s['mean_return']:.2%} | 中位收益 {s['median_return']:.2%} | "
+          f"平均最大回撤 {s['mean_max_drawdown']:.2%} | 交易 {s['trades']} 次 | 胜率 {s['win_rate']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
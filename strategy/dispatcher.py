@@ -0,0 +1,172 @@
+"""推送分发器
+
+行情推送回调只把数据放入队列即返回，由工作线程池执行耗时的信号计算。
+同一只股票的数据在任一时刻只由一个工作线程处理，保证按推送顺序；
+处理期间到达的新推送合并到该股票的待处理列表，下次一并处理，信号只计算一次。
+合并键相同的待处理数据(如同一根K线的多次推送)只保留最新一条，位置不变。
+"""
+import time
+import threading
+from collections import deque
+
+
+class SignalDispatcher:
+    """按键(股票代码)串行、键间并行的有界合并队列"""
+    def __init__(self, handler, workers=4, max_pending=10000, max_items_per_key=1000, name='dispatcher',
+                 coalesce_key=None, droppable=None):
+        """
+        Args:
+            handler (callable): (key, items) -> None，items 为该键自上次处理以来按顺序到达的数据
+            workers (int): 工作线程数
+            max_pending (int): 最多同时有待处理数据的键数，超出时新键的推送被丢弃
+            max_items_per_key (int): 单个键最多积压的数据条数，超出时丢弃最早的一条可丢弃数据
+            coalesce_key (callable): item -> 合并键或 None，同一键下合并键相同的数据只保留最新一条
+            droppable (callable): item -> bool，积压超出上限时可以丢弃的数据，默认都不丢弃
+        """
+        self.handler = handler
+        self.max_pending = max_pending
+        self.max_items_per_key = max_items_per_key
+        self.coalesce_key = coalesce_key
+        self.droppable = droppable
+        self._cond = threading.Condition()
+        self._pending = {}          # key -> [deque([item 单元格]), {合并键: 单元格}, 首条数据入队时间]
+        self._ready = deque()       # 有待处理数据且未在处理中的键
+        self._in_flight = set()     # 正在处理的键
+        self._closed = False
+        self.received = 0           # 收到的推送数
+        self.coalesced = 0          # 合并到已有待处理键的推送数
+        self.dropped = 0            # 因队列已满或积压过多丢弃的推送数
+        self.processed = 0          # 已完成的处理次数
+        self.errors = 0             # 处理出错次数
+        self.max_depth = 0          # 历史最大待处理键数
+        self._latencies = deque(maxlen=10000)  # 首条推送入队到处理完成的秒数
+        self._threads = [
+            threading.Thread(target=self._run, name=f'{name}-{i}', daemon=True)
+            for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, key, item):
+        """放入一条推送数据，立即返回
+
+        Returns:
+            bool: 是否被接收(队列已满时为 False)
+        """
+        now = time.perf_counter()
+        merge_key = self.coalesce_key(item) if self.coalesce_key is not None else None
+        with self._cond:
+            self.received += 1
+            if self._closed:
+                self.dropped += 1
+                return False
+            entry = self._pending.get(key)
+            if entry is not None:
+                items, cells = entry[0], entry[1]
+                cell = cells.get(merge_key) if merge_key is not None else None
+                if cell is not None:
+                    cell[0] = item
+                else:
+                    cell = [item]
+                    items.append(cell)
+                    if merge_key is not None:
+                        cells[merge_key] = cell
+                    if len(items) > self.max_items_per_key:
+                        self._drop_oldest(items, cells)
+                self.coalesced += 1
+                return True
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return False
+            cell = [item]
+            self._pending[key] = [deque([cell]), {merge_key: cell} if merge_key is not None else {}, now]
+            if len(self._pending) > self.max_depth:
+                self.max_depth = len(self._pending)
+            # 正在处理中的键等处理完成后再排队，保证同一键串行
+            if key not in self._in_flight:
+                self._ready.append(key)
+                self._cond.notify()
+            return True
+
+    def _drop_oldest(self, items, cells):
+        """丢弃最早的一条可丢弃数据，没有可丢弃的数据时保留全部"""
+        if self.droppable is None:
+            return
+        for index, cell in enumerate(items):
+            if self.droppable(cell[0]):
+                del items[index]
+                for merge_key, merged in list(cells.items()):
+                    if merged is cell:
+                        del cells[merge_key]
+                self.dropped += 1
+                return
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._ready and not self._closed:
+                    self._cond.wait()
+                if not self._ready:
+                    return
+                key = self._ready.popleft()
+                items, _, enqueued_at = self._pending.pop(key)
+                items = [cell[0] for cell in items]
+                self._in_flight.add(key)
+
+            failed = False
+            try:
+                self.handler(key, items)
+            except Exception as e:
+                failed = True
+                print(f"[错误] 处理 {key} 的推送失败: {e}")
+
+            latency = time.perf_counter() - enqueued_at
+            with self._cond:
+                self._in_flight.discard(key)
+                self.processed += 1
+                self.errors += failed
+                self._latencies.append(latency)
+                if key in self._pending:
+                    self._ready.append(key)
+                    self._cond.notify()
+
+    def wait_idle(self, timeout=None):
+        """等待所有已接收的数据处理完成，返回是否在超时前完成"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._cond:
+                if not self._pending and not self._in_flight:
+                    return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.001)
+
+    def close(self, wait=True):
+        """停止接收新数据；wait 为 True 时处理完已接收的数据后再返回"""
+        with self._cond:
+            self._closed = True
+            if not wait:
+                self.dropped += sum(len(entry[0]) for entry in self._pending.values())
+                self._pending.clear()
+                self._ready.clear()
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    def stats(self):
+        """返回队列深度、合并/丢弃计数与推送到处理完成的延迟分位数(毫秒)"""
+        with self._cond:
+            latencies = sorted(self._latencies)
+            return {
+                'depth': len(self._pending),
+                'in_flight': len(self._in_flight),
+                'max_depth': self.max_depth,
+                'received': self.received,
+                'coalesced': self.coalesced,
+                'dropped': self.dropped,
+                'processed': self.processed,
+                'errors': self.errors,
+                'latency_p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+                'latency_p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000 if latencies else 0.0,
+                'latency_max_ms': latencies[-1] * 1000 if latencies else 0.0,
+            }
@@ -0,0 +1,347 @@
+"""双均线策略参数网格搜索
+
+在股票池上评估 (short_period, long_period, volume_ratio_buy, volume_ratio_sell) 的所有组合。
+所有股票的价格与成交量连同其累加和放入一块共享内存，工作进程按名称映射为 numpy 视图，
+不传递 DataFrame；任务按股票切分，每个进程对分到的股票计算全部参数组合：
+均线由共享的累加和直接做差得到，同一 (short, long) 的交叉只计算一次，再组合各成交量比例。
+"""
+import os
+import sys
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory, util
+import numpy as np
+from futu import KLType, AuType
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from backtest import (
+    ma_crosses, positions_from_signals, simulate, performance,
+    load_bars, index_trend_filter, bar_direction_filter, annual_periods, FILL_MODES, TRADING_DAYS_PER_YEAR
+)
+from kline_store import parse_date
+from market_sessions import market_of
+
+# 共享内存中按股票拼接的列及类型
+SHARED_COLUMNS = {
+    'time': 'i8',
+    'open': 'f8',
+    'close': 'f8',
+    'volume': 'f8',
+    'close_cumsum': 'f8',
+    'volume_cumsum': 'f8',
+    'buy_filter': '?',
+}
+
+# 每个参数组合汇总的指标
+METRICS = ('total_return', 'max_drawdown', 'sharpe', 'trades', 'wins')
+
+# 可用于排序的结果列及是否越大越好
+RANK_KEYS = {
+    'mean_return': True,
+    'median_return': True,
+    'mean_sharpe': True,
+    'mean_max_drawdown': False,
+    'win_rate': True,
+}
+
+
+def parameter_grid(short_periods, long_periods, volume_ratios_buy, volume_ratios_sell):
+    """生成有效的参数组合(短周期小于长周期)"""
+    return [
+        (short, long, buy, sell)
+        for short, long, buy, sell in itertools.product(
+            short_periods, long_periods, volume_ratios_buy, volume_ratios_sell)
+        if short < long
+    ]
+
+
+class SharedBars:
+    """放在共享内存中的股票池K线
+
+    每只股票 n 根K线在各列中占 [offset, offset + n)，累加和列带前导0，占 [offset + i, offset + i + n + 1)，
+    其中 i 为股票序号，因此累加和列比其它列每只股票多一个位置。
+    """
+    def __init__(self, name, layout, total, create=False):
+        self.layout = layout      # [(offset, length), ...]
+        self.total = total        # 价格列总长度
+        size = sum(np.dtype(dtype).itemsize * length for _, dtype, length in self.column_specs(total, len(layout)))
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=max(size, 1))
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.columns = {}
+        cursor = 0
+        for column, dtype, length in self.column_specs(total, len(layout)):
+            self.columns[column] = np.ndarray((length,), dtype=dtype, buffer=self.shm.buf, offset=cursor)
+            cursor += length * np.dtype(dtype).itemsize
+
+    @staticmethod
+    def column_specs(total, symbols):
+        """返回 [(列名, 类型, 长度), ...]，累加和列每只股票多一个前导0"""
+        return [
+            (column, dtype, total + symbols if column.endswith('_cumsum') else total)
+            for column, dtype in SHARED_COLUMNS.items()
+        ]
+
+    @classmethod
+    def create(cls, bars_list, buy_filters):
+        """将各股票的K线与买入过滤结果写入新建的共享内存"""
+        layout, offset = [], 0
+        for bars in bars_list:
+            layout.append((offset, len(bars)))
+            offset += len(bars)
+        shared = cls(f'futu_grid_{os.getpid()}_{time.time_ns()}', layout, offset, create=True)
+        for i, (bars, buy_filter) in enumerate(zip(bars_list, buy_filters)):
+            start, n = layout[i]
+            cols = shared.columns
+            cols['time'][start:start + n] = bars['time']
+            cols['open'][start:start + n] = bars['open']
+            cols['close'][start:start + n] = bars['close']
+            cols['volume'][start:start + n] = bars['volume']
+            cols['buy_filter'][start:start + n] = buy_filter
+            # 累加和只计算一次，所有参数组合共用
+            cs_start = start + i
+            cols['close_cumsum'][cs_start] = 0.0
+            np.cumsum(bars['close'], out=cols['close_cumsum'][cs_start + 1:cs_start + n + 1])
+            cols['volume_cumsum'][cs_start] = 0.0
+            np.cumsum(np.asarray(bars['volume'], dtype='f8'), out=cols['volume_cumsum'][cs_start + 1:cs_start + n + 1])
+        return shared
+
+    def symbol(self, i):
+        """返回第 i 只股票各列的视图"""
+        start, n = self.layout[i]
+        view = {}
+        for column, values in self.columns.items():
+            if column.endswith('_cumsum'):
+                view[column] = values[start + i:start + i + n + 1]
+            else:
+                view[column] = values[start:start + n]
+        return view
+
+    def close(self, unlink=False):
+        self.columns = {}
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def window_mean(cumsum, period):
+    """由带前导0的累加和计算滑动均值，前 period-1 个位置为 NaN"""
+    n = len(cumsum) - 1
+    out = np.full(n, np.nan)
+    if period <= n:
+        out[period - 1:] = (cumsum[period:] - cumsum[:n - period + 1]) / period
+    return out
+
+
+def evaluate_symbol(view, grid, fill, fee_rate, slippage, periods_per_year):
+    """对一只股票计算全部参数组合，返回 {指标: 数组(组合数,)}
+
+    同一周期的均线、同一 (short, long) 的交叉只计算一次，各成交量比例在其上组合
+    """
+    volume = view['volume']
+    result = {metric: np.zeros(len(grid)) for metric in METRICS}
+    mas, crosses = {}, {}
+    for index, (short, long, ratio_buy, ratio_sell) in enumerate(grid):
+        for period in (short, long):
+            if period not in mas:
+                mas[period] = window_mean(view['close_cumsum'], period)
+        if ('volume', short) not in mas:
+            mas[('volume', short)] = window_mean(view['volume_cumsum'], short)
+        if (short, long) not in crosses:
+            golden, death = ma_crosses(mas[short], mas[long])
+            crosses[(short, long)] = (golden & view['buy_filter'], death)
+        golden, death = crosses[(short, long)]
+        volume_ma = mas[('volume', short)]
+        with np.errstate(invalid='ignore'):
+            buy = golden & (volume > volume_ma * ratio_buy)
+            sell = death & (volume < volume_ma * ratio_sell)
+
+        sim = simulate(view, positions_from_signals(buy, sell), fill, fee_rate, slippage, trade_details=False)
+        stats = performance(sim['returns'], sim['equity'], sim['position'], sim['trade_returns'], periods_per_year)
+        result['total_return'][index] = stats['total_return']
+        result['max_drawdown'][index] = stats['max_drawdown']
+        result['sharpe'][index] = stats.get('sharpe', 0.0)
+        result['trades'][index] = stats['trades']
+        result['wins'][index] = stats['wins']
+    return result
+
+
+# 工作进程内映射的共享内存
+_shared = None
+
+def _init_worker(name, layout, total):
+    global _shared
+    _shared = SharedBars(name, layout, total)
+    # 工作进程退出时不执行 atexit，以 multiprocessing 的退出回调关闭映射
+    util.Finalize(None, _shared.close, exitpriority=10)
+
+def _init_worker_local(shared):
+    global _shared
+    _shared = shared
+
+def _evaluate_chunk(symbols, grid, fill, fee_rate, slippage, periods_per_year):
+    """工作进程任务：计算一组股票的全部参数组合，periods_per_year 与 symbols 一一对应
+
+    Returns:
+        tuple: (股票序号列表, {指标: 数组(组合数, 股票数)})
+    """
+    out = {metric: np.zeros((len(grid), len(symbols))) for metric in METRICS}
+    for column, (i, periods) in enumerate(zip(symbols, periods_per_year)):
+        result = evaluate_symbol(_shared.symbol(i), grid, fill, fee_rate, slippage, periods)
+        for metric in METRICS:
+            out[metric][:, column] = result[metric]
+    return symbols, out
+
+
+def rank_results(grid, metrics, rank_by='mean_return'):
+    """将 (组合数, 股票数) 的指标矩阵汇总为按 rank_by 排序的结果表"""
+    if rank_by not in RANK_KEYS:
+        raise ValueError(f"不支持的排序指标: {rank_by}, 支持: {list(RANK_KEYS)}")
+    trades = metrics['trades'].sum(axis=1)
+    table = []
+    for index, (short, long, ratio_buy, ratio_sell) in enumerate(grid):
+        table.append({
+            'short_period': short,
+            'long_period': long,
+            'volume_ratio_buy': ratio_buy,
+            'volume_ratio_sell': ratio_sell,
+            'mean_return': float(metrics['total_return'][index].mean()),
+            'median_return': float(np.median(metrics['total_return'][index])),
+            'mean_max_drawdown': float(metrics['max_drawdown'][index].mean()),
+            'mean_sharpe': float(metrics['sharpe'][index].mean()),
+            'trades': int(trades[index]),
+            'win_rate': float(metrics['wins'][index].sum() / trades[index]) if trades[index] else 0.0,
+        })
+    table.sort(key=lambda row: row[rank_by], reverse=RANK_KEYS[rank_by])
+    for rank, row in enumerate(table, 1):
+        row['rank'] = rank
+    return table
+
+
+def grid_search(bars_list, grid, buy_filters=None, processes=None, fill='next_open', fee_rate=0.001,
+                slippage=0.0, periods_per_year=TRADING_DAYS_PER_YEAR, rank_by='mean_return', chunks_per_process=4):
+    """在多进程中评估参数网格
+
+    Args:
+        bars_list (list): 各股票按时间排序的K线结构化数组
+        grid (list): [(short, long, volume_ratio_buy, volume_ratio_sell), ...]
+        buy_filters (list): 各股票的买入过滤布尔数组(大盘趋势、资金流向的历史近似)，None 表示不过滤
+        processes (int): 进程数，默认CPU核数；1 时在当前进程内计算
+        periods_per_year (int|list): 每年的K线根数，可按股票分别给出
+
+    Returns:
+        list: 按 rank_by 排序的结果表
+    """
+    if buy_filters is None:
+        buy_filters = [np.ones(len(bars), dtype='?') for bars in bars_list]
+    processes = processes or os.cpu_count() or 1
+    symbols = list(range(len(bars_list)))
+    periods = np.broadcast_to(periods_per_year, len(symbols)).tolist()
+    metrics = {metric: np.zeros((len(grid), len(symbols))) for metric in METRICS}
+
+    shared = SharedBars.create(bars_list, buy_filters)
+    try:
+        if processes == 1:
+            _init_worker_local(shared)
+            results = [_evaluate_chunk(symbols, grid, fill, fee_rate, slippage, periods)]
+        else:
+            # 按股票切分任务，每个进程多分几块以平衡不同长度的K线
+            size = max(1, -(-len(symbols) // (processes * chunks_per_process)))
+            chunks = [symbols[i:i + size] for i in range(0, len(symbols), size)]
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                     initargs=(shared.shm.name, shared.layout, shared.total)) as executor:
+                futures = [
+                    executor.submit(_evaluate_chunk, chunk, grid, fill, fee_rate, slippage,
+                                    [periods[i] for i in chunk])
+                    for chunk in chunks
+                ]
+                results = [future.result() for future in futures]
+        for chunk, out in results:
+            for metric in METRICS:
+                metrics[metric][:, chunk] = out[metric]
+    finally:
+        shared.close(unlink=True)
+    return rank_results(grid, metrics, rank_by)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='双均线策略参数网格搜索')
+    parser.add_argument('--code_list', nargs='+', type=str, required=True,
+                        help='股票代码列表, 例如: HK.00700 HK.09988')
+    parser.add_argument('--start', type=str, default=None, help='开始日期, 格式: yyyy-MM-dd，默认一年前')
+    parser.add_argument('--end', type=str, default=None, help='结束日期, 格式: yyyy-MM-dd，默认今天')
+    parser.add_argument('--ktype', type=str, default='K_DAY', help='K线类型, 例如: K_DAY, K_60M')
+    parser.add_argument('--short_periods', nargs='+', type=int, default=[3, 5, 8, 10],
+                        help='短期均线周期列表')
+    parser.add_argument('--long_periods', nargs='+', type=int, default=[15, 20, 30, 60],
+                        help='长期均线周期列表')
+    parser.add_argument('--volume_ratios_buy', nargs='+', type=float, default=[1.0, 1.2, 1.5],
+                        help='买入信号成交量放大比例列表')
+    parser.add_argument('--volume_ratios_sell', nargs='+', type=float, default=[0.85, 1.0],
+                        help='卖出信号成交量萎缩比例列表')
+    parser.add_argument('--fill', type=str, default='next_open', choices=FILL_MODES, help='成交方式')
+    parser.add_argument('--fee_rate', type=float, default=0.001, help='单边交易费率')
+    parser.add_argument('--slippage', type=float, default=0.0, help='单边滑点比例')
+    parser.add_argument('--index_code', type=str, default=None, help='大盘指数代码，用于近似大盘趋势过滤')
+    parser.add_argument('--flow_filter', action='store_true', help='以K线涨跌近似资金流向过滤')
+    parser.add_argument('--processes', type=int, default=None, help='进程数，默认CPU核数')
+    parser.add_argument('--rank_by', type=str, default='mean_return', choices=list(RANK_KEYS), help='排序指标')
+    parser.add_argument('--top', type=int, default=20, help='输出前N个组合')
+    parser.add_argument('--periods_per_year', type=int, default=None,
+                        help='每年的K线根数，用于夏普比率，默认按K线类型与各股票市场的交易时段计算')
+
+    args = parser.parse_args()
+
+    from datetime import date, timedelta
+    end = parse_date(args.end) or date.today()
+    start = parse_date(args.start) or end - timedelta(days=365)
+    ktype = getattr(KLType, args.ktype, KLType.K_DAY)
+
+    codes, bars_list = [], []
+    for code in dict.fromkeys(args.code_list):
+        bars = load_bars(code, start, end, ktype, AuType.QFQ)
+        if len(bars) == 0:
+            print(f"[警告] {code} 本地没有K线数据，已跳过")
+            continue
+        codes.append(code)
+        bars_list.append(bars)
+    if not bars_list:
+        print("[错误] 没有可用的K线数据，请先用 backtest.py --fetch 或 request_history_kline 获取")
+        return
+
+    # 大盘趋势与资金流向过滤与参数无关，每只股票只计算一次
+    market_filter = index_trend_filter(load_bars(args.index_code, start, end, ktype, AuType.QFQ)) \
+        if args.index_code else None
+    buy_filters = []
+    for code, bars in zip(codes, bars_list):
+        allowed = np.ones(len(bars), dtype='?')
+        if market_filter is not None:
+            allowed &= market_filter(code, bars)
+        if args.flow_filter:
+            allowed &= bar_direction_filter(code, bars)
+        buy_filters.append(allowed)
+
+    periods_per_year = args.periods_per_year or [annual_periods(ktype, market_of(code)) for code in codes]
+    grid = parameter_grid(args.short_periods, args.long_periods, args.volume_ratios_buy, args.volume_ratios_sell)
+    started = time.perf_counter()
+    table = grid_search(
+        bars_list, grid, buy_filters, args.processes, args.fill, args.fee_rate, args.slippage,
+        periods_per_year, rank_by=args.rank_by
+    )
+    elapsed = time.perf_counter() - started
+
+    print(f"[系统] {len(codes)} 只股票 x {len(grid)} 个组合，耗时 {elapsed:.2f} 秒")
+    print(f"{'排名':>4} {'短':>4} {'长':>4} {'买入量比':>8} {'卖出量比':>8} {'平均收益':>9} {'中位收益':>9} "
+          f"{'平均回撤':>9} {'夏普':>6} {'交易':>6} {'胜率':>6}")
+    for row in table[:args.top]:
+        print(f"{row['rank']:>4} {row['short_period']:>4} {row['long_period']:>4} "
+              f"{row['volume_ratio_buy']:>8.2f} {row['volume_ratio_sell']:>8.2f} "
+              f"{row['mean_return']:>9.2%} {row['median_return']:>9.2%} {row['mean_max_drawdown']:>9.2%} "
+              f"{row['mean_sharpe']:>6.2f} {row['trades']:>6} {row['win_rate']:>6.1%}")
+
+
+if __name__ == "__main__":
+    main()
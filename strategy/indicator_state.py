@@ -0,0 +1,116 @@
+"""流式指标状态
+
+以定长环形缓冲区和运行和维护滑动均线，每次推送只更新当前K线或追加一根新K线，
+耗时与历史长度无关。
+"""
+
+
+class RollingMean:
+    """定长窗口的滑动均值(环形缓冲区 + 运行和)"""
+    __slots__ = ('period', 'buffer', 'index', 'count', 'total', 'updates')
+
+    # 每累计更新这么多次后重新求和一次，消除浮点误差累积
+    RESYNC_INTERVAL = 4096
+
+    def __init__(self, period):
+        self.period = period
+        self.buffer = [0.0] * period
+        self.index = 0          # 下一个写入位置
+        self.count = 0          # 缓冲区内的有效值个数
+        self.total = 0.0
+        self.updates = 0
+
+    def push(self, value):
+        """追加一个新值，窗口已满时挤出最早的值"""
+        if self.count == self.period:
+            self.total -= self.buffer[self.index]
+        else:
+            self.count += 1
+        self.buffer[self.index] = value
+        self.total += value
+        self.index = (self.index + 1) % self.period
+        self._tick()
+
+    def replace_last(self, value):
+        """替换最近一次追加的值(同一根K线的更新推送)"""
+        if self.count == 0:
+            self.push(value)
+            return
+        last = (self.index - 1) % self.period
+        self.total += value - self.buffer[last]
+        self.buffer[last] = value
+        self._tick()
+
+    def _tick(self):
+        self.updates += 1
+        if self.updates % self.RESYNC_INTERVAL == 0:
+            self.total = sum(self.buffer[:self.count]) if self.count < self.period else sum(self.buffer)
+
+    @property
+    def value(self):
+        """当前均值，数据不足一个窗口时为 None"""
+        if self.count < self.period:
+            return None
+        return self.total / self.period
+
+
+class MAState:
+    """单只股票的双均线与成交量均线流式状态"""
+    def __init__(self, short_period, long_period, volume_period=None):
+        self.short_ma = RollingMean(short_period)
+        self.long_ma = RollingMean(long_period)
+        self.volume_ma = RollingMean(volume_period or short_period)
+        self.last_time_key = None    # 当前K线的时间
+        self.volume = None           # 当前K线的成交量
+        self.prev_short = None       # 上一根K线收盘时的短期均线
+        self.prev_long = None        # 上一根K线收盘时的长期均线
+        self.bars = 0                # 已处理的K线根数
+
+    def update(self, time_key, close, volume):
+        """应用一次K线推送
+
+        与当前K线时间相同则原地更新，时间更晚则追加新K线，更早的推送忽略
+
+        Returns:
+            bool: 是否追加了新K线
+        """
+        if self.last_time_key is not None and time_key < self.last_time_key:
+            return False
+        if time_key == self.last_time_key:
+            self.short_ma.replace_last(close)
+            self.long_ma.replace_last(close)
+            self.volume_ma.replace_last(volume)
+            self.volume = volume
+            return False
+
+        # 新K线：先记录上一根K线收盘时的均线
+        self.prev_short = self.short_ma.value
+        self.prev_long = self.long_ma.value
+        self.short_ma.push(close)
+        self.long_ma.push(close)
+        self.volume_ma.push(volume)
+        self.last_time_key = time_key
+        self.volume = volume
+        self.bars += 1
+        return True
+
+    def load(self, time_keys, closes, volumes):
+        """用按时间排序的历史K线初始化状态"""
+        for time_key, close, volume in zip(time_keys, closes, volumes):
+            self.update(time_key, float(close), float(volume))
+
+    @property
+    def ready(self):
+        """当前与上一根K线的均线是否都已可用"""
+        return None not in (self.short_ma.value, self.long_ma.value, self.prev_short, self.prev_long)
+
+    def snapshot(self):
+        """返回判断交叉与量能所需的当前值"""
+        return {
+            'short': self.short_ma.value,
+            'long': self.long_ma.value,
+            'prev_short': self.prev_short,
+            'prev_long': self.prev_long,
+            'volume': self.volume,
+            'volume_ma': self.volume_ma.value,
+        }
@@ -1,54 +1,149 @@
+import os
+import sys
 import time
+import threading
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
 from futu import *
-from datetime import datetime, date
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from utils import create_quote_context
+from scheduler import PRIORITY_STRATEGY
+from market_sessions import market_of, next_session_close
+from trading_calendar import is_trading_day
+from indicator_state import MAState
+from dispatcher import SignalDispatcher
+from request_cache import RequestCache
+from push_replay import PushRecorder
 
 class KLineCache:
-    """K线数据缓存类"""
-    def __init__(self):
-        self.cache = {}  # KV 缓存
-        self.cache_date = {}  # 缓存日期记录
+    """K线数据缓存类
+
+    按 (code, ktype) 缓存，较长的序列可直接满足较短的请求；按数据占用字节数做LRU淘汰；
+    缓存在获取后的下一次收盘时过期(按市场时区与交易日)，分钟级K线按 intraday_ttl 秒过期。
+    """
+    # 按收盘时间过期的K线类型，其余类型按 intraday_ttl 过期
+    SESSION_KTYPES = {KLType.K_DAY, KLType.K_WEEK, KLType.K_MON, KLType.K_QUARTER, KLType.K_YEAR}
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, intraday_ttl=60, is_trading_day=None):
+        self.cache = OrderedDict()  # (code, ktype) -> 缓存条目，按最近使用排序
+        self.max_bytes = max_bytes
+        self.intraday_ttl = intraday_ttl
+        self.is_trading_day = is_trading_day  # (market, date) -> bool，默认只排除周末
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+    
+    def generate_key(self, code, ktype):
+        """生成缓存键，不包含数量，便于较长序列复用"""
+        return (code, ktype)
+    
+    def expires_at(self, code, ktype):
+        """计算现在获取的数据何时过期(时间戳)"""
+        if ktype in self.SESSION_KTYPES:
+            return next_session_close(market_of(code), is_trading_day=self.is_trading_day).timestamp()
+        return time.time() + self.intraday_ttl
     
-    def generate_key(self, code, ktype, count):
-        """生成唯一且可计算的缓存键"""
-        return f"{code}_{ktype}_{count}"
+    def _remove(self, key):
+        entry = self.cache.pop(key)
+        self.total_bytes -= entry['bytes']
     
     def get(self, code, ktype, count):
-        """从缓存获取数据"""
-        key = self.generate_key(code, ktype, count)
-        
-        # 检查是否有缓存
-        if key in self.cache:
-            # 检查缓存是否需要更新（每天更新一次）
-            last_update_date = self.cache_date.get(key)
-            today = date.today()
+        """从缓存获取最近 count 根K线"""
+        key = self.generate_key(code, ktype)
+        with self.lock:
+            entry = self.cache.get(key)
+            if entry is not None and time.time() >= entry['expires_at']:
+                # 已过收盘时间，缓存失效
+                self._remove(key)
+                self.expirations += 1
+                entry = None
             
-            if last_update_date == today:
-                # 缓存有效
-                return True, self.cache[key]
-        
-        # 缓存不存在或已过期
-        return False, None
+            # 缓存条目请求过的数量不少于本次请求时可直接复用
+            if entry is None or entry['count'] < count:
+                self.misses += 1
+                return False, None
+            
+            self.cache.move_to_end(key)
+            self.hits += 1
+            data = entry['data']
+            return True, data.iloc[-count:] if len(data) > count else data
     
     def set(self, code, ktype, count, data):
         """设置缓存数据"""
-        key = self.generate_key(code, ktype, count)
-        self.cache[key] = data
-        self.cache_date[key] = date.today()
+        key = self.generate_key(code, ktype)
+        size = int(data.memory_usage(deep=True).sum())
+        expires_at = self.expires_at(code, ktype)  # 可能需要查询交易日历，不在锁内计算
+        with self.lock:
+            if key in self.cache:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            self.cache[key] = {
+                'data': data,
+                'count': count,
+                'bytes': size,
+                'expires_at': expires_at,
+            }
+            self.total_bytes += size
+            
+            # 超出容量时淘汰最久未使用的条目
+            while self.total_bytes > self.max_bytes:
+                self._remove(next(iter(self.cache)))
+                self.evictions += 1
+    
+    def stats(self):
+        """返回缓存命中与容量统计"""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self.cache),
+                'bytes': self.total_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
 
 # 全局缓存实例
-kline_cache = KLineCache()
+kline_cache = KLineCache(is_trading_day=is_trading_day)
+
+# 大盘快照与资金流向的缓存有效期(秒)，可通过环境变量覆盖
+MARKET_TREND_TTL = float(os.environ.get('FUTU_MARKET_TREND_TTL', '3'))
+CAPITAL_FLOW_TTL = float(os.environ.get('FUTU_CAPITAL_FLOW_TTL', '30'))
+
+# 历史K线加载失败后的重试间隔(秒)，每次失败翻倍直到上限
+HISTORY_RETRY_MIN = 5
+HISTORY_RETRY_MAX = 300
+
+# 大盘快照与资金流向请求缓存，所有股票的策略实例共享，同时到达的相同请求只调用一次
+market_data_cache = RequestCache(ttl=MARKET_TREND_TTL)
 
 class MAStrategy:
     """双均线交叉策略类"""
-    def __init__(self, short_period=5, long_period=20, volume_ratio_buy=1.2, volume_ratio_sell=0.85):
+    def __init__(self, short_period=5, long_period=20, volume_ratio_buy=1.2, volume_ratio_sell=0.85,
+                 request_cache=None):
+        self.request_cache = request_cache or market_data_cache  # 大盘与资金流向请求缓存
         self.short_period = short_period  # 短期均线周期
         self.long_period = long_period    # 长期均线周期
         self.volume_ratio_buy = volume_ratio_buy  # 买入信号成交量放大比例
         self.volume_ratio_sell = volume_ratio_sell  # 卖出信号成交量萎缩比例
         self.history_data = None          # 历史K线数据
         self.last_signal = None           # 最近一次信号
+        self.state = None                 # 均线流式状态，推送时增量更新
+        self.last_price = None            # 最新分时价格
+        self.last_rt_time = None          # 最新分时时间
+        self.pending_kline = None         # 状态初始化前收到的最新一根K线 (time_key, close, volume)，初始化后补上
+        self.history_retry_at = 0.0       # 历史K线加载失败后，下次允许重试的时间(time.monotonic)
+        self.history_retry_delay = HISTORY_RETRY_MIN
+        self.lock = threading.Lock()      # 运行时用于串行化同一股票的初始化与推送处理
     
     def calculate_ma(self, data):
         """计算移动平均线"""
@@ -72,7 +167,11 @@ class MAStrategy:
     
     def check_market_trend(self, quote_ctx, market_code='HSI'):
         """检查大盘趋势"""
-        ret, data = quote_ctx.get_market_snapshot([market_code])
+        ret, data = self.request_cache.get(
+            ('snapshot', market_code),
+            lambda: quote_ctx.get_market_snapshot([market_code]),
+            ttl=MARKET_TREND_TTL
+        )
         if ret != RET_OK:
             print(f"[错误] 获取大盘数据失败: {data}")
             return False
@@ -82,7 +181,11 @@ class MAStrategy:
     
     def check_capital_flow(self, quote_ctx, code):
         """检查资金流向"""
-        ret, data = quote_ctx.get_capital_flow(code, period_type=PeriodType.INTRADAY)
+        ret, data = self.request_cache.get(
+            ('capital_flow', code),
+            lambda: quote_ctx.get_capital_flow(code, period_type=PeriodType.INTRADAY),
+            ttl=CAPITAL_FLOW_TTL
+        )
         if ret != RET_OK:
             print(f"[错误] 获取资金流向失败: {data}")
             return False
@@ -90,8 +193,8 @@ class MAStrategy:
         # 检查最新的主力资金流向是否为净流入
         return data['main_inflow'][0] > 0
     
-    def generate_signal(self, quote_ctx, code):
-        """生成交易信号"""
+    def load_history(self, quote_ctx, code):
+        """加载历史K线并初始化均线流式状态"""
         # 1. 优先从缓存中获取历史数据
         max_count = self.long_period * 2  # 确保有足够数据计算均线
         has_cache, cache_data = kline_cache.get(code, KLType.K_DAY, max_count)
@@ -111,31 +214,87 @@ class MAStrategy:
             
             if ret != RET_OK:
                 print(f"[错误] 获取历史K线失败: {data}")
-                return None
+                return False
             
             self.history_data = data
             # 将数据保存到缓存
             kline_cache.set(code, KLType.K_DAY, max_count, data)
         
-        # 2. 计算均线
-        ma_data = self.calculate_ma(self.history_data)
-        if ma_data is None:
-            print("[警告] 数据不足，无法计算均线")
+        # 2. 用历史数据初始化流式状态，之后的推送只做增量更新
+        # 状态完整构建并补上初始化前收到的推送后再赋值，推送处理不会看到加载了一半的状态
+        history = self.history_data.sort_values('time_key')
+        state = MAState(self.short_period, self.long_period)
+        state.load(history['time_key'], history['close'], history['volume'])
+        if self.pending_kline is not None:
+            state.update(*self.pending_kline)
+        self.pending_kline = None
+        self.state = state
+        return True
+    
+    def ensure_state(self, quote_ctx, code):
+        """状态未初始化时加载历史K线，失败后按退避间隔重试，返回状态是否可用"""
+        if self.state is not None:
+            return True
+        now = time.monotonic()
+        if now < self.history_retry_at:
+            return False
+        if self.load_history(quote_ctx, code):
+            self.history_retry_delay = HISTORY_RETRY_MIN
+            return True
+        self.history_retry_at = now + self.history_retry_delay
+        self.history_retry_delay = min(self.history_retry_delay * 2, HISTORY_RETRY_MAX)
+        return False
+    
+    def apply_kline(self, data):
+        """逐根增量更新均线状态，返回状态是否已初始化
+
+        未初始化时只暂存最新一根K线：加载的历史已包含更早的K线，同一根K线的推送只以最新一次为准
+        """
+        if self.state is None:
+            for time_key, close, volume in zip(data['time_key'], data['close'], data['volume']):
+                if self.pending_kline is None or time_key >= self.pending_kline[0]:
+                    self.pending_kline = (time_key, float(close), float(volume))
+            return False
+        for time_key, close, volume in zip(data['time_key'], data['close'], data['volume']):
+            self.state.update(time_key, float(close), float(volume))
+        return True
+    
+    def on_kline(self, quote_ctx, code, data):
+        """处理K线推送：逐根增量更新状态后重新判断信号"""
+        if not self.apply_kline(data):
+            return None
+        return self.evaluate_signal(quote_ctx, code)
+    
+    def on_rt_data(self, code, data):
+        """处理分时推送：记录最新价格与时间"""
+        last = data.iloc[-1]
+        self.last_price = float(last['cur_price'])
+        self.last_rt_time = last['time']
+    
+    def generate_signal(self, quote_ctx, code):
+        """生成交易信号"""
+        if not self.ensure_state(quote_ctx, code):
+            return None
+        return self.evaluate_signal(quote_ctx, code)
+    
+    def evaluate_signal(self, quote_ctx, code):
+        """根据当前流式状态判断均线交叉并生成信号"""
+        if not self.state.ready:
+            print(f"[警告] {code} 数据不足，无法计算均线")
             return None
         
         # 3. 判断均线交叉
-        current = ma_data.iloc[-1]
-        previous = ma_data.iloc[-2]
+        current = self.state.snapshot()
         
         # 判断是否出现金叉(买入信号)
-        is_golden_cross = (previous[f'ma_{self.short_period}'] <= previous[f'ma_{self.long_period}']) and \
-                         (current[f'ma_{self.short_period}'] > current[f'ma_{self.long_period}'])
+        is_golden_cross = (current['prev_short'] <= current['prev_long']) and \
+                         (current['short'] > current['long'])
         
         # 判断是否出现死叉(卖出信号)
-        is_death_cross = (previous[f'ma_{self.short_period}'] >= previous[f'ma_{self.long_period}']) and \
-                        (current[f'ma_{self.short_period}'] < current[f'ma_{self.long_period}'])
+        is_death_cross = (current['prev_short'] >= current['prev_long']) and \
+                        (current['short'] < current['long'])
         
-        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] 金叉:{'出现' if is_golden_cross else '未出现'} | 死叉:{'出现' if is_death_cross else '未出现'}")
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {code} 金叉:{'出现' if is_golden_cross else '未出现'} | 死叉:{'出现' if is_death_cross else '未出现'}")
         
         signal = None
         
@@ -152,15 +311,10 @@ class MAStrategy:
 
 
 class CurKlineTest(CurKlineHandlerBase):
-    def __init__(self, strategy):
+    """K线推送处理器：解析推送后交给运行时按股票分发"""
+    def __init__(self, runtime):
         super(CurKlineTest, self).__init__()
-        self.strategy = strategy
-        self.quote_ctx = None
-        self.code = None
-    
-    def set_context(self, quote_ctx, code):
-        self.quote_ctx = quote_ctx
-        self.code = code
+        self.runtime = runtime
     
     def on_recv_rsp(self, rsp_pb):
         ret_code, data = super(CurKlineTest,self).on_recv_rsp(rsp_pb)
@@ -168,27 +322,21 @@ class CurKlineTest(CurKlineHandlerBase):
             print(f"[错误] K线数据接收失败: {data}")
             return RET_ERROR, data
         
-        # 将新数据添加到历史数据中
-        if self.strategy.history_data is not None:
-            self.strategy.history_data = pd.concat([self.strategy.history_data, data]).drop_duplicates()
-            
-            # 更新缓存
-            max_count = self.strategy.long_period * 2
-            kline_cache.set(self.code, KLType.K_DAY, max_count, self.strategy.history_data)
-            
-            # 重新生成信号
-            signal = self.strategy.generate_signal(self.quote_ctx, self.code)
-            if signal:
-                print(f"[信号] {self.code} 产生 {signal} 信号")
-                # 这里可以添加实际的下单逻辑
-        
+        if self.runtime.recorder is not None:
+            self.runtime.recorder.record('KLINE', data)
+        self.handle(data)
         return RET_OK, data
+    
+    def handle(self, data):
+        """处理已解析的K线推送"""
+        self.runtime.on_kline(data)
 
 
 class RTDataTest(RTDataHandlerBase):
-    def __init__(self, strategy):
+    """分时推送处理器：解析推送后交给运行时按股票分发"""
+    def __init__(self, runtime):
         super(RTDataTest, self).__init__()
-        self.strategy = strategy
+        self.runtime = runtime
     
     def on_recv_rsp(self, rsp_pb):
         ret_code, data = super(RTDataTest, self).on_recv_rsp(rsp_pb)
@@ -196,58 +344,229 @@ class RTDataTest(RTDataHandlerBase):
             print(f"[错误] 分时数据接收失败: {data}")
             return RET_ERROR, data
         
-        # 不再打印分时数据，仅处理
-        # 这里可以添加对分时成交量的分析逻辑
-        
+        if self.runtime.recorder is not None:
+            self.runtime.recorder.record('RT_DATA', data)
+        self.handle(data)
         return RET_OK, data
+    
+    def handle(self, data):
+        """处理已解析的分时推送"""
+        self.runtime.on_rt_data(data)
+
+
+def split_by_code(data):
+    """按 code 列拆分推送数据，返回 [(code, 数据), ...]
 
+    单次推送通常只包含一只股票，此时不做分组直接返回
+    """
+    codes = data['code'].values
+    if len(codes) == 0:
+        return []
+    if len(codes) == 1 or (codes == codes[0]).all():
+        return [(codes[0], data)]
+    return list(data.groupby('code', sort=False))
 
-def run_ma_strategy(code, short_period=5, long_period=20):
-    """运行双均线策略"""
-    quote_ctx = OpenQuoteContext(host='127.0.0.1', port=11111)
+
+class StrategyRuntime:
+    """在一个行情连接上运行整个股票池的策略
+
+    每只股票一个策略实例，推送按 code 列分发到对应实例；订阅按批次提交并受订阅额度限制。
+    推送回调只把数据交给分发器即返回，信号计算在分发器的工作线程中进行。
+    """
+    # 每次订阅请求提交的股票数
+    SUBSCRIBE_BATCH = 100
+
+    def __init__(self, quote_ctx, strategy_factory, subtypes=(SubType.K_DAY, SubType.RT_DATA),
+                 workers=4, max_pending=10000, recorder=None):
+        """
+        Args:
+            quote_ctx: 行情对象
+            strategy_factory (callable): 无参函数，为每只股票创建一个策略实例
+            subtypes (list): 订阅的数据类型
+            workers (int): 信号计算线程数
+            max_pending (int): 最多同时积压推送的股票数
+            recorder: push_replay.PushRecorder，提供时录制收到的推送以便离线回放
+        """
+        self.quote_ctx = quote_ctx
+        self.strategy_factory = strategy_factory
+        self.subtypes = list(subtypes)
+        self.recorder = recorder
+        self.strategies = {}        # code -> 策略实例
+        self.dispatcher = SignalDispatcher(
+            self.process, workers=workers, max_pending=max_pending,
+            coalesce_key=self.push_coalesce_key, droppable=lambda item: item[0] == 'rt'
+        )
+        self.kline_handler = CurKlineTest(self)
+        self.rt_handler = RTDataTest(self)
+        quote_ctx.set_handler(self.kline_handler)
+        quote_ctx.set_handler(self.rt_handler)
+    
+    def remaining_quota(self):
+        """查询剩余订阅额度，查询失败时返回 None"""
+        ret, data = self.quote_ctx.query_subscription()
+        if ret != RET_OK:
+            print(f"[错误] 查询订阅额度失败: {data}")
+            return None
+        return data.get('remain')
+    
+    def subscribe(self, code_list):
+        """分批订阅股票池，超出订阅额度的股票不再订阅
+
+        Returns:
+            list: 订阅成功的股票代码
+        """
+        code_list = [code for code in dict.fromkeys(code_list) if code not in self.strategies]
+        remain = self.remaining_quota()
+        if remain is not None:
+            # 每只股票的每种数据类型各占一个额度
+            limit = max(0, remain // len(self.subtypes))
+            if limit < len(code_list):
+                print(f"[警告] 订阅额度不足，{len(code_list) - limit} 只股票未订阅: {code_list[limit:]}")
+                code_list = code_list[:limit]
+        
+        subscribed = []
+        for i in range(0, len(code_list), self.SUBSCRIBE_BATCH):
+            batch = code_list[i:i + self.SUBSCRIBE_BATCH]
+            ret, data = self.quote_ctx.subscribe(batch, self.subtypes)
+            if ret != RET_OK:
+                print(f"[错误] {batch[0]} 等 {len(batch)} 只股票订阅失败: {data}")
+                continue
+            self.add_strategies(batch)
+            subscribed.extend(batch)
+        print(f"[系统] {len(subscribed)} 只股票数据订阅成功")
+        return subscribed
+    
+    def add_strategies(self, code_list):
+        """为股票创建策略实例但不订阅，已有实例的股票保持不变(回放推送时使用)"""
+        for code in code_list:
+            if code not in self.strategies:
+                self.strategies[code] = self.strategy_factory()
     
-    # 创建策略实例
-    ma_strategy = MAStrategy(
+    def initial_signals(self):
+        """为每只股票加载历史K线并计算初始信号"""
+        signals = {}
+        for code, strategy in list(self.strategies.items()):
+            # 订阅后推送已在分发器线程中处理，与同一股票的推送处理互斥
+            with strategy.lock:
+                signal = strategy.generate_signal(self.quote_ctx, code)
+            if signal:
+                print(f"[信号] {code} 初始信号: {signal}")
+                signals[code] = signal
+        return signals
+    
+    @staticmethod
+    def push_coalesce_key(item):
+        """分发器中积压推送的合并键
+
+        process 只使用最新一条分时推送；MAState 对同一根K线只以最新一次推送为准，
+        只含一根K线的推送按 time_key 合并，已走完的K线的最后一次推送不会被丢弃
+        """
+        kind, rows = item
+        if kind == 'rt':
+            return ('rt',)
+        time_keys = rows['time_key']
+        first = time_keys.iloc[0]
+        return ('kline', first) if (time_keys == first).all() else None
+    
+    def on_kline(self, data):
+        """将K线推送按股票放入分发器"""
+        for code, rows in split_by_code(data):
+            if code in self.strategies:
+                self.dispatcher.submit(code, ('kline', rows))
+    
+    def on_rt_data(self, data):
+        """将分时推送按股票放入分发器"""
+        for code, rows in split_by_code(data):
+            if code in self.strategies:
+                self.dispatcher.submit(code, ('rt', rows))
+    
+    def process(self, code, items):
+        """在分发器工作线程中处理一只股票积压的推送
+
+        K线推送按顺序全部应用到均线状态后只计算一次信号，分时推送只保留最新一条；
+        历史K线尚未加载成功(如启动时限频或OpenD出错)的股票在收到K线推送时按退避间隔重试加载
+        """
+        strategy = self.strategies[code]
+        with strategy.lock:
+            kline_updated = kline_received = False
+            latest_rt = None
+            for kind, rows in items:
+                if kind == 'kline':
+                    kline_updated = strategy.apply_kline(rows) or kline_updated
+                    kline_received = True
+                else:
+                    latest_rt = rows
+            if kline_received and strategy.state is None:
+                kline_updated = strategy.ensure_state(self.quote_ctx, code)
+            if latest_rt is not None:
+                strategy.on_rt_data(code, latest_rt)
+            if kline_updated:
+                signal = strategy.evaluate_signal(self.quote_ctx, code)
+                if signal:
+                    print(f"[信号] {code} 产生 {signal} 信号")
+                    # 这里可以添加实际的下单逻辑
+    
+    def stats(self):
+        """返回推送分发统计"""
+        return self.dispatcher.stats()
+    
+    def close(self):
+        """处理完已接收的推送后停止分发器"""
+        self.dispatcher.close(wait=True)
+
+
+def run_ma_strategy(code, short_period=5, long_period=20, record_path=None):
+    """运行双均线策略
+
+    Args:
+        code (str or list): 股票代码或股票代码列表，所有股票共用一个行情连接
+        record_path (str): 提供时将收到的推送录制到该文件，可用 push_replay.py replay 回放
+    """
+    code_list = [code] if isinstance(code, str) else list(code)
+    
+    # 策略请求以最高优先级经请求调度器排队，优先于MCP临时查询
+    quote_ctx = create_quote_context(priority=PRIORITY_STRATEGY)
+    recorder = PushRecorder(record_path) if record_path else None
+    
+    # 每只股票一个策略实例
+    runtime = StrategyRuntime(quote_ctx, lambda: MAStrategy(
         short_period=short_period, 
         long_period=long_period, 
         volume_ratio_buy=1.2, 
         volume_ratio_sell=0.85
-    )
-    
-    # 初始化K线处理器
-    kline_handler = CurKlineTest(ma_strategy)
-    kline_handler.set_context(quote_ctx, code)
-    quote_ctx.set_handler(kline_handler)
-    
-    # 初始化分时数据处理器
-    rt_handler = RTDataTest(ma_strategy)
-    quote_ctx.set_handler(rt_handler)
+    ), recorder=recorder)
     
     # 订阅K线和分时数据
-    ret, data = quote_ctx.subscribe([code], [SubType.K_DAY, SubType.RT_DATA])
-    if ret == RET_OK:
-        print(f"[系统] {code} 数据订阅成功")
-    else:
-        print(f"[错误] {code} 数据订阅失败: {data}")
+    if not runtime.subscribe(code_list):
+        runtime.close()
         quote_ctx.close()
+        if recorder:
+            recorder.close()
         return
     
     # 获取初始信号
-    initial_signal = ma_strategy.generate_signal(quote_ctx, code)
-    if initial_signal:
-        print(f"[信号] {code} 初始信号: {initial_signal}")
+    runtime.initial_signals()
     
     # 持续运行策略
-    print(f"[系统] 策略开始运行，监控 {code}...")
+    print(f"[系统] 策略开始运行，监控 {len(runtime.strategies)} 只股票...")
     try:
         while True:
             time.sleep(60)  # 每分钟检查一次
+            stats = runtime.stats()
+            print(f"[系统] 推送队列 深度:{stats['depth']} 合并:{stats['coalesced']} 丢弃:{stats['dropped']} "
+                  f"延迟p99:{stats['latency_p99_ms']:.1f}ms")
+            cache_stats = market_data_cache.stats()
+            print(f"[系统] 大盘/资金流向缓存 命中率:{cache_stats['hit_rate']:.1%} 调用:{cache_stats['misses']} "
+                  f"合并:{cache_stats['coalesced']}")
     except KeyboardInterrupt:
         print("[系统] 策略停止运行")
     finally:
+        runtime.close()
         quote_ctx.close()
+        if recorder:
+            recorder.close()
 
 
 if __name__ == "__main__":
     # 运行双均线策略，以腾讯股票为例
-    run_ma_strategy("HK.00700")
\ No newline at end of file
+    run_ma_strategy("HK.00700")
@@ -0,0 +1,349 @@
+"""推送录制与回放
+
+录制：把收到的K线、分时、逐笔推送连同接收时间追加写入紧凑的二进制文件；
+回放：按录制时的时间间隔以 1 倍、N 倍或不限速把推送重新交给策略运行时的推送处理器，
+统计能持续处理的推送速率、处理积压与推送到信号的延迟，用于离线评估开盘高峰所需的硬件。
+
+文件格式：文件头 MAGIC，之后每条记录为
+    <接收时间戳 float64><推送类型 uint8><数据长度 uint32> + pickle 的 {列名: 值列表}
+
+用法:
+    python strategy/push_replay.py record --code_list HK.00700 HK.09988 --subtypes K_DAY K_1M RT_DATA TICKER --output data/pushes.bin
+    python strategy/push_replay.py replay --input data/pushes.bin --speed 0
+    python strategy/push_replay.py synthesize --output data/burst.bin --symbols 2000 --rate 20000 --seconds 10
+"""
+import argparse
+import contextlib
+import io
+import os
+import pickle
+import struct
+import sys
+import threading
+import time
+import pandas as pd
+from futu import (
+    RET_OK, CurKlineHandlerBase, RTDataHandlerBase, TickerHandlerBase, SubType
+)
+
+STRATEGY_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(STRATEGY_DIR, '..', 'scripts'))
+
+MAGIC = b'FUTUPUSH1\n'
+RECORD_HEADER = struct.Struct('<dBI')
+# 推送类型，写入文件时以序号保存
+PUSH_KINDS = ('KLINE', 'RT_DATA', 'TICKER')
+KIND_CODES = {kind: i for i, kind in enumerate(PUSH_KINDS)}
+# 订阅类型 -> 推送类型
+SUBTYPE_KINDS = {
+    'K_1M': 'KLINE', 'K_3M': 'KLINE', 'K_5M': 'KLINE', 'K_15M': 'KLINE', 'K_30M': 'KLINE',
+    'K_60M': 'KLINE', 'K_DAY': 'KLINE', 'RT_DATA': 'RT_DATA', 'TICKER': 'TICKER',
+}
+
+
+class PushRecorder:
+    """线程安全的推送录制器"""
+    def __init__(self, path, flush_every=1000, append=True):
+        """
+        Args:
+            path (str): 录制文件路径
+            flush_every (int): 每写入多少条记录刷新一次文件缓冲
+            append (bool): 文件已存在时在末尾追加，否则清空后重新写入
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        is_new = not append or not os.path.exists(path) or os.path.getsize(path) == 0
+        self.path = path
+        self.flush_every = flush_every
+        self.file = open(path, 'ab' if append else 'wb')
+        if is_new:
+            self.file.write(MAGIC)
+        self.lock = threading.Lock()
+        self.count = 0
+        self.bytes = 0
+
+    def record(self, kind, data, recv_time=None):
+        """写入一条推送
+
+        Args:
+            kind (str): 推送类型，取 PUSH_KINDS 之一
+            data (DataFrame): SDK 解析后的推送数据
+            recv_time (float): 接收时间戳，默认当前时间
+        """
+        recv_time = time.time() if recv_time is None else recv_time
+        payload = pickle.dumps({column: data[column].tolist() for column in data.columns},
+                               protocol=pickle.HIGHEST_PROTOCOL)
+        header = RECORD_HEADER.pack(recv_time, KIND_CODES[kind], len(payload))
+        with self.lock:
+            self.file.write(header)
+            self.file.write(payload)
+            self.count += 1
+            self.bytes += len(header) + len(payload)
+            if self.count % self.flush_every == 0:
+                self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+def read_pushes(path):
+    """按写入顺序读取录制文件
+
+    Yields:
+        tuple: (接收时间戳, 推送类型, DataFrame)；文件末尾写了一半的记录被忽略
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} 不是推送录制文件")
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                return
+            recv_time, kind, length = RECORD_HEADER.unpack(header)
+            payload = f.read(length)
+            if len(payload) < length:
+                return
+            yield recv_time, PUSH_KINDS[kind], pd.DataFrame(pickle.loads(payload))
+
+
+class _RecordingHandler:
+    """只录制不处理的推送处理器"""
+    kind = None
+
+    def __init__(self, recorder):
+        super().__init__()
+        self.recorder = recorder
+
+    def on_recv_rsp(self, rsp_pb):
+        ret_code, data = super().on_recv_rsp(rsp_pb)
+        if ret_code == RET_OK:
+            self.recorder.record(self.kind, data)
+        return ret_code, data
+
+
+class KLineRecorder(_RecordingHandler, CurKlineHandlerBase):
+    kind = 'KLINE'
+
+
+class RTDataRecorder(_RecordingHandler, RTDataHandlerBase):
+    kind = 'RT_DATA'
+
+
+class TickerRecorder(_RecordingHandler, TickerHandlerBase):
+    kind = 'TICKER'
+
+
+RECORDING_HANDLERS = {'KLINE': KLineRecorder, 'RT_DATA': RTDataRecorder, 'TICKER': TickerRecorder}
+
+
+def replay(pushes, handlers, speed=1.0):
+    """把推送依次交给对应处理器的 handle()
+
+    Args:
+        pushes (list): [(接收时间戳, 推送类型, DataFrame), ...]，按时间排列
+        handlers (dict): 推送类型 -> 处理器，没有处理器的类型被跳过
+        speed (float): 回放倍速，0 表示不等待、尽可能快地回放
+
+    Returns:
+        dict: 回放条数、跳过条数、耗时，以及推送晚于计划时间的延迟分位数(毫秒)
+    """
+    replayed = skipped = 0
+    lags = []
+    first = pushes[0][0] if pushes else 0.0
+    start = time.perf_counter()
+    for recv_time, kind, data in pushes:
+        handler = handlers.get(kind)
+        if handler is None:
+            skipped += 1
+            continue
+        if speed:
+            delay = start + (recv_time - first) / speed - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            lags.append(max(0.0, -delay))
+        handler.handle(data)
+        replayed += 1
+    elapsed = time.perf_counter() - start
+    lags.sort()
+    return {
+        'replayed': replayed,
+        'skipped': skipped,
+        'elapsed': elapsed,
+        'lag_p99_ms': lags[min(len(lags) - 1, int(len(lags) * 0.99))] * 1000 if lags else 0.0,
+        'lag_max_ms': lags[-1] * 1000 if lags else 0.0,
+    }
+
+
+def replay_strategy(pushes, quote_ctx, strategy_factory, speed=1.0, workers=4, max_pending=10000):
+    """在策略运行时上回放推送并统计处理能力
+
+    推送中出现的每只股票创建一个策略实例并加载历史K线(不订阅)，K线与分时推送经
+    运行时的推送处理器进入分发器；逐笔推送没有对应处理器时跳过。
+
+    Returns:
+        dict: 回放统计，包括
+            offered_rate   按录制时间与倍速计算的推送到达速率(条/秒)，不限速时为 None
+            intake_rate    推送处理器接收速率(条/秒)
+            achieved_rate  含排空积压在内的实际处理速率(条/秒)；不限速回放时即能持续处理的最大速率
+            max_backlog    回放期间积压推送的最多股票数
+            end_backlog    推送全部送出时仍积压的股票数
+            drain_ms       推送送出后排空积压的耗时
+            latency_*_ms   推送入队到信号计算完成的延迟
+    """
+    from main import StrategyRuntime
+
+    codes = list(dict.fromkeys(code for _, kind, data in pushes for code in data['code'].values))
+    runtime = StrategyRuntime(quote_ctx, strategy_factory, workers=workers, max_pending=max_pending)
+    try:
+        runtime.add_strategies(codes)
+        runtime.initial_signals()
+        handlers = {'KLINE': runtime.kline_handler, 'RT_DATA': runtime.rt_handler}
+        result = replay(pushes, handlers, speed)
+        end_backlog = runtime.stats()['depth']
+        drain_start = time.perf_counter()
+        runtime.dispatcher.wait_idle()
+        drain = time.perf_counter() - drain_start
+        stats = runtime.stats()
+    finally:
+        runtime.close()
+
+    span = pushes[-1][0] - pushes[0][0] if len(pushes) > 1 else 0.0
+    return {
+        'symbols': len(codes),
+        **result,
+        'offered_rate': len(pushes) * speed / span if speed and span else None,
+        'intake_rate': result['replayed'] / result['elapsed'] if result['elapsed'] else 0.0,
+        'achieved_rate': result['replayed'] / (result['elapsed'] + drain) if result['replayed'] else 0.0,
+        'max_backlog': stats['max_depth'],
+        'end_backlog': end_backlog,
+        'drain_ms': drain * 1000,
+        'coalesced': stats['coalesced'],
+        'dropped': stats['dropped'],
+        'processed': stats['processed'],
+        'latency_p50_ms': stats['latency_p50_ms'],
+        'latency_p99_ms': stats['latency_p99_ms'],
+        'latency_max_ms': stats['latency_max_ms'],
+    }
+
+
+def load_fake_module():
+    """导入 benchmarks/fake_quote_context.py，用于离线回放与生成合成推送"""
+    sys.path.append(os.path.join(STRATEGY_DIR, '..', 'benchmarks'))
+    import fake_quote_context
+    return fake_quote_context
+
+
+def record_main(args):
+    from utils import create_quote_context
+
+    kinds = sorted({SUBTYPE_KINDS[subtype] for subtype in args.subtypes})
+    recorder = PushRecorder(args.output)
+    quote_ctx = create_quote_context()
+    try:
+        for kind in kinds:
+            quote_ctx.set_handler(RECORDING_HANDLERS[kind](recorder))
+        ret, data = quote_ctx.subscribe(args.code_list, [getattr(SubType, s) for s in args.subtypes])
+        if ret != RET_OK:
+            print(f"[错误] 订阅失败: {data}")
+            return
+        print(f"[系统] 开始录制 {len(args.code_list)} 只股票的 {args.subtypes} 推送到 {args.output}")
+        deadline = time.monotonic() + args.duration if args.duration else None
+        while deadline is None or time.monotonic() < deadline:
+            time.sleep(min(60, deadline - time.monotonic()) if deadline else 60)
+            print(f"[系统] 已录制 {recorder.count} 条推送，{recorder.bytes / 1024 / 1024:.1f} MB")
+    except KeyboardInterrupt:
+        print("[系统] 停止录制")
+    finally:
+        quote_ctx.close()
+        recorder.close()
+    print(f"[系统] 共录制 {recorder.count} 条推送")
+
+
+def replay_main(args):
+    from main import MAStrategy
+
+    pushes = list(read_pushes(args.input))
+    if not pushes:
+        print(f"[错误] {args.input} 中没有推送记录")
+        return
+    if args.fake:
+        import main as strategy_main
+        from market_sessions import is_weekday
+        fake = load_fake_module()
+        quote_ctx = fake.FakeOpenQuoteContext()
+        # 加载历史K线时缓存过期时间按交易日历计算，离线回放改用只排除周末的判断，不连接 OpenD
+        strategy_main.kline_cache = strategy_main.KLineCache(is_trading_day=lambda market, day: is_weekday(day))
+    else:
+        from utils import create_quote_context
+        quote_ctx = create_quote_context()
+
+    factory = lambda: MAStrategy(short_period=args.short_period, long_period=args.long_period)
+    # 策略每次判断信号都会打印，默认丢弃以免终端输出成为瓶颈
+    output = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    try:
+        with output:
+            result = replay_strategy(pushes, quote_ctx, factory, args.speed, args.workers, args.max_pending)
+    finally:
+        quote_ctx.close()
+
+    speed = f"{args.speed:g}x" if args.speed else "不限速"
+    offered = f"{result['offered_rate']:,.0f}/s" if result['offered_rate'] else "-"
+    print(f"[回放] {len(pushes)} 条推送 {result['symbols']} 只股票 速度:{speed} 跳过:{result['skipped']}")
+    print(f"[回放] 到达速率:{offered} 接收速率:{result['intake_rate']:,.0f}/s "
+          f"处理速率(含排空):{result['achieved_rate']:,.0f}/s 计划延迟p99:{result['lag_p99_ms']:.1f}ms")
+    print(f"[回放] 积压 最大:{result['max_backlog']} 结束时:{result['end_backlog']} 排空:{result['drain_ms']:.1f}ms "
+          f"合并:{result['coalesced']} 丢弃:{result['dropped']}")
+    print(f"[回放] 推送到信号延迟 p50:{result['latency_p50_ms']:.2f}ms p99:{result['latency_p99_ms']:.2f}ms "
+          f"最大:{result['latency_max_ms']:.2f}ms")
+
+
+def synthesize_main(args):
+    fake = load_fake_module()
+    code_list = [f'HK.{i:05d}' for i in range(args.symbols)]
+    # 追加到已有文件会接上一段时间不连续的推送流，默认覆盖
+    recorder = PushRecorder(args.output, append=args.append)
+    try:
+        for recv_time, kind, data in fake.synthetic_push_stream(code_list, args.seconds, args.rate, args.kinds):
+            recorder.record(kind, data, recv_time)
+    finally:
+        recorder.close()
+    print(f"[系统] 已生成 {recorder.count} 条合成推送到 {args.output}，{recorder.bytes / 1024 / 1024:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='推送录制与回放')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record = commands.add_parser('record', help='订阅并录制推送')
+    record.add_argument('--code_list', nargs='+', type=str, required=True, help='股票代码列表')
+    record.add_argument('--subtypes', nargs='+', type=str, default=['K_DAY', 'RT_DATA'],
+                        choices=sorted(SUBTYPE_KINDS), help='订阅类型')
+    record.add_argument('--output', type=str, required=True, help='录制文件路径，已存在时追加')
+    record.add_argument('--duration', type=float, default=None, help='录制时长(秒)，默认直到 Ctrl+C')
+
+    replay_parser = commands.add_parser('replay', help='将录制的推送回放给策略运行时')
+    replay_parser.add_argument('--input', type=str, required=True, help='录制文件路径')
+    replay_parser.add_argument('--speed', type=float, default=1.0, help='回放倍速，0 表示不限速')
+    replay_parser.add_argument('--workers', type=int, default=4, help='信号计算线程数')
+    replay_parser.add_argument('--max_pending', type=int, default=10000, help='最多同时积压推送的股票数')
+    replay_parser.add_argument('--short_period', type=int, default=5, help='短期均线周期')
+    replay_parser.add_argument('--long_period', type=int, default=20, help='长期均线周期')
+    replay_parser.add_argument('--fake', action='store_true', help='使用模拟行情对象加载历史K线，不连接 OpenD')
+    replay_parser.add_argument('--verbose', action='store_true', help='保留策略的信号输出')
+
+    synthesize = commands.add_parser('synthesize', help='生成合成推送文件，模拟开盘推送高峰')
+    synthesize.add_argument('--output', type=str, required=True, help='输出文件路径，已存在时覆盖')
+    synthesize.add_argument('--append', action='store_true', help='追加到已有文件而不是覆盖')
+    synthesize.add_argument('--symbols', type=int, default=1000, help='股票数量')
+    synthesize.add_argument('--rate', type=float, default=10000, help='每秒推送条数')
+    synthesize.add_argument('--seconds', type=float, default=10, help='时长(秒)')
+    synthesize.add_argument('--kinds', nargs='+', default=['KLINE', 'RT_DATA'], choices=PUSH_KINDS, help='推送类型')
+
+    args = parser.parse_args()
+    {'record': record_main, 'replay': replay_main, 'synthesize': synthesize_main}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
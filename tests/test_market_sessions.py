@@ -0,0 +1,147 @@
+"""交易时段K线边界与1分钟K线重采样的测试"""
+import os
+import sys
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from market_sessions import day_session_minutes, bar_end_minute, bar_end_minutes
+from kline_store import BAR_DTYPE, KLineStore, OUTPUT_COLUMNS, time_keys_to_seconds, seconds_to_time_keys
+from kline_resample import resample_bars
+
+HK_60M_LABELS = ['10:30', '11:30', '12:00', '14:00', '15:00', '16:00']
+
+
+def minute(text):
+    hour, minute_ = map(int, text.split(':'))
+    return hour * 60 + minute_
+
+
+def label(value):
+    return f'{int(value) // 60:02d}:{int(value) % 60:02d}'
+
+
+def session_time_keys(day, sessions, auction=True):
+    """一天的1分钟K线 time_key(以结束时间标记)，auction 为 True 时包含开盘时刻的集合竞价K线"""
+    keys = []
+    for index, (open_, close) in enumerate(sessions):
+        first = open_ if auction and index == 0 else open_ + 1
+        keys += [f'{day} {label(m)}:00' for m in range(first, close + 1)]
+    return keys
+
+
+def minute_bars(time_keys):
+    bars = np.zeros(len(time_keys), dtype=BAR_DTYPE)
+    bars['time'] = time_keys_to_seconds(np.array(time_keys))
+    bars['open'] = bars['close'] = bars['high'] = bars['low'] = np.arange(len(time_keys)) + 100.0
+    bars['volume'] = 1
+    bars['last_close'] = 99.0
+    return bars
+
+
+def bar_labels(bars):
+    return [key[11:16] for key in seconds_to_time_keys(np.asarray(bars['time'])).astype(str)]
+
+
+def test_hk_60m_bar_ends():
+    sessions = day_session_minutes('HK')
+    starts = np.arange(minute('09:30'), minute('16:00'))
+    starts = starts[(starts < minute('12:00')) | (starts >= minute('13:00'))]
+    labels = bar_end_minutes(starts, sessions, 60)
+    assert [label(m) for m in np.unique(labels)] == HK_60M_LABELS
+    # 上午最后一根截止于午休收盘，下午从 13:00 重新计数
+    assert label(bar_end_minute(minute('11:45'), sessions, 60)) == '12:00'
+    assert label(bar_end_minute(minute('13:00'), sessions, 60)) == '14:00'
+    assert label(bar_end_minute(minute('15:59') + 0.5, sessions, 60)) == '16:00'
+
+
+def test_scalar_and_vectorised_bar_ends_agree():
+    sessions = day_session_minutes('HK')
+    starts = np.arange(minute('09:00'), minute('16:30'), 0.5)
+    for minutes in (1, 3, 5, 15, 30, 60):
+        expected = [bar_end_minute(start, sessions, minutes) for start in starts]
+        assert bar_end_minutes(starts, sessions, minutes).tolist() == expected
+
+
+def test_opening_auction_minute_joins_first_bar():
+    sessions = day_session_minutes('HK')
+    # 09:30 的1分钟K线(开始于 09:29)为开盘集合竞价，归入第一根K线而不是单独成一根
+    assert label(bar_end_minute(minute('09:29'), sessions, 60)) == '10:30'
+    assert label(bar_end_minute(minute('09:29'), sessions, 5)) == '09:35'
+
+    bars = resample_bars(minute_bars(session_time_keys('2024-01-02', sessions)), 60, 'HK')
+    assert bar_labels(bars) == HK_60M_LABELS
+    # 集合竞价1根 + 上午60根
+    assert bars['volume'][0] == 61
+    assert bars['open'][0] == 100.0
+    assert bars['volume'].sum() == 1 + 150 + 180
+
+
+def test_us_early_close():
+    sessions = day_session_minutes('US', 'MORNING')
+    assert sessions == [(minute('09:30'), minute('13:00'))]
+    assert label(bar_end_minute(minute('12:45'), sessions, 60)) == '13:00'
+
+    keys = session_time_keys('2024-11-29', sessions, auction=False)
+    bars = minute_bars(keys)
+    day_type = lambda market, day: 'MORNING' if day == '2024-11-29' else 'WHOLE'
+    hourly = resample_bars(bars, 60, 'US', day_type)
+    assert bar_labels(hourly) == ['10:30', '11:30', '12:30', '13:00']
+    assert hourly['volume'].tolist() == [60, 60, 60, 30]
+    # 未提供半日市判断时按全天时段，12:30 之后的K线截止于 13:30
+    assert bar_labels(resample_bars(bars, 60, 'US'))[-1] == '13:30'
+
+
+class FakeQuoteContext:
+    """按请求的日期区间返回预先准备的K线，记录调用"""
+    def __init__(self, frames):
+        self.frames = frames
+        self.calls = []
+
+    def request_history_kline(self, code, start, end, ktype, autype, fields, max_count,
+                              page_req_key=None, extended_time=False):
+        self.calls.append((start, end, str(ktype)))
+        frame = self.frames[str(ktype)]
+        days = frame['time_key'].str[:10]
+        return 0, frame[(days >= start) & (days <= end)].reset_index(drop=True), None
+
+
+def kline_frame(code, time_keys):
+    bars = minute_bars(time_keys)
+    frame = pd.DataFrame({column: bars[column] for column in BAR_DTYPE.names[1:]})
+    frame.insert(0, 'time_key', time_keys)
+    frame.insert(0, 'name', '腾讯控股')
+    frame.insert(0, 'code', code)
+    return frame[OUTPUT_COLUMNS]
+
+
+def test_resampled_history_mixes_local_and_opend_segments(tmp_path):
+    pytest.importorskip('futu')
+    from futu import KLType, AuType, KL_FIELD
+    from request_history_kline import iter_history_kline_resampled
+
+    code = 'HK.00700'
+    sessions = day_session_minutes('HK')
+    store = KLineStore(str(tmp_path))
+    # 1分钟K线只覆盖第一天和第三天，第二天需向OpenD获取60分钟K线
+    local_keys = session_time_keys('2024-01-02', sessions) + session_time_keys('2024-01-04', sessions)
+    store.write(code, KLType.K_1M, AuType.NONE, kline_frame(code, local_keys),
+                [(date(2024, 1, 2), date(2024, 1, 2)), (date(2024, 1, 4), date(2024, 1, 4))], '腾讯控股')
+    opend_keys = [f'2024-01-03 {time_label}:00' for time_label in HK_60M_LABELS]
+    quote_ctx = FakeQuoteContext({'K_60M': kline_frame(code, opend_keys)})
+
+    records = []
+    for ret_code, page in iter_history_kline_resampled(
+            quote_ctx, store, code, '2024-01-02', '2024-01-04', KLType.K_60M, AuType.NONE, [KL_FIELD.ALL]):
+        assert ret_code == 0
+        records += page
+
+    time_keys = [record['time_key'] for record in records]
+    assert len(records) == 18
+    assert time_keys == [f'{day} {time_label}:00' for day in ('2024-01-02', '2024-01-03', '2024-01-04')
+                         for time_label in HK_60M_LABELS]
+    assert [record['volume'] for record in records[:6]] == [61, 60, 30, 60, 60, 60]
+    assert quote_ctx.calls == [('2024-01-03', '2024-01-03', 'K_60M')]
@@ -0,0 +1,65 @@
+"""行情连接池借出与归还的测试"""
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+futu = pytest.importorskip('futu')
+from scheduler import ScheduledQuoteContext
+from utils import QuoteContextPool
+
+
+class StubScheduler:
+    """不限频的调度器"""
+    limits = {}
+
+
+class StubQuoteContext:
+    """request_history_kline 与 SDK 一样返回三元组"""
+    def __init__(self, ret_code):
+        self.ret_code = ret_code
+        self.closed = False
+
+    def request_history_kline(self, *args, **kwargs):
+        if self.ret_code == futu.RET_OK:
+            return futu.RET_OK, 'data', None
+        return self.ret_code, '网络连接已断开', None
+
+    def get_global_state(self):
+        return futu.RET_OK, {}
+
+    def close(self):
+        self.closed = True
+
+
+class RecordingPool(QuoteContextPool):
+    def __init__(self, ret_code):
+        super(RecordingPool, self).__init__(size=1)
+        self.ret_code = ret_code
+        self.released = []
+
+    def _create(self):
+        return ScheduledQuoteContext(StubQuoteContext(self.ret_code), scheduler=StubScheduler())
+
+    def release(self, quote_ctx, suspect=False):
+        self.released.append(suspect)
+        super(RecordingPool, self).release(quote_ctx, suspect)
+
+
+@pytest.mark.parametrize('ret_code, suspect', [(futu.RET_ERROR, True), (futu.RET_OK, False)])
+def test_three_tuple_error_marks_lease_suspect(ret_code, suspect):
+    pool = RecordingPool(ret_code)
+    with pool.lease() as quote_ctx:
+        result = quote_ctx.request_history_kline('HK.00700')
+    assert len(result) == 3
+    assert pool.released == [suspect]
+
+
+def test_error_does_not_leak_into_next_lease():
+    pool = RecordingPool(futu.RET_ERROR)
+    with pool.lease() as quote_ctx:
+        quote_ctx.request_history_kline('HK.00700')
+    with pool.lease():
+        pass
+    assert pool.released == [True, False]